@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_async_db
+from app.api.schemas.job import Job as JobSchema, JobBatch, JobMetrics
+from app.services import publishing
+
+router = APIRouter()
+
+@router.get("/metrics", response_model=JobMetrics)
+async def get_job_metrics(hours: int = Query(24, ge=1), db: AsyncSession = Depends(get_async_db)):
+    """Queue wait and rate limit wait of the jobs finished in the last ``hours``."""
+    return await publishing.job_metrics(db, hours)
+
+@router.get("/batch/{batch_id}", response_model=JobBatch)
+async def get_job_batch(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get the status of all jobs queued by one publish request."""
+    return await publishing.get_job_batch(db, batch_id)
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get the status of a publication job."""
+    return await publishing.get_job(db, job_id)
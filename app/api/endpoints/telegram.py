@@ -1,129 +1,184 @@
-from fastapi import APIRouter, HTTPException, Response
-from aiogram import Bot
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pathlib import Path
+from typing import Optional, Tuple
+import mimetypes
 import aiohttp
-import io
+import re
 
-from app.config.settings import TELEGRAM_BOT_TOKEN
+from app.config.settings import HTTP_TIMEOUT
+from app.utils.clients import get_http_session
+from app.utils.media_cache import media_cache, CHUNK_SIZE
+from app.utils.telegram_files import file_resolver
 
 router = APIRouter()
 
-@router.get("/file/{file_id}")
-async def get_telegram_file(file_id: str):
-    """Get a file from Telegram by file_id."""
-    bot = Bot(token=TELEGRAM_BOT_TOKEN)
+# Streams of large videos may take longer than the shared session's total
+# timeout: only limit connecting and the wait for each chunk
+STREAM_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=HTTP_TIMEOUT, sock_read=HTTP_TIMEOUT)
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=start-end" range into inclusive (start, end).
+
+    Returns None when there is no usable range (the full body should be sent)
+    and raises ValueError when the range cannot be satisfied.
+    """
+    if not range_header:
+        return None
+
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match:
+        # Multiple ranges and other units are not supported, send the full body
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    if end and int(end) < start:
+        # Syntactically invalid range: ignored, the full body is sent (RFC 7233 2.1)
+        return None
+    end = int(end) if end else size - 1
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+
+    return start, min(end, size - 1)
+
+def range_response_params(range_header: Optional[str], size: int):
+    """Return (status_code, start, length, headers) for a response of ``size`` bytes."""
+    headers = {"Accept-Ranges": "bytes"}
+    byte_range = parse_range(range_header, size)
+
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        status_code = 206
+    else:
+        start, end = 0, size - 1
+        status_code = 200
+
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    return status_code, start, length, headers
+
+async def iter_file(path: Path, start: int, length: int):
+    """Read ``length`` bytes of a file starting at ``start`` in chunks (in a thread, off the event loop)."""
+    f = await run_in_threadpool(open, path, "rb")
+    try:
+        await run_in_threadpool(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await run_in_threadpool(f.close)
 
+def serve_cached_file(path: Path, content_type: str, range_header: Optional[str], head: bool):
+    """Serve a cached file with Range support."""
+    size = path.stat().st_size
+    try:
+        status_code, start, length, headers = range_response_params(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    if head:
+        return Response(status_code=status_code, headers=headers, media_type=content_type)
+
+    return StreamingResponse(
+        iter_file(path, start, length),
+        status_code=status_code,
+        headers=headers,
+        media_type=content_type
+    )
+
+async def proxy_telegram_file(file_id: str, range_header: Optional[str], head: bool):
+    """Stream a file straight from Telegram, filling the cache on full downloads."""
     try:
-        # Get file info
+        file_info = await media_cache.resolve(file_id)
+    except Exception as e:
+        print(f"Error getting file info from Telegram: {str(e)}")
+        raise HTTPException(status_code=404, detail=f"Unsupported file type or invalid file_id: {file_id}")
+
+    # The same file may already be cached under another file_id
+    path = media_cache.link_existing(file_id, file_info)
+    if path:
+        return serve_cached_file(path, media_cache.content_type(file_id), range_header, head)
+
+    content_type = mimetypes.guess_type(file_info.file_path or "")[0] or "application/octet-stream"
+
+    if head:
+        if file_info.file_size is None:
+            return Response(headers={"Accept-Ranges": "bytes"}, media_type=content_type)
         try:
-            file_info = await bot.get_file(file_id)
-            file_path = file_info.file_path
-        except Exception as e:
-            # Log the error
-            print(f"Error getting file info from Telegram: {str(e)}")
-
-            # Try to handle common file types based on file_id format
-            # This is a fallback for when Telegram API doesn't return file info
-            if "AgAC" in file_id:  # Photo file_id usually starts with AgAC
-                # For photos, we'll create a dummy file path
-                file_path = "photos/photo.jpg"
-            elif "BAAC" in file_id:  # Video file_id usually starts with BAAC
-                # For videos, we'll create a dummy file path
-                file_path = "videos/video.mp4"
-            else:
-                # If we can't determine the file type, raise an exception
-                raise HTTPException(status_code=400, detail=f"Unsupported file type or invalid file_id: {file_id}")
-
-        # Get file URL
-        file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
-
-        # Download file with SSL verification disabled
-        async with aiohttp.ClientSession() as session:
-            try:
-                # Create a custom SSL context that doesn't verify certificates
-                import ssl
-                ssl_context = ssl.create_default_context()
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.CERT_NONE
-
-                async with session.get(file_url, ssl=ssl_context) as response:
-                    if response.status == 200:
-                        content = await response.read()
-
-                        # Determine content type
-                        content_type = "application/octet-stream"
-                        if file_path.endswith(".jpg") or file_path.endswith(".jpeg"):
-                            content_type = "image/jpeg"
-                        elif file_path.endswith(".png"):
-                            content_type = "image/png"
-                        elif file_path.endswith(".mp4"):
-                            content_type = "video/mp4"
-                        elif file_path.endswith(".mov"):
-                            content_type = "video/quicktime"
-
-                        return Response(content=content, media_type=content_type)
-                    else:
-                        # Log the error
-                        print(f"Failed to download file from Telegram: {response.status} - {await response.text()}")
-                        raise HTTPException(status_code=response.status, detail="Failed to download file from Telegram")
-            except Exception as e:
-                # Log the error
-                print(f"Error downloading file from Telegram: {str(e)}")
-
-                # Try alternative method using curl
-                try:
-                    import tempfile
-                    import os
-                    import subprocess
-
-                    # Create a temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as temp_file:
-                        temp_path = temp_file.name
-
-                    # Use curl to download the file (curl handles SSL issues better)
-                    curl_cmd = [
-                        "curl",
-                        "-s",
-                        "-k",  # Skip SSL verification
-                        file_url,
-                        "-o", temp_path
-                    ]
-
-                    process = subprocess.run(curl_cmd, capture_output=True)
-
-                    if process.returncode == 0:
-                        # Read the file
-                        with open(temp_path, "rb") as f:
-                            content = f.read()
-
-                        # Clean up
-                        os.unlink(temp_path)
-
-                        # Determine content type
-                        content_type = "application/octet-stream"
-                        if file_path.endswith(".jpg") or file_path.endswith(".jpeg"):
-                            content_type = "image/jpeg"
-                        elif file_path.endswith(".png"):
-                            content_type = "image/png"
-                        elif file_path.endswith(".mp4"):
-                            content_type = "video/mp4"
-                        elif file_path.endswith(".mov"):
-                            content_type = "video/quicktime"
-
-                        return Response(content=content, media_type=content_type)
-                    else:
-                        # Log the error
-                        print(f"Curl failed with return code {process.returncode}: {process.stderr.decode()}")
-                        raise HTTPException(status_code=500, detail=f"Curl failed to download file: {process.stderr.decode()}")
-                except Exception as curl_e:
-                    # Log the error
-                    print(f"Error using curl fallback: {str(curl_e)}")
-                    raise HTTPException(status_code=500, detail=f"Error downloading file: {str(e)} (Curl fallback failed: {str(curl_e)})")
-    except HTTPException as he:
-        # Re-raise HTTP exceptions
-        raise he
+            status_code, _, _, headers = range_response_params(range_header, file_info.file_size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{file_info.file_size}"})
+        return Response(status_code=status_code, headers=headers, media_type=content_type)
+
+    upstream_headers = {"Range": range_header} if range_header else {}
+    try:
+        response = await get_http_session().get(
+            media_cache.file_url(file_info.file_path),
+            headers=upstream_headers,
+            ssl=media_cache.ssl_context(),
+            timeout=STREAM_TIMEOUT
+        )
     except Exception as e:
-        # Log the error
-        print(f"Unexpected error getting file: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error getting file: {str(e)}")
-    finally:
-        await bot.session.close()
+        print(f"Error downloading file from Telegram: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error downloading file: {str(e)}")
+
+    if response.status not in (200, 206):
+        print(f"Failed to download file from Telegram: {response.status}")
+        response.release()
+        # The cached file_path may have expired
+        file_resolver.invalidate(file_id)
+        if response.status == 416:
+            return Response(status_code=416, headers={"Content-Range": response.headers.get("Content-Range", "")})
+        raise HTTPException(status_code=502, detail="Failed to download file from Telegram")
+
+    headers = {"Accept-Ranges": "bytes"}
+    for name in ("Content-Length", "Content-Range"):
+        if name in response.headers:
+            headers[name] = response.headers[name]
+
+    # A full body is written to the cache while it is streamed to the client
+    writer = media_cache.open_writer(file_id, file_info) if response.status == 200 else None
+
+    async def body():
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if writer:
+                    await run_in_threadpool(writer.write, chunk)
+                yield chunk
+            if writer:
+                await run_in_threadpool(writer.commit)
+        finally:
+            if writer:
+                writer.discard()
+            response.release()
+
+    return StreamingResponse(body(), status_code=response.status, headers=headers, media_type=content_type)
+
+@router.api_route("/file/{file_id}", methods=["GET", "HEAD"])
+async def get_telegram_file(file_id: str, request: Request):
+    """Stream a Telegram file by file_id with Range and HEAD support."""
+    range_header = request.headers.get("range")
+    head = request.method == "HEAD"
+
+    path = media_cache.lookup(file_id)
+    if path:
+        return serve_cached_file(path, media_cache.content_type(file_id), range_header, head)
+
+    return await proxy_telegram_file(file_id, range_header, head)
@@ -1,11 +1,12 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.endpoints import posts, telegram, stories
-from app.db.database import engine, Base
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from app.api.endpoints import posts, telegram, stories, jobs
+from app.db.database import engine, async_engine
+from app.db.schema import check_schema
+from app.services.errors import ServiceError
+from app.utils import clients
 
 # Create FastAPI app
 app = FastAPI(
@@ -27,6 +28,23 @@ app.add_middleware(
 app.include_router(posts.router, prefix="/api/posts", tags=["posts"])
 app.include_router(telegram.router, prefix="/api/telegram", tags=["telegram"])
 app.include_router(stories.router, prefix="/api/stories", tags=["stories"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+
+# Service errors become HTTP errors with the same status code
+@app.exception_handler(ServiceError)
+async def service_error_handler(request: Request, exc: ServiceError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+@app.on_event("startup")
+async def startup():
+    # Tables are created by migrations (alembic upgrade head), only the version is checked here
+    check_schema(engine)
+    await clients.startup()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await clients.shutdown()
+    await async_engine.dispose()
 
 @app.get("/")
 def read_root():
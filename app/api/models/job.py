@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, Index
+from datetime import datetime
+import uuid
+
+from app.db.database import Base
+
+def generate_job_id():
+    return str(uuid.uuid4())
+
+class PublishJob(Base):
+    __tablename__ = "publish_jobs"
+
+    id = Column(String, primary_key=True, default=generate_job_id)
+    kind = Column(String, nullable=False)  # "post", "story"
+    platform = Column(String, nullable=False)  # "vk", "telegram", "instagram"
+    post_id = Column(String, ForeignKey("posts.id", ondelete="CASCADE"), nullable=True, index=True)
+    story_id = Column(String, ForeignKey("stories.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    # "publish" a new copy or "update" the copy published before in place
+    mode = Column(String, nullable=False, default="publish", server_default="publish")
+
+    # Jobs queued together by one "publish to targets" request
+    batch_id = Column(String, nullable=True, index=True)
+
+    # Job state: "queued", "running", "success", "error"
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    error = Column(Text, nullable=True)
+
+    # Seconds the publisher waited for platform rate limits and flood control (all attempts)
+    throttled_seconds = Column(Float, nullable=False, default=0.0, server_default="0")
+
+    # Worker that holds the job and until when (an expired lease means the worker died)
+    worker_id = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Used by workers to find the next job to claim
+        Index("ix_publish_jobs_status_run_after", "status", "run_after"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from datetime import datetime
+
+from app.db.database import Base
+
+class MediaUpload(Base):
+    """Media already uploaded to a platform, reused when a post is published again."""
+    __tablename__ = "media_uploads"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    platform = Column(String, nullable=False)  # "vk", ...
+    target = Column(String, nullable=False)  # Group or chat the media was uploaded to
+    file_unique_id = Column(String, nullable=False)  # Telegram file_unique_id of the source file
+    kind = Column(String, nullable=False)  # "photo", "video"
+    remote_id = Column(String, nullable=False)  # Platform media id, e.g. VK "photo-1_2"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("platform", "target", "file_unique_id", name="uq_media_uploads_platform_target_file"),
+    )
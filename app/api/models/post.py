@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, Computed, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -25,6 +25,13 @@ class Post(Base):
     is_published_telegram = Column(Boolean, default=False)
     is_published_instagram = Column(Boolean, default=False)
 
+    # Archive status, computed and stored by the database:
+    # "archived" once published to VK and Telegram, otherwise "pending"
+    status = Column(String, Computed(
+        "CASE WHEN is_published_vk AND is_published_telegram THEN 'archived' ELSE 'pending' END",
+        persisted=True
+    ))
+
     # Publication timestamps
     published_vk_at = Column(DateTime, nullable=True)
     published_telegram_at = Column(DateTime, nullable=True)
@@ -36,9 +43,28 @@ class Post(Base):
     # Post name (derived from first words of text)
     name = Column(String, nullable=True)
 
+    # Ids of the published copies per platform, used to edit them in place:
+    # {"vk": {"post_id": ..., "media": {file_id: [attachments]}}, "telegram": {"message_ids": [...], ...}, ...}
+    remote_ids = Column(JSON, nullable=True)
+
     # Publication logs
     logs = relationship("PublicationLog", back_populates="post", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Pending/archive lists: WHERE status = ? ORDER BY created_at DESC
+        Index("ix_posts_status_created_at", "status", "created_at"),
+        # Keyset pagination over all posts: ORDER BY created_at DESC, id DESC
+        Index("ix_posts_created_at_id", "created_at", "id"),
+    )
+
+    def get_remote_ids(self, platform: str) -> dict:
+        """Ids of the copy published to ``platform`` (empty if unknown)."""
+        return (self.remote_ids or {}).get(platform) or {}
+
+    def set_remote_ids(self, platform: str, ids: dict):
+        # Assign a new dict: in-place changes of a JSON column are not tracked
+        self.remote_ids = {**(self.remote_ids or {}), platform: ids}
+
 class PublicationLog(Base):
     __tablename__ = "publication_logs"
 
@@ -51,3 +77,8 @@ class PublicationLog(Base):
 
     # Relationship
     post = relationship("Post", back_populates="logs")
+
+    __table_args__ = (
+        # Logs of a post, newest first
+        Index("ix_publication_logs_post_id_timestamp", "post_id", "timestamp"),
+    )
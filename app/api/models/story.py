@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -36,6 +36,11 @@ class Story(Base):
     # Relationship to post
     post = relationship("Post", backref="stories")
 
+    __table_args__ = (
+        # Existing story of a post for a platform
+        Index("ix_stories_post_id_platform", "post_id", "platform"),
+    )
+
 class StoryPublicationLog(Base):
     __tablename__ = "story_publication_logs"
 
@@ -47,3 +52,8 @@ class StoryPublicationLog(Base):
 
     # Relationship
     story = relationship("Story", back_populates="logs")
+
+    __table_args__ = (
+        # Logs of a story, newest first
+        Index("ix_story_publication_logs_story_id_timestamp", "story_id", "timestamp"),
+    )
@@ -0,0 +1,49 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    platform: str
+    post_id: Optional[str] = None
+    story_id: Optional[str] = None
+    batch_id: Optional[str] = None
+    mode: str = "publish"
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    throttled_seconds: float = 0.0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class PublishTargets(BaseModel):
+    platforms: List[str] = Field(default_factory=lambda: ["vk", "telegram", "instagram"])
+    only_unpublished: bool = False
+    # "update" edits the copies published before instead of publishing new ones
+    mode: str = "publish"
+
+class JobBatch(BaseModel):
+    batch_id: str
+    jobs: List[Job]
+
+class PlatformJobMetrics(BaseModel):
+    kind: str
+    platform: str
+    jobs: int
+    failed: int
+    # Seconds from queueing to the (last) start of a job
+    avg_queue_wait: float
+    max_queue_wait: float
+    # Seconds spent waiting for rate limits while publishing
+    avg_throttled: float
+    max_throttled: float
+
+class JobMetrics(BaseModel):
+    since: datetime
+    platforms: List[PlatformJobMetrics]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
 
 class PostBase(BaseModel):
@@ -31,6 +31,7 @@ class Post(PostBase):
     is_published_vk: bool
     is_published_telegram: bool
     is_published_instagram: bool
+    status: Optional[str] = None
     published_vk_at: Optional[datetime] = None
     published_telegram_at: Optional[datetime] = None
     published_instagram_at: Optional[datetime] = None
@@ -41,8 +42,41 @@ class Post(PostBase):
     class Config:
         orm_mode = True
 
+class PostListItem(BaseModel):
+    """Compact post representation for lists (no full text, no logs)."""
+    id: str
+    name: Optional[str] = None
+    created_at: datetime
+    status: Optional[str] = None
+    excerpt: str = ""
+    photo_count: int = 0
+    video_count: int = 0
+    is_published_vk: bool
+    is_published_telegram: bool
+    is_published_instagram: bool
+    published_vk_at: Optional[datetime] = None
+    published_telegram_at: Optional[datetime] = None
+    published_instagram_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
 class PostList(BaseModel):
-    posts: List[Post]
+    posts: List[Union[Post, PostListItem]]
+    # Cursor for the next page (keyset pagination), None on the last page
+    next_cursor: Optional[str] = None
+    # Number of posts matching the filters (only with include_total)
+    total: Optional[int] = None
 
     class Config:
         orm_mode = True
+
+class CalendarBucket(BaseModel):
+    """Number of posts in a year, a month or a day."""
+    year: int
+    month: Optional[int] = None
+    day: Optional[int] = None
+    count: int
+
+class PostCalendar(BaseModel):
+    buckets: List[CalendarBucket]
@@ -0,0 +1,156 @@
+"""
+Access to posts, stories and publication jobs for the bot handlers.
+
+``DirectClient`` (``BOT_API_MODE=direct``, default) calls the service layer
+in-process, with its own database sessions; ``HttpClient``
+(``BOT_API_MODE=http``) goes through the REST API at ``API_HOST:API_PORT``
+for a bot deployed without access to the database. Both return the same JSON
+data as the API and raise ``ServiceError``/``NotFoundError`` on errors.
+"""
+import asyncio
+from typing import List, Optional
+
+from app.config.settings import API_HOST, API_PORT, BOT_API_MODE
+from app.db.database import SessionLocal, AsyncSessionLocal
+from app.api.schemas.post import PostCreate, Post as PostSchema, PostList, PostCalendar
+from app.api.schemas.story import Story as StorySchema
+from app.api.schemas.job import Job as JobSchema, JobBatch
+from app.services import posts as post_service
+from app.services import stories as story_service
+from app.services import publishing
+from app.services.errors import ServiceError, NotFoundError
+from app.utils.clients import get_http_session
+
+
+def _dump(schema, value) -> dict:
+    """Serialize a service result like the API response."""
+    return schema.model_validate(value, from_attributes=True).model_dump(mode="json")
+
+
+class DirectClient:
+    """Calls the service layer in this process."""
+
+    async def _run_sync(self, schema, func, *args, **kwargs):
+        """Run a sync service in a thread; the result is serialized while the session is open."""
+        def call():
+            with SessionLocal() as db:
+                result = func(db, *args, **kwargs)
+                return None if schema is None else _dump(schema, result)
+        return await asyncio.to_thread(call)
+
+    async def _run_async(self, schema, func, *args, **kwargs):
+        async with AsyncSessionLocal() as db:
+            return _dump(schema, await func(db, *args, **kwargs))
+
+    async def create_post(self, text: str, photos: List[str], videos: List[str]) -> dict:
+        return await self._run_sync(
+            PostSchema, post_service.create_post, PostCreate(text=text, photos=photos, videos=videos)
+        )
+
+    async def list_posts(self, **params) -> dict:
+        return await self._run_sync(PostList, post_service.list_posts, **params)
+
+    async def post_calendar(self, **params) -> dict:
+        return await self._run_sync(PostCalendar, post_service.post_calendar, **params)
+
+    async def get_post(self, post_id: str) -> dict:
+        return await self._run_sync(PostSchema, post_service.get_post, post_id)
+
+    async def delete_post(self, post_id: str):
+        await self._run_sync(None, post_service.delete_post, post_id)
+
+    async def update_post(self, post_id: str, data: dict) -> dict:
+        return await self._run_async(PostSchema, post_service.update_post, post_id, data)
+
+    async def publish_post(self, post_id: str, platform: str, mode: str = "publish") -> dict:
+        return await self._run_async(JobSchema, publishing.publish_post, post_id, platform, mode)
+
+    async def publish_post_targets(self, post_id: str, platforms: List[str], mode: str = "publish") -> dict:
+        return await self._run_async(JobBatch, publishing.publish_post_to_targets, post_id, platforms, False, mode)
+
+    async def get_job(self, job_id: str) -> dict:
+        return await self._run_async(JobSchema, publishing.get_job, job_id)
+
+    async def get_job_batch(self, batch_id: str) -> dict:
+        return await self._run_async(JobBatch, publishing.get_job_batch, batch_id)
+
+    async def create_story(self, post_id: str, platform: str) -> dict:
+        return await self._run_sync(StorySchema, story_service.create_story, post_id, platform)
+
+    async def publish_story(self, story_id: str) -> dict:
+        return await self._run_async(JobSchema, publishing.publish_story, story_id)
+
+
+class HttpClient:
+    """Calls the REST API of a separately deployed API process."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    async def _request(self, method: str, path: str, params: Optional[dict] = None, json=None):
+        session = get_http_session()
+        async with session.request(method, f"{self.base_url}{path}", params=params, json=json) as response:
+            if response.status == 404:
+                raise NotFoundError(await response.text())
+            if response.status >= 400:
+                raise ServiceError(await response.text(), response.status)
+            if response.status == 204:
+                return None
+            return await response.json()
+
+    @staticmethod
+    def _params(params: dict) -> dict:
+        """Query parameters without empty values, dates in ISO format, flags as true/false."""
+        return {
+            key: str(value).lower() if isinstance(value, bool)
+            else value.isoformat() if hasattr(value, "isoformat") else value
+            for key, value in params.items() if value is not None
+        }
+
+    async def create_post(self, text: str, photos: List[str], videos: List[str]) -> dict:
+        return await self._request("POST", "/api/posts/", json={"text": text, "photos": photos, "videos": videos})
+
+    async def list_posts(self, **params) -> dict:
+        return await self._request("GET", "/api/posts/", params=self._params(params))
+
+    async def post_calendar(self, **params) -> dict:
+        return await self._request("GET", "/api/posts/calendar", params=self._params(params))
+
+    async def get_post(self, post_id: str) -> dict:
+        return await self._request("GET", f"/api/posts/{post_id}")
+
+    async def delete_post(self, post_id: str):
+        await self._request("DELETE", f"/api/posts/{post_id}")
+
+    async def update_post(self, post_id: str, data: dict) -> dict:
+        # Так как в API нет метода PUT/PATCH, используем POST с дополнительным параметром
+        return await self._request("POST", f"/api/posts/{post_id}", json={**data, "_method": "update"})
+
+    async def publish_post(self, post_id: str, platform: str, mode: str = "publish") -> dict:
+        return await self._request("POST", f"/api/posts/{post_id}/publish/{platform}", params={"mode": mode})
+
+    async def publish_post_targets(self, post_id: str, platforms: List[str], mode: str = "publish") -> dict:
+        return await self._request(
+            "POST", f"/api/posts/{post_id}/publish", json={"platforms": platforms, "mode": mode}
+        )
+
+    async def get_job(self, job_id: str) -> dict:
+        return await self._request("GET", f"/api/jobs/{job_id}")
+
+    async def get_job_batch(self, batch_id: str) -> dict:
+        return await self._request("GET", f"/api/jobs/batch/{batch_id}")
+
+    async def create_story(self, post_id: str, platform: str) -> dict:
+        return await self._request("POST", f"/api/stories/{post_id}/platform/{platform}")
+
+    async def publish_story(self, story_id: str) -> dict:
+        return await self._request("POST", f"/api/stories/{story_id}/publish")
+
+
+def _make_client():
+    if BOT_API_MODE == "http":
+        return HttpClient(f"http://{API_HOST}:{API_PORT}")
+    return DirectClient()
+
+
+api_client = _make_client()
@@ -3,12 +3,11 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import aiohttp
 import random
 from datetime import datetime
 
 from app.bot.keyboards.main_keyboard import get_main_keyboard, get_skip_back_keyboard
-from app.config.settings import API_HOST, API_PORT
+from app.bot.api_client import api_client
 from app.bot.utils.spoiler_phrases import SPOILER_PHRASES
 
 router = Router()
@@ -37,35 +36,17 @@ async def delete_previous_messages(message, state):
     await state.update_data(bot_message_ids=[])
 
 async def create_post_api(text, photos, videos):
-    """Send post data to API."""
+    """Create a post."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/posts/"
-            data = {
-                "text": text,
-                "photos": photos if photos else [],
-                "videos": videos if videos else []
-            }
-            print(f"Creating post via {url} with {len(photos)} photos and {len(videos)} videos")
-            print(f"DEBUG: Photos data: {photos}")
-            print(f"DEBUG: Videos data: {videos}")
-            print(f"DEBUG: Full data being sent: {data}")
-
-            try:
-                async with session.post(url, json=data) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 201:
-                        result = await response.json()
-                        print(f"Post created successfully with ID: {result.get('id')}")
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return None
+        photos = photos if photos else []
+        videos = videos if videos else []
+        print(f"Creating post with {len(photos)} photos and {len(videos)} videos")
+        print(f"DEBUG: Photos data: {photos}")
+        print(f"DEBUG: Videos data: {videos}")
+
+        result = await api_client.create_post(text, photos, videos)
+        print(f"Post created successfully with ID: {result.get('id')}")
+        return result
     except Exception as e:
         print(f"Error creating post: {str(e)}")
         return None
@@ -2,15 +2,18 @@ from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-import aiohttp
 import json
+import asyncio
 from datetime import datetime
 
 from app.bot.keyboards.main_keyboard import (
     get_main_keyboard, get_post_actions_keyboard, get_skip_back_keyboard,
     get_media_management_keyboard, get_photo_management_keyboard, get_video_management_keyboard
 )
-from app.config.settings import API_HOST, API_PORT
+from app.config.settings import JOB_WAIT_TIMEOUT
+from app.bot.api_client import api_client
+from app.services.errors import NotFoundError
+from app.utils.date_ranges import period_bounds
 
 # Определение состояний для поиска постов
 class PostSearch(StatesGroup):
@@ -29,232 +32,279 @@ class PostEdit(StatesGroup):
 
 router = Router()
 
+# Интервал опроса статуса задачи публикации (секунды)
+JOB_POLL_DELAY = 2
+
+PLATFORM_NAMES = {"vk": "ВК", "telegram": "Telegram", "instagram": "Instagram"}
+
+# Количество отложенных постов на одной странице списка (сообщение не длиннее 4096 символов)
+PENDING_PAGE_SIZE = 20
+
+# Курсоры страниц списка отложенных постов по чатам: курсор длиннее 64 байт
+# callback_data, поэтому в кнопке передается только номер страницы
+pending_page_cursors = {}
+
 # API client functions
-async def get_posts_api(is_archived=False, search_query=None):
-    """Get posts from API with optional search query."""
+async def get_posts_api(is_archived=False, search_query=None, limit=100, created_from=None, created_to=None):
+    """Get posts with optional search query.
+
+    Pending/archived filtering is done by the service; search results are not
+    filtered by archive status. ``created_from``/``created_to`` limit the
+    creation date to [from, to).
+    """
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/posts/"
+        params = {"limit": limit, "created_from": created_from, "created_to": created_to}
+        if search_query:
+            params["search"] = search_query
+            print(f"Searching posts with query: {search_query}")
+        else:
+            params["status"] = "archived" if is_archived else "pending"
 
-            # Add search parameter if provided
-            params = {}
-            if search_query:
-                params["search"] = search_query
-                print(f"Searching posts with query: {search_query}")
+        data = await api_client.list_posts(**params)
+        posts = data.get("posts", [])
+        print(f"Received {len(posts)} posts")
 
-            print(f"Fetching posts from {url}")
+        # Отладочный вывод для поиска
+        if search_query:
+            print(f"Search results for '{search_query}':")
+            for i, post in enumerate(posts, 1):
+                print(f"{i}. Post ID: {post.get('id')}, Name: {post.get('name')}")
+                print(f"   Text: {post.get('excerpt') or ''}...")
 
-            try:
-                async with session.get(url, params=params) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 200:
-                        data = await response.json()
-                        posts = data.get("posts", [])
-                        print(f"Received {len(posts)} posts from API")
-
-                        # Отладочный вывод для поиска
-                        if search_query:
-                            print(f"Search results for '{search_query}':")
-                            for i, post in enumerate(posts, 1):
-                                print(f"{i}. Post ID: {post.get('id')}, Name: {post.get('name')}")
-                                text = post.get('text', '')
-                                print(f"   Text: {text[:100]}...")
-
-                        # If searching, return all posts without filtering by archive status
-                        if search_query:
-                            return posts
-
-                        # Filter posts based on archive status
-                        if is_archived:
-                            # Consider a post archived if it's published to all platforms
-                            filtered_posts = [p for p in posts if p.get("is_published_vk") and p.get("is_published_telegram")]
-                        else:
-                            # Pending posts are those not published to at least one platform
-                            filtered_posts = [p for p in posts if not (p.get("is_published_vk") and p.get("is_published_telegram"))]
-
-                        print(f"Filtered to {len(filtered_posts)} posts (is_archived={is_archived})")
-                        return filtered_posts
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return []
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return []
+        return posts
     except Exception as e:
         print(f"Error in get_posts_api: {str(e)}")
         return []
 
-async def get_post_api(post_id):
-    """Get a specific post from API."""
+async def get_pending_page_api(cursor=None):
+    """Get one page of pending posts: (posts, cursor of the next page, number of pending posts)."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/posts/{post_id}"
-            print(f"Fetching post from {url}")
+        data = await api_client.list_posts(
+            status="pending", limit=PENDING_PAGE_SIZE, cursor=cursor, include_total=True
+        )
+        posts = data.get("posts", [])
+        print(f"Received {len(posts)} pending posts")
+        return posts, data.get("next_cursor"), data.get("total") or 0
+    except Exception as e:
+        print(f"Error in get_pending_page_api: {str(e)}")
+        return [], None, 0
 
-            try:
-                async with session.get(url) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 200:
-                        post_data = await response.json()
-                        return post_data
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return None
+async def get_archive_calendar_api(year=None, month=None, created_to=None):
+    """Get archived post counts per year, per month of a year or per day of a month."""
+    try:
+        data = await api_client.post_calendar(year=year, month=month, status="archived", created_to=created_to)
+        return data.get("buckets", [])
+    except Exception as e:
+        print(f"Error in get_archive_calendar_api: {str(e)}")
+        return []
+
+async def get_post_api(post_id):
+    """Get a specific post."""
+    try:
+        return await api_client.get_post(post_id)
     except Exception as e:
         print(f"Error in get_post_api: {str(e)}")
         return None
 
 async def delete_post_api(post_id):
-    """Delete a post via API."""
+    """Delete a post."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/posts/{post_id}"
-            print(f"Deleting post via {url}")
-
-            try:
-                async with session.delete(url) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 204:
-                        return True
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return False
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return False
+        await api_client.delete_post(post_id)
+        return True
     except Exception as e:
         print(f"Error in delete_post_api: {str(e)}")
         return False
 
-async def publish_post_api(post_id, platform):
-    """Publish a post to a specific platform via API."""
+async def wait_for_job_api(job_id):
+    """Poll a publication job until it finishes; returns the job or None on timeout."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + JOB_WAIT_TIMEOUT
+
+    while loop.time() < deadline:
+        try:
+            job = await api_client.get_job(job_id)
+            if job.get("status") in ("success", "error"):
+                return job
+        except NotFoundError:
+            print(f"Job {job_id} not found")
+            return None
+        except Exception as e:
+            print(f"Error while polling job {job_id}: {str(e)}")
+
+        await asyncio.sleep(JOB_POLL_DELAY)
+
+    print(f"Timed out waiting for job {job_id}")
+    return None
+
+async def publish_post_api(post_id, platform, mode="publish"):
+    """Publish a post to a specific platform and wait for the result."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/posts/{post_id}/publish/{platform}"
-            print(f"Publishing post to {platform} via {url}")
+        print(f"Publishing post {post_id} to {platform} ({mode})")
+        job = await api_client.publish_post(post_id, platform, mode)
 
-            try:
-                async with session.post(url) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return None
+        # Публикация выполняется в очереди, ждем результат
+        job = await wait_for_job_api(job["id"])
+        if job and job.get("status") == "success":
+            return await get_post_api(post_id)
+
+        if job:
+            print(f"Publication job {job['id']} failed: {job.get('error')}")
+        return None
     except Exception as e:
         print(f"Error in publish_post_api: {str(e)}")
         return None
 
-async def create_story_api(post_id, platform):
-    """Create a story for a post via API."""
+async def publish_post_targets_api(post_id, platforms, mode="publish"):
+    """Queue a post for publication to several platforms at once."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/stories/{post_id}/platform/{platform}"
-            print(f"Creating story for platform {platform} via {url}")
+        print(f"Publishing post {post_id} to {', '.join(platforms)} ({mode})")
+        return await api_client.publish_post_targets(post_id, platforms, mode)
+    except Exception as e:
+        print(f"Error in publish_post_targets_api: {str(e)}")
+        return None
 
-            try:
-                async with session.post(url) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 201:
-                        result = await response.json()
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return None
+async def wait_for_batch_api(batch_id, on_update):
+    """Poll a batch of publication jobs until all of them finish.
+
+    ``on_update(jobs)`` is awaited every time the status of a job changes.
+    Returns the last known list of jobs.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + JOB_WAIT_TIMEOUT
+    jobs = []
+    last_statuses = None
+
+    while loop.time() < deadline:
+        try:
+            jobs = (await api_client.get_job_batch(batch_id)).get("jobs", [])
+        except Exception as e:
+            print(f"Error while polling batch {batch_id}: {str(e)}")
+
+        statuses = [(job["platform"], job["status"]) for job in jobs]
+        if statuses != last_statuses:
+            last_statuses = statuses
+            await on_update(jobs)
+
+        if jobs and all(job["status"] in ("success", "error") for job in jobs):
+            return jobs
+
+        await asyncio.sleep(JOB_POLL_DELAY)
+
+    print(f"Timed out waiting for batch {batch_id}")
+    return jobs
+
+def format_publish_results(platforms, jobs):
+    """Format per-platform publication results (⏳ for platforms still in progress)."""
+    statuses = {job["platform"]: job["status"] for job in jobs}
+
+    result_text = "\n\n📤 Результаты публикации:\n"
+    for platform in platforms:
+        status = statuses.get(platform)
+        if status == "success":
+            icon = "✅"
+        elif status == "error":
+            icon = "❌"
+        else:
+            icon = "⏳"
+        result_text += f"{PLATFORM_NAMES[platform]}: {icon}\n"
+    return result_text
+
+async def publish_with_progress(message, post_id, platforms, header, mode="publish"):
+    """Publish a post to several platforms and edit ``message`` as each one finishes."""
+    batch = await publish_post_targets_api(post_id, platforms, mode)
+    if not batch:
+        await message.edit_text(
+            f"{header}\n\n❌ Ошибка при постановке публикации в очередь.",
+            reply_markup=get_post_actions_keyboard()
+        )
+        return
+
+    async def show_progress(jobs):
+        finished = all(job["status"] in ("success", "error") for job in jobs)
+        try:
+            await message.edit_text(
+                f"{header}{format_publish_results(platforms, jobs)}",
+                reply_markup=get_post_actions_keyboard() if finished else None
+            )
+        except Exception as e:
+            print(f"Error updating publication status message: {str(e)}")
+
+    jobs = await wait_for_batch_api(batch["batch_id"], show_progress)
+    if not jobs or not all(job["status"] in ("success", "error") for job in jobs):
+        # Timed out: show the keyboard anyway so the user can go on
+        await message.edit_text(
+            f"{header}{format_publish_results(platforms, jobs)}\n⌛ Публикация продолжается в фоне.",
+            reply_markup=get_post_actions_keyboard()
+        )
+
+async def create_story_api(post_id, platform):
+    """Create a story for a post."""
+    try:
+        print(f"Creating story for platform {platform}")
+        return await api_client.create_story(post_id, platform)
     except Exception as e:
         print(f"Error in create_story_api: {str(e)}")
         return None
 
 async def publish_story_api(story_id):
-    """Publish a story via API."""
+    """Publish a story and wait for the result."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/stories/{story_id}/publish"
-            print(f"Publishing story via {url}")
+        print(f"Publishing story {story_id}")
+        job = await api_client.publish_story(story_id)
 
-            try:
-                async with session.post(url) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return None
+        # Публикация выполняется в очереди, ждем результат
+        job = await wait_for_job_api(job["id"])
+        if job and job.get("status") == "success":
+            return job
+
+        if job:
+            print(f"Story publication job {job['id']} failed: {job.get('error')}")
+        return None
     except Exception as e:
         print(f"Error in publish_story_api: {str(e)}")
         return None
 
 async def update_post_api(post_id, text=None, photos=None, videos=None):
-    """Update a post via API."""
+    """Update a post."""
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"http://{API_HOST}:{API_PORT}/api/posts/{post_id}"
-            print(f"Updating post via {url}")
-
-            # Подготовка данных для обновления
-            data = {}
-            if text is not None:
-                data["text"] = text
-            if photos is not None:
-                data["photos"] = photos
-            if videos is not None:
-                data["videos"] = videos
-
-            print(f"Update data: {data}")
-
-            # Так как в API нет метода PUT/PATCH, используем POST с дополнительным параметром
-            data["_method"] = "update"
-
-            try:
-                async with session.post(url, json=data) as response:
-                    print(f"API response status: {response.status}")
-
-                    if response.status == 200:
-                        result = await response.json()
-                        return result
-                    else:
-                        error_text = await response.text()
-                        print(f"API Error: {response.status} - {error_text}")
-                        return None
-            except Exception as e:
-                print(f"Error during API request: {str(e)}")
-                return None
+        # Подготовка данных для обновления
+        data = {}
+        if text is not None:
+            data["text"] = text
+        if photos is not None:
+            data["photos"] = photos
+        if videos is not None:
+            data["videos"] = videos
+
+        print(f"Update data: {data}")
+        return await api_client.update_post(post_id, data)
     except Exception as e:
         print(f"Error in update_post_api: {str(e)}")
         return None
 
-async def show_pending_posts(message: Message):
-    """Show pending posts."""
+async def show_pending_posts(message: Message, page: int = 0):
+    """Show a page of pending posts."""
     try:
         print("Fetching pending posts...")
-        posts = await get_posts_api(is_archived=False)
-        print(f"Fetched {len(posts)} pending posts")
+        # Без сохраненного курсора страницы (например, после перезапуска бота) показываем первую
+        cursors = pending_page_cursors.get(message.chat.id) if page > 0 else None
+        if not cursors or page >= len(cursors):
+            page = 0
+            cursors = pending_page_cursors[message.chat.id] = [None]
+
+        posts, next_cursor, total = await get_pending_page_api(cursors[page])
+        if not posts and page > 0:
+            # Посты страницы были удалены или опубликованы
+            await show_pending_posts(message)
+            return
+
+        # Курсор следующей страницы для кнопки "Ещё"
+        del cursors[page + 1:]
+        if next_cursor:
+            cursors.append(next_cursor)
+
+        pages = max((total + PENDING_PAGE_SIZE - 1) // PENDING_PAGE_SIZE, 1)
+        first = page * PENDING_PAGE_SIZE
 
         if not posts:
             # Create back button
@@ -269,11 +319,13 @@ async def show_pending_posts(message: Message):
 
         # Send list of posts
         response_text = "📋 Отложенные посты:\n\n"
+        if pages > 1:
+            response_text = f"📋 Отложенные посты (страница {page + 1} из {pages}, всего {total}):\n\n"
 
         # Create buttons for each post
         buttons = []
 
-        for i, post in enumerate(posts, 1):
+        for i, post in enumerate(posts, first + 1):
             # Format post info
             post_name = post.get("name", "Без названия")
             created_at_str = post.get("created_at", "")
@@ -289,8 +341,8 @@ async def show_pending_posts(message: Message):
                 print(f"Error parsing date: {str(e)}")
                 created_at_formatted = "Неизвестно"
 
-            photo_count = len(post.get("photos", []))
-            video_count = len(post.get("videos", []))
+            photo_count = post.get("photo_count", 0)
+            video_count = post.get("video_count", 0)
 
             # Add platform status indicators
             vk_status = "✅" if post.get("is_published_vk") else "❌"
@@ -313,6 +365,15 @@ async def show_pending_posts(message: Message):
                     callback_data=f"view_post_{post_id}"
                 )])
 
+        # Кнопки перехода между страницами
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"pending_page_{page - 1}"))
+        if next_cursor:
+            navigation.append(InlineKeyboardButton(text="➡️ Ещё", callback_data=f"pending_page_{page + 1}"))
+        if navigation:
+            buttons.append(navigation)
+
         # Add back button
         buttons.append([InlineKeyboardButton(text="🏠 Вернуться в главное меню", callback_data="back_to_main")])
 
@@ -322,7 +383,7 @@ async def show_pending_posts(message: Message):
         # Store post IDs in user data (for backward compatibility)
         if hasattr(message, 'bot') and hasattr(message.bot, 'user_data') and hasattr(message, 'from_user'):
             try:
-                user_data = {f"post_{i}": post.get("id") for i, post in enumerate(posts, 1) if post.get("id")}
+                user_data = {f"post_{i}": post.get("id") for i, post in enumerate(posts, first + 1) if post.get("id")}
                 if message.from_user.id not in message.bot.user_data:
                     message.bot.user_data[message.from_user.id] = {}
                 message.bot.user_data[message.from_user.id].update(user_data)
@@ -352,17 +413,35 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
         search_results: Optional list of posts from search
     """
     try:
-        # If search results are provided, use them instead of fetching from API
-        posts = search_results if search_results is not None else await get_posts_api(is_archived=True)
+        # Check if we're showing search results
+        is_search_results = search_results is not None
+
+        today = datetime.now().date()
+        today_start = datetime.combine(today, datetime.min.time())
+        posts = []
+        buckets = []
+
+        # Каждый уровень навигации - один агрегирующий запрос или выборка постов за период
+        if is_search_results:
+            posts = search_results
+        elif year is None:
+            # Посты за сегодня показываются отдельно от архива по годам
+            posts = await get_posts_api(is_archived=True, created_from=today_start)
+            buckets = await get_archive_calendar_api(created_to=today_start)
+        elif day is None:
+            buckets = await get_archive_calendar_api(year=year, month=month, created_to=today_start)
+        else:
+            day_start, day_end = period_bounds(year, month, day)
+            posts = await get_posts_api(is_archived=True, created_from=day_start, created_to=day_end)
 
         # Отладочный вывод для search_results
-        if search_results is not None:
+        if is_search_results:
             print(f"show_archived_posts received search_results: {len(search_results)} posts")
             for i, post in enumerate(search_results, 1):
                 print(f"  {i}. Post ID: {post.get('id')}, Name: {post.get('name')}")
-                print(f"     Text: {post.get('text', '')[:50]}...")
+                print(f"     Text: {(post.get('excerpt') or '')[:50]}...")
 
-        if not posts:
+        if not posts and not buckets:
             # Create back button
             buttons = [[InlineKeyboardButton(text="🏠 Вернуться в главное меню", callback_data="back_to_main")]]
             keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -373,9 +452,6 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
             )
             return
 
-        # Check if we're showing search results
-        is_search_results = search_results is not None
-
         # Если это результаты поиска, просто отображаем их без группировки по датам
         if is_search_results:
             response_text = "🔍 Результаты поиска:\n\n"
@@ -383,9 +459,11 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
 
             for i, post in enumerate(posts, 1):
                 post_name = post.get("name", "Без названия")
-                photo_count = len(post.get("photos", []))
-                video_count = len(post.get("videos", []))
-                text = post.get("text", "")[:100] + "..." if len(post.get("text", "")) > 100 else post.get("text", "")
+                photo_count = post.get("photo_count", 0)
+                video_count = post.get("video_count", 0)
+                text = post.get("excerpt") or ""
+                if len(text) >= 100:
+                    text += "..."
 
                 response_text += f"{i}. {post_name}\n"
                 response_text += f"   Медиа: {photo_count}📷 {video_count}📹\n"
@@ -410,50 +488,8 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
             await message.edit_text(response_text, reply_markup=keyboard)
             return
 
-        # Group posts by date for regular archive view
-        today = datetime.now().date()
-        posts_by_date = {}
-        posts_today = []
-
-        for post in posts:
-            try:
-                created_at_str = post.get("created_at", "")
-                if not created_at_str:
-                    print(f"Warning: Post {post.get('id')} has no created_at date")
-                    continue
-
-                created_at = datetime.fromisoformat(created_at_str.replace("Z", "+00:00"))
-                post_date = created_at.date()
-                post_year = post_date.year
-                post_month = post_date.month
-                post_day = post_date.day
-            except Exception as e:
-                print(f"Error processing post {post.get('id')}: {str(e)}")
-                print(f"Post data: {post}")
-                continue
-
-            # Check if post matches the filter criteria
-            if year is not None and post_year != year:
-                continue
-            if month is not None and post_month != month:
-                continue
-            if day is not None and post_day != day:
-                continue
-
-            # Separate today's posts
-            if post_date == today:
-                posts_today.append(post)
-                continue
-
-            # Group by year, month, day
-            if post_year not in posts_by_date:
-                posts_by_date[post_year] = {}
-            if post_month not in posts_by_date[post_year]:
-                posts_by_date[post_year][post_month] = {}
-            if post_day not in posts_by_date[post_year][post_month]:
-                posts_by_date[post_year][post_month][post_day] = []
-
-            posts_by_date[post_year][post_month][post_day].append(post)
+        posts_today = posts if year is None else []
+        day_posts = posts if day is not None else []
 
         # Create buttons and response text based on navigation level
         buttons = []
@@ -471,8 +507,8 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
                 response_text += f"📅 Сегодня ({today.strftime('%d.%m.%Y')}):\n\n"
                 for i, post in enumerate(posts_today, 1):
                     post_name = post.get("name", "Без названия")
-                    photo_count = len(post.get("photos", []))
-                    video_count = len(post.get("videos", []))
+                    photo_count = post.get("photo_count", 0)
+                    video_count = post.get("video_count", 0)
 
                     response_text += f"{i}. {post_name}\n"
                     response_text += f"   Медиа: {photo_count}📷 {video_count}📹\n\n"
@@ -485,19 +521,11 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
 
                 response_text += "📂 Архив по годам:\n\n"
 
-            # Add year buttons
-            years = sorted(posts_by_date.keys(), reverse=True)
-            for year in years:
-                # Count posts in this year
-                year_post_count = sum(
-                    len(posts_by_date[year][month][day])
-                    for month in posts_by_date[year]
-                    for day in posts_by_date[year][month]
-                )
-
+            # Add year buttons (counts come from the calendar endpoint)
+            for bucket in buckets:
                 buttons.append([InlineKeyboardButton(
-                    text=f"📅 {year} ({year_post_count} постов)",
-                    callback_data=f"archive_year_{year}"
+                    text=f"📅 {bucket['year']} ({bucket['count']} постов)",
+                    callback_data=f"archive_year_{bucket['year']}"
                 )])
 
         elif month is None:
@@ -505,24 +533,17 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
             response_text = f"📁 Архив постов за {year} год:\n\n"
 
             # Add month buttons
-            months = sorted(posts_by_date[year].keys(), reverse=True)
-            for month in months:
-                # Count posts in this month
-                month_post_count = sum(
-                    len(posts_by_date[year][month][day])
-                    for day in posts_by_date[year][month]
-                )
-
+            for bucket in buckets:
                 # Get month name
                 month_name = {
                     1: "Январь", 2: "Февраль", 3: "Март", 4: "Апрель",
                     5: "Май", 6: "Июнь", 7: "Июль", 8: "Август",
                     9: "Сентябрь", 10: "Октябрь", 11: "Ноябрь", 12: "Декабрь"
-                }.get(month, str(month))
+                }.get(bucket["month"], str(bucket["month"]))
 
                 buttons.append([InlineKeyboardButton(
-                    text=f"📅 {month_name} ({month_post_count} постов)",
-                    callback_data=f"archive_month_{year}_{month}"
+                    text=f"📅 {month_name} ({bucket['count']} постов)",
+                    callback_data=f"archive_month_{year}_{bucket['month']}"
                 )])
 
             # Add back button
@@ -542,14 +563,10 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
             response_text = f"📁 Архив постов за {month_name} {year} года:\n\n"
 
             # Add day buttons
-            days = sorted(posts_by_date[year][month].keys(), reverse=True)
-            for day in days:
-                # Count posts on this day
-                day_post_count = len(posts_by_date[year][month][day])
-
+            for bucket in buckets:
                 buttons.append([InlineKeyboardButton(
-                    text=f"📅 {day} {month_name} ({day_post_count} постов)",
-                    callback_data=f"archive_day_{year}_{month}_{day}"
+                    text=f"📅 {bucket['day']} {month_name} ({bucket['count']} постов)",
+                    callback_data=f"archive_day_{year}_{month}_{bucket['day']}"
                 )])
 
             # Add back button
@@ -569,12 +586,11 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
             response_text = f"📁 Архив постов за {day} {month_name} {year} года:\n\n"
 
             # Show posts for this day
-            day_posts = posts_by_date[year][month][day]
             for i, post in enumerate(day_posts, 1):
                 post_name = post.get("name", "Без названия")
                 created_at = datetime.fromisoformat(post.get("created_at").replace("Z", "+00:00"))
-                photo_count = len(post.get("photos", []))
-                video_count = len(post.get("videos", []))
+                photo_count = post.get("photo_count", 0)
+                video_count = post.get("video_count", 0)
 
                 # Add platform status indicators
                 vk_published_at = post.get("published_vk_at")
@@ -629,8 +645,7 @@ async def show_archived_posts(message: Message, year=None, month=None, day=None,
             # Store post IDs if we're showing posts
             if day is not None:
                 # Если мы на уровне дня, используем day_posts
-                posts_to_store = posts_by_date[year][month][day]
-                user_data = {f"post_{i}": post.get("id") for i, post in enumerate(posts_to_store, 1)}
+                user_data = {f"post_{i}": post.get("id") for i, post in enumerate(day_posts, 1)}
                 message.bot.user_data[message.from_user.id].update(user_data)
             elif posts_today:
                 # Если мы на корневом уровне и есть посты за сегодня
@@ -790,12 +805,14 @@ async def publish_to_vk(callback: CallbackQuery):
 
     # Check if already published
     if post.get("is_published_vk"):
-        # Создаем клавиатуру с кнопками "Далее" и "Назад"
+        # Создаем клавиатуру с кнопками "Далее", "Назад" и "Обновить опубликованный"
         buttons = [
             [
                 InlineKeyboardButton(text="⏭️ Далее", callback_data="republish_vk"),
                 InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_post")
-            ]
+            ],
+            # Изменить уже опубликованный пост вместо публикации нового
+            [InlineKeyboardButton(text="✏️ Обновить опубликованный", callback_data="update_published_vk")]
         ]
         keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -851,12 +868,14 @@ async def publish_to_telegram(callback: CallbackQuery):
 
     # Check if already published
     if post.get("is_published_telegram"):
-        # Создаем клавиатуру с кнопками "Далее" и "Назад"
+        # Создаем клавиатуру с кнопками "Далее", "Назад" и "Обновить опубликованный"
         buttons = [
             [
                 InlineKeyboardButton(text="⏭️ Далее", callback_data="republish_telegram"),
                 InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_post")
-            ]
+            ],
+            # Изменить уже опубликованный пост вместо публикации нового
+            [InlineKeyboardButton(text="✏️ Обновить опубликованный", callback_data="update_published_telegram")]
         ]
         keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -912,12 +931,14 @@ async def publish_to_instagram(callback: CallbackQuery):
 
     # Check if already published
     if post.get("is_published_instagram"):
-        # Создаем клавиатуру с кнопками "Далее" и "Назад"
+        # Создаем клавиатуру с кнопками "Далее", "Назад" и "Обновить опубликованный"
         buttons = [
             [
                 InlineKeyboardButton(text="⏭️ Далее", callback_data="republish_instagram"),
                 InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_post")
-            ]
+            ],
+            # Изменить уже опубликованный пост вместо публикации нового
+            [InlineKeyboardButton(text="✏️ Обновить опубликованный", callback_data="update_published_instagram")]
         ]
         keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -1215,12 +1236,14 @@ async def publish_to_all(callback: CallbackQuery):
 
     # Check if already published in any platform
     if post.get("is_published_vk") or post.get("is_published_telegram") or post.get("is_published_instagram"):
-        # Создаем клавиатуру с кнопками "Далее" и "Назад"
+        # Создаем клавиатуру с кнопками "Далее", "Назад" и "Обновить опубликованный"
         buttons = [
             [
                 InlineKeyboardButton(text="⏭️ Далее", callback_data="republish_all"),
                 InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_post")
-            ]
+            ],
+            # Изменить уже опубликованный пост вместо публикации нового
+            [InlineKeyboardButton(text="✏️ Обновить опубликованный", callback_data="update_published_all")]
         ]
         keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -1231,37 +1254,13 @@ async def publish_to_all(callback: CallbackQuery):
         )
         return
 
-    # Publish post to all platforms
-    await callback.message.edit_text(f"{callback.message.text}\n\n⏳ Публикую во все соцсети...")
+    # Publish post to all platforms it is not published to yet (concurrently)
+    platforms = [platform for platform in PLATFORM_NAMES if not post.get(f"is_published_{platform}")]
+    header = callback.message.text.split('⏳')[0]
+    await callback.message.edit_text(f"{header}\n\n⏳ Публикую во все соцсети...")
 
     try:
-        results = []
-
-        # Publish to VK if not already published
-        if not post.get("is_published_vk"):
-            vk_result = await publish_post_api(post_id, "vk")
-            results.append(("ВК", vk_result is not None))
-
-        # Publish to Telegram if not already published
-        if not post.get("is_published_telegram"):
-            tg_result = await publish_post_api(post_id, "telegram")
-            results.append(("Telegram", tg_result is not None))
-
-        # Publish to Instagram if not already published
-        if not post.get("is_published_instagram"):
-            ig_result = await publish_post_api(post_id, "instagram")
-            results.append(("Instagram", ig_result is not None))
-
-        # Format results
-        result_text = "\n\n📤 Результаты публикации:\n"
-        for platform, success in results:
-            status = "✅" if success else "❌"
-            result_text += f"{platform}: {status}\n"
-
-        await callback.message.edit_text(
-            f"{callback.message.text.split('⏳')[0]}{result_text}",
-            reply_markup=get_post_actions_keyboard()
-        )
+        await publish_with_progress(callback.message, post_id, platforms, header)
     except Exception as e:
         await callback.message.edit_text(
             f"{callback.message.text.split('⏳')[0]}\n\n❌ Ошибка: {str(e)}",
@@ -1288,32 +1287,48 @@ async def republish_to_all(callback: CallbackQuery):
         await callback.answer("❌ Пост не найден.", show_alert=True)
         return
 
-    # Publish post to all platforms
+    # Publish post to all platforms regardless of previous publication status (concurrently)
     await callback.message.edit_text(f"⏳ Публикую во все соцсети повторно...")
 
     try:
-        results = []
+        await publish_with_progress(callback.message, post_id, list(PLATFORM_NAMES), "🔁 Повторная публикация")
+    except Exception as e:
+        await callback.message.edit_text(
+            f"❌ Ошибка: {str(e)}",
+            reply_markup=get_post_actions_keyboard()
+        )
+
+    await callback.answer()
+
+@router.callback_query(F.data.startswith("update_published_"))
+async def update_published(callback: CallbackQuery):
+    """Edit the already published copies of the post in place."""
+    # Get selected post ID
+    user_data = callback.bot.user_data.get(callback.from_user.id, {})
+    post_id = user_data.get("selected_post")
+
+    if not post_id:
+        await callback.answer("❌ Пост не выбран.", show_alert=True)
+        return
 
-        # Publish to all platforms regardless of previous publication status
-        vk_result = await publish_post_api(post_id, "vk")
-        results.append(("ВК", vk_result is not None))
+    # Get post details
+    post = await get_post_api(post_id)
 
-        tg_result = await publish_post_api(post_id, "telegram")
-        results.append(("Telegram", tg_result is not None))
+    if not post:
+        await callback.answer("❌ Пост не найден.", show_alert=True)
+        return
 
-        ig_result = await publish_post_api(post_id, "instagram")
-        results.append(("Instagram", ig_result is not None))
+    # Обновляем пост на выбранной платформе или на всех, где он опубликован
+    target = callback.data[len("update_published_"):]
+    if target == "all":
+        platforms = [platform for platform in PLATFORM_NAMES if post.get(f"is_published_{platform}")]
+    else:
+        platforms = [target]
 
-        # Format results
-        result_text = "\n\n📤 Результаты публикации:\n"
-        for platform, success in results:
-            status = "✅" if success else "❌"
-            result_text += f"{platform}: {status}\n"
+    await callback.message.edit_text(f"⏳ Обновляю опубликованный пост...")
 
-        await callback.message.edit_text(
-            f"✅ Опубликовано повторно!{result_text}",
-            reply_markup=get_post_actions_keyboard()
-        )
+    try:
+        await publish_with_progress(callback.message, post_id, platforms, "✏️ Обновление публикации", mode="update")
     except Exception as e:
         await callback.message.edit_text(
             f"❌ Ошибка: {str(e)}",
@@ -1566,6 +1581,13 @@ async def edit_post(callback: CallbackQuery, state: FSMContext):
 
     await callback.answer()
 
+@router.callback_query(F.data.startswith("pending_page_"))
+async def pending_page(callback: CallbackQuery):
+    """Show another page of pending posts."""
+    await show_pending_posts(callback.message, int(callback.data.replace("pending_page_", "")))
+
+    await callback.answer()
+
 @router.callback_query(F.data == "back_to_posts")
 async def back_to_posts(callback: CallbackQuery):
     """Go back to the posts list."""
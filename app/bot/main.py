@@ -1,18 +1,19 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
+from aiogram import Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
 
-from app.config.settings import TELEGRAM_BOT_TOKEN
 from app.bot.handlers import start, post_creation, post_management
 from app.bot.middlewares.auth import AuthMiddleware
+from app.utils import clients
+from app.utils.clients import get_bot
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
 # Initialize bot and dispatcher
-bot = Bot(token=TELEGRAM_BOT_TOKEN)
+bot = get_bot()
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
@@ -40,8 +41,16 @@ async def main():
     # Set bot commands
     await set_commands()
 
-    # Start polling
+    # Start polling (stops on SIGINT/SIGTERM)
     await dp.start_polling(bot)
 
+async def run():
+    """Run the bot as a standalone process."""
+    await clients.startup()
+    try:
+        await main()
+    finally:
+        await clients.shutdown()
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(run())
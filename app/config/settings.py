@@ -18,12 +18,41 @@ VK_APP_ID = os.getenv("VK_APP_ID")
 VK_APP_SECRET = os.getenv("VK_APP_SECRET")
 VK_ACCESS_TOKEN = os.getenv("VK_ACCESS_TOKEN")
 VK_GROUP_ID = os.getenv("VK_GROUP_ID")
+# Parallel media downloads/uploads per VK post
+VK_DOWNLOAD_CONCURRENCY = int(os.getenv("VK_DOWNLOAD_CONCURRENCY", "4"))
+VK_UPLOAD_CONCURRENCY = int(os.getenv("VK_UPLOAD_CONCURRENCY", "3"))
+# Threads for blocking vk_api/requests calls shared by all VK publishers
+VK_MAX_CONCURRENCY = int(os.getenv("VK_MAX_CONCURRENCY", "4"))
+# Seconds the "Wall Photos" album id and the VK upload servers are reused
+VK_LOOKUP_TTL = int(os.getenv("VK_LOOKUP_TTL", "900"))
+
+# Threads for blocking instagrapi calls (one account, keep it low)
+INSTAGRAM_MAX_CONCURRENCY = int(os.getenv("INSTAGRAM_MAX_CONCURRENCY", "1"))
+
+# Processes for CPU-bound work (story image rendering)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))
+
+# Platform rate limits per process: Telegram requests per second and messages per
+# minute to one chat, VK API requests per second (3 for a user token, 20 for a group
+# token); retries after a flood-control answer (Telegram 429, VK error 6)
+TELEGRAM_RATE_LIMIT = float(os.getenv("TELEGRAM_RATE_LIMIT", "30"))
+TELEGRAM_CHAT_RATE_LIMIT = float(os.getenv("TELEGRAM_CHAT_RATE_LIMIT", "20"))
+VK_RATE_LIMIT = float(os.getenv("VK_RATE_LIMIT", "3"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "3"))
+
+# Seconds after which the shared VK/Instagram clients are checked again
+PLATFORM_CLIENT_TTL = int(os.getenv("PLATFORM_CLIENT_TTL", "3600"))
 
 # Telegram Channel settings
 TELEGRAM_CHANNEL_ID = os.getenv("TELEGRAM_CHANNEL_ID")
 
 # Database settings
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Connection pool (PostgreSQL): connections kept open, extra connections under load,
+# seconds after which a connection is replaced
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
 
 # Security settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
@@ -34,6 +63,30 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 API_HOST = os.getenv("API_HOST", "localhost")
 API_PORT = int(os.getenv("API_PORT", "8002"))
 
+# How the bot reaches posts and jobs: "direct" calls the service layer in-process,
+# "http" uses the REST API at API_HOST:API_PORT (bot deployed without database access)
+BOT_API_MODE = os.getenv("BOT_API_MODE", "direct").lower()
+
+# Launch mode of main.py: API worker processes, seconds to wait for processes
+# to stop, development mode (single process with auto-reload)
+API_WORKERS = int(os.getenv("API_WORKERS", "2"))
+SHUTDOWN_TIMEOUT = int(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+DEV_MODE = os.getenv("DEV_MODE", "false").lower() in ("1", "true", "yes")
+
+# Shared HTTP client settings
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "300"))
+
+# Publication job queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "3"))  # workers started by main.py, 0 to run them separately
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "1"))  # retries may publish a post twice
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "60"))
+JOB_WAIT_TIMEOUT = int(os.getenv("JOB_WAIT_TIMEOUT", "900"))  # how long the bot waits for a job
+
 # Media storage settings
 MEDIA_DIR = BASE_DIR / "media"
 MEDIA_STRUCTURE = "{year}/{month}/{day}/{post_name}"
@@ -41,6 +94,14 @@ MEDIA_STRUCTURE = "{year}/{month}/{day}/{post_name}"
 # Ensure media directory exists
 MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 
+# Media cache settings (Telegram files downloaded once and shared by all publishers)
+MEDIA_CACHE_DIR = MEDIA_DIR / "cache"
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# Telegram getFile cache (file_path stays valid for about an hour)
+TELEGRAM_FILE_PATH_TTL = int(os.getenv("TELEGRAM_FILE_PATH_TTL", "3300"))
+TELEGRAM_FILE_PATH_NEGATIVE_TTL = int(os.getenv("TELEGRAM_FILE_PATH_NEGATIVE_TTL", "30"))
+
 # Настройки подписей для социальных сетей
 SIGNATURE_ENABLED = os.getenv("SIGNATURE_ENABLED", "true").lower() == "true"
 SIGNATURE_VK = os.getenv("SIGNATURE_VK", "")
@@ -1,15 +1,49 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from app.config.settings import DATABASE_URL
+from app.config.settings import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE
+
+# Async drivers for the sync database URLs
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def make_async_url(url: str) -> str:
+    """Return ``url`` with the async driver (asyncpg or aiosqlite) for its dialect."""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def engine_options(url: str) -> dict:
+    """Connection pool settings; SQLite keeps the default pool."""
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
 
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for coroutines (async endpoints, publishers, queue workers):
+# database round trips do not block the event loop shared with the bot
+async_engine = create_async_engine(make_async_url(DATABASE_URL), **engine_options(DATABASE_URL))
+
+# Objects stay usable after commit: lazy loading is not available in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Create base class for models
 Base = declarative_base()
 
@@ -20,3 +54,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session (for async def endpoints)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,16 +1,18 @@
 import logging
-from sqlalchemy.orm import Session
+from alembic import command
+from alembic.config import Config
 
-from app.db.database import SessionLocal, engine, Base
-from app.api.models.post import Post, PublicationLog
+from app.db.database import SessionLocal
+from app.db.schema import ALEMBIC_INI
+from app.api.models.post import Post
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_db():
     """Initialize the database."""
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Create or update tables with the migrations
+    command.upgrade(Config(str(ALEMBIC_INI)), "head")
     
     # Create session
     db = SessionLocal()
@@ -0,0 +1,37 @@
+"""
+Schema version check.
+
+The schema is managed by Alembic (``alembic upgrade head``, see init_db.sh);
+processes only compare the database revision with the latest migration at
+startup instead of running ``create_all``.
+"""
+import logging
+from pathlib import Path
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent.parent / "alembic.ini"
+
+
+def check_schema(engine: Engine) -> bool:
+    """Return True if the database is at the latest migration, log a warning otherwise."""
+    try:
+        heads = set(ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_heads())
+        with engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+    except Exception as e:
+        logger.warning(f"Could not check the database schema version: {str(e)}")
+        return False
+
+    if current != heads:
+        logger.warning(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, "
+            f"latest is {', '.join(sorted(heads))}: run `alembic upgrade head`"
+        )
+        return False
+    return True
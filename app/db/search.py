@@ -0,0 +1,92 @@
+"""
+Full-text search over post texts.
+
+PostgreSQL: a generated ``search_vector`` tsvector column (russian
+configuration) with a GIN index, plus a ``pg_trgm`` GIN index on ``text`` for
+substring and typo-tolerant matches.
+SQLite: an FTS5 table ``posts_fts`` with the post id in an unindexed column
+(the implicit rowid of ``posts`` is not stable), kept in sync by triggers.
+
+These objects are created by the migrations ``add_posts_search`` and
+``key_posts_fts_by_post_id``;
+``apply_text_search`` adds the match condition and the relevance ordering
+to a posts query.
+"""
+import logging
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Float, String, func, inspect, literal_column, or_, text
+from sqlalchemy.orm import Query
+
+from app.api.models.post import Post
+
+logger = logging.getLogger(__name__)
+
+# Whether the search objects exist, per dialect (checked once per process)
+_available: Dict[str, bool] = {}
+
+
+def _search_available(bind) -> bool:
+    """Check that the migration ``add_posts_search`` created the search objects."""
+    dialect = bind.dialect.name
+    if dialect not in _available:
+        try:
+            inspector = inspect(bind)
+            if dialect == "postgresql":
+                _available[dialect] = any(
+                    column["name"] == "search_vector" for column in inspector.get_columns("posts")
+                )
+            elif dialect == "sqlite":
+                _available[dialect] = inspector.has_table("posts_fts")
+            else:
+                _available[dialect] = False
+        except Exception as e:
+            logger.warning(f"Could not check full-text search objects: {str(e)}")
+            return False
+        if not _available[dialect]:
+            # Search falls back to ILIKE without the indexes
+            logger.warning("Full-text search is not set up, run the database migrations")
+    return _available[dialect]
+
+
+def _fts5_query(term: str) -> str:
+    """Turn user input into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r"\w+", term)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def apply_text_search(query: Query, term: str) -> Tuple[Query, object, List]:
+    """Prepare a text search over ``query``.
+
+    Returns the (possibly joined) query, the match condition and the
+    ORDER BY clauses that rank the best matches first.
+    """
+    bind = query.session.bind
+    dialect = bind.dialect.name
+    available = _search_available(bind)
+
+    if dialect == "postgresql" and available:
+        ts_query = func.websearch_to_tsquery("russian", term)
+        search_vector = literal_column("posts.search_vector")
+        condition = or_(
+            search_vector.op("@@")(ts_query),
+            # pg_trgm: the term is similar to some part of the text (typos)
+            Post.text.op("%>")(term),
+            # pg_trgm index also serves substring matches
+            Post.text.ilike(f"%{term}%")
+        )
+        rank = func.ts_rank_cd(search_vector, ts_query) + func.word_similarity(term, Post.text)
+        return query, condition, [rank.desc(), Post.created_at.desc()]
+
+    if dialect == "sqlite" and available:
+        match = _fts5_query(term)
+        if match:
+            fts = text(
+                "SELECT post_id, bm25(posts_fts) AS rank FROM posts_fts WHERE posts_fts MATCH :match"
+            ).bindparams(match=match).columns(post_id=String, rank=Float).subquery("fts")
+            query = query.outerjoin(fts, fts.c.post_id == Post.id)
+            # bm25() is lower for better matches
+            return query, fts.c.post_id.isnot(None), [fts.c.rank.asc().nulls_last(), Post.created_at.desc()]
+
+    return query, Post.text.ilike(f"%{term}%"), [Post.created_at.desc()]
@@ -0,0 +1,7 @@
+"""
+Application services shared by the FastAPI routers and the Telegram bot.
+
+Routers translate HTTP requests into service calls; the bot calls the same
+functions directly (see ``app.bot.api_client``) instead of making HTTP
+requests to its own API.
+"""
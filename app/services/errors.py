@@ -0,0 +1,16 @@
+from typing import Optional
+
+
+class ServiceError(Exception):
+    """Error of a service call; ``status_code`` is the matching HTTP status."""
+    status_code = 400
+
+    def __init__(self, detail: str, status_code: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        if status_code is not None:
+            self.status_code = status_code
+
+
+class NotFoundError(ServiceError):
+    status_code = 404
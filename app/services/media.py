@@ -0,0 +1,46 @@
+"""Post files on disk (text.txt, media.json)."""
+import os
+import json
+import shutil
+from datetime import datetime
+
+from app.config.settings import MEDIA_DIR, MEDIA_STRUCTURE
+
+
+def create_storage_path(post_name: str) -> str:
+    """Create a storage path for the post based on current date and post name."""
+    now = datetime.now()
+    path = MEDIA_STRUCTURE.format(
+        year=now.strftime("%Y"),
+        month=now.strftime("%m"),
+        day=now.strftime("%d"),
+        post_name=post_name.replace(" ", "_").replace("/", "_")
+    )
+    full_path = MEDIA_DIR / path
+    os.makedirs(full_path, exist_ok=True)
+    return path
+
+
+def save_post_files(storage_path: str, text: str, photos, videos):
+    """Write the post text and media references to its storage directory."""
+    post_dir = MEDIA_DIR / storage_path
+    os.makedirs(post_dir, exist_ok=True)
+
+    # Save post text to file
+    with open(post_dir / "text.txt", "w", encoding="utf-8") as f:
+        f.write(text)
+
+    # Save media references to file
+    with open(post_dir / "media.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "photos": photos,
+            "videos": videos
+        }, f, ensure_ascii=False, indent=2)
+
+
+def delete_post_files(storage_path: str):
+    """Delete the storage directory of a post."""
+    post_dir = MEDIA_DIR / storage_path
+    if os.path.exists(post_dir):
+        shutil.rmtree(post_dir)
+
@@ -0,0 +1,293 @@
+"""Post operations shared by the posts router and the bot."""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import and_, or_, func, extract, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, noload
+
+from app.api.models.post import Post
+from app.api.schemas.post import PostCreate, Post as PostSchema, PostListItem
+from app.db.search import apply_text_search
+from app.services.errors import ServiceError, NotFoundError
+from app.services.media import create_storage_path, save_post_files, delete_post_files
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.date_ranges import period_bounds, parse_date_query
+
+# Length of the text excerpt in the compact list view
+EXCERPT_LENGTH = 100
+
+POST_STATUSES = ("pending", "archived", "all")
+PLATFORMS = ("vk", "telegram", "instagram")
+# "update" edits the copy published before instead of publishing a new one
+PUBLISH_MODES = ("publish", "update")
+
+
+def generate_post_name(text: str, max_length: int = 70) -> str:
+    """Generate a post name from the first words of the text with timestamp."""
+    # Берем больше слов для информативности
+    words = text.split()
+    name = " ".join(words[:8])  # Take first 8 words instead of 5
+
+    # Добавляем временную метку для уникальности
+    timestamp = datetime.now().strftime("%d%m%H%M")
+
+    # Обрезаем название, оставляя место для временной метки
+    if len(name) > (max_length - 10):
+        name = name[:(max_length - 10)] + "..."
+
+    # Добавляем временную метку в конец названия
+    name = f"{name} [{timestamp}]"
+
+    return name
+
+
+def create_post(db: Session, post_data: PostCreate) -> Post:
+    """Create a new post and its storage directory."""
+    # Generate post name from text
+    post_name = generate_post_name(post_data.text)
+
+    # Create storage path
+    storage_path = create_storage_path(post_name)
+
+    # Ensure photos and videos are lists
+    photos = post_data.photos if isinstance(post_data.photos, list) else []
+    videos = post_data.videos if isinstance(post_data.videos, list) else []
+
+    # Create post object
+    db_post = Post(
+        text=post_data.text,
+        photos=photos,
+        videos=videos,
+        name=post_name,
+        storage_path=storage_path
+    )
+
+    # Save post to database
+    db.add(db_post)
+    db.commit()
+    db.refresh(db_post)
+
+    save_post_files(storage_path, post_data.text, photos, videos)
+    return db_post
+
+
+def post_list_columns():
+    """Columns of the compact list view, computed in SQL (text excerpt, media counts)."""
+    return [
+        Post.id,
+        Post.name,
+        Post.created_at,
+        Post.status,
+        func.substr(Post.text, 1, EXCERPT_LENGTH).label("excerpt"),
+        func.coalesce(func.json_array_length(Post.photos), 0).label("photo_count"),
+        func.coalesce(func.json_array_length(Post.videos), 0).label("video_count"),
+        func.coalesce(Post.is_published_vk, False).label("is_published_vk"),
+        func.coalesce(Post.is_published_telegram, False).label("is_published_telegram"),
+        func.coalesce(Post.is_published_instagram, False).label("is_published_instagram"),
+        Post.published_vk_at,
+        Post.published_telegram_at,
+        Post.published_instagram_at,
+    ]
+
+
+def list_posts(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    view: str = "compact",
+    include_logs: bool = False,
+    search: Optional[str] = None,
+    status: str = "all",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    published_vk: Optional[bool] = None,
+    published_telegram: Optional[bool] = None,
+    published_instagram: Optional[bool] = None,
+    include_total: bool = False,
+) -> dict:
+    """List posts; see ``GET /api/posts/`` for the parameters.
+
+    Returns ``{"posts": [...], "next_cursor": ..., "total": ...}`` with
+    ``PostListItem`` (compact view) or ``Post`` schema objects; ``total`` is
+    only counted with ``include_total``.
+    """
+    if status not in POST_STATUSES:
+        raise ServiceError("Invalid status")
+    if view not in ("compact", "full"):
+        raise ServiceError("Invalid view")
+
+    if view == "compact":
+        query = db.query(*post_list_columns())
+    else:
+        # Logs are loaded in one extra query for the whole page, and only on request
+        query = db.query(Post).options(selectinload(Post.logs) if include_logs else noload(Post.logs))
+    order_by = [Post.created_at.desc(), Post.id.desc()]
+
+    # Filter by archive status (indexed stored column) and per-platform flags
+    if status != "all":
+        query = query.filter(Post.status == status)
+    for column, value in (
+        (Post.is_published_vk, published_vk),
+        (Post.is_published_telegram, published_telegram),
+        (Post.is_published_instagram, published_instagram),
+    ):
+        if value is not None:
+            query = query.filter(func.coalesce(column, False) == value)
+
+    # Range predicates use the created_at indexes
+    if created_from:
+        query = query.filter(Post.created_at >= created_from)
+    if created_to:
+        query = query.filter(Post.created_at < created_to)
+
+    # If search parameter is provided, filter posts
+    if search:
+        # Всегда выполняем поиск по тексту (полнотекстовый индекс, результаты по релевантности)
+        query, condition, order_by = apply_text_search(query, search)
+
+        # Если строка похожа на дату, также ищем по диапазону created_at (индекс) в том же запросе
+        date_range = parse_date_query(search)
+        if date_range:
+            start, end = date_range
+            condition = or_(condition, and_(Post.created_at >= start, Post.created_at < end))
+            order_by = [Post.created_at.desc(), Post.id.desc()]
+
+        query = query.filter(condition)
+
+    # Number of matching posts before pagination (uses the same indexed filters)
+    total = None
+    if include_total:
+        total = query.with_entities(func.count(Post.id)).order_by(None).scalar()
+
+    # Keyset pagination on (created_at, id); search results are ordered by relevance
+    use_cursor = not search
+    if use_cursor and cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            raise ServiceError("Invalid cursor")
+        query = query.filter(tuple_(Post.created_at, Post.id) < tuple_(cursor_created_at, cursor_id))
+        skip = 0
+
+    # Order by relevance (text search) or creation date; one extra row tells if there is a next page
+    rows = query.order_by(*order_by).offset(skip).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if use_cursor and has_more and rows:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    if view == "compact":
+        posts = [PostListItem.model_validate(row._mapping) for row in rows]
+    else:
+        posts = [PostSchema.model_validate(row, from_attributes=True) for row in rows]
+    return {"posts": posts, "next_cursor": next_cursor, "total": total}
+
+
+def post_calendar(
+    db: Session,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    status: str = "all",
+    created_to: Optional[datetime] = None,
+) -> dict:
+    """Count posts per year, per month of ``year`` or per day of ``year``/``month``.
+
+    The counts are computed by the database over a ``created_at`` range;
+    ``created_to`` excludes posts created at or after that moment.
+    """
+    if status not in POST_STATUSES:
+        raise ServiceError("Invalid status")
+    if month is not None and year is None:
+        raise ServiceError("month requires year")
+
+    # Group by the level below the requested period
+    fields = ["year"]
+    if year is not None:
+        fields.append("month")
+    if month is not None:
+        fields.append("day")
+    columns = [extract(field, Post.created_at).label(field) for field in fields]
+
+    query = db.query(*columns, func.count(Post.id).label("count"))
+    if status != "all":
+        query = query.filter(Post.status == status)
+    if year is not None:
+        try:
+            start, end = period_bounds(year, month)
+        except ValueError:
+            raise ServiceError("Invalid date")
+        query = query.filter(Post.created_at >= start, Post.created_at < end)
+    if created_to:
+        query = query.filter(Post.created_at < created_to)
+
+    rows = query.group_by(*columns).order_by(*(column.desc() for column in columns)).all()
+
+    return {
+        "buckets": [
+            {**{field: int(getattr(row, field)) for field in fields}, "count": row.count}
+            for row in rows
+        ]
+    }
+
+
+def get_post(db: Session, post_id: str) -> Post:
+    """Get a post by ID."""
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if post is None:
+        raise NotFoundError("Post not found")
+    return post
+
+
+def delete_post(db: Session, post_id: str):
+    """Delete a post and its files."""
+    post = get_post(db, post_id)
+
+    # Delete post from database
+    db.delete(post)
+    db.commit()
+
+    # Delete post files
+    delete_post_files(post.storage_path)
+
+
+async def update_post(db: AsyncSession, post_id: str, data: dict) -> Post:
+    """Update the text and/or media of a post (keys "text", "photos", "videos")."""
+    # Получаем пост из базы данных (логи нужны для ответа, ленивой загрузки в async нет)
+    post = (await db.execute(
+        select(Post).where(Post.id == post_id).options(selectinload(Post.logs))
+    )).scalars().first()
+    if post is None:
+        raise NotFoundError("Post not found")
+
+    # Обновляем поля поста
+    if "text" in data:
+        post.text = data["text"]
+        # Обновляем имя поста на основе нового текста
+        post.name = generate_post_name(data["text"])
+
+    # Медиа всегда хранятся списком: списки постов считают их длину в SQL
+    for field in ("photos", "videos"):
+        if field in data:
+            value = data[field] if data[field] is not None else []
+            if not isinstance(value, list) or not all(isinstance(file_id, str) for file_id in value):
+                raise ServiceError(f"{field} must be a list of file ids")
+            setattr(post, field, value)
+
+    # Обновляем время изменения
+    post.updated_at = datetime.now(timezone.utc)
+
+    # Если у поста нет пути хранения, создаем новый
+    if not post.storage_path:
+        post.storage_path = create_storage_path(post.name)
+
+    # Сохраняем изменения в базе данных
+    await db.commit()
+    await db.refresh(post)
+
+    # Обновляем текстовый файл и файл с медиа
+    save_post_files(post.storage_path, post.text, post.photos, post.videos)
+    return post
@@ -0,0 +1,123 @@
+"""Queueing publications and reading job status."""
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.models.job import PublishJob
+from app.api.models.post import Post
+from app.api.models.story import Story
+from app.services.errors import ServiceError, NotFoundError
+from app.services.posts import PLATFORMS, PUBLISH_MODES
+from app.workers.queue import enqueue_job
+
+
+async def publish_post(db: AsyncSession, post_id: str, platform: str, mode: str = "publish") -> PublishJob:
+    """Queue a post for publication to a specific platform.
+
+    In "update" mode the copy published before is edited in place; a post
+    never published to the platform is published as usual.
+    """
+    post = await db.get(Post, post_id)
+    if post is None:
+        raise NotFoundError("Post not found")
+
+    if platform not in PLATFORMS:
+        raise ServiceError("Invalid platform")
+
+    if mode not in PUBLISH_MODES:
+        raise ServiceError("Invalid publish mode")
+
+    # The publication itself runs in a queue worker, poll the job for the result
+    return await enqueue_job(db, "post", platform, post_id=post.id, mode=mode)
+
+
+async def publish_post_to_targets(db: AsyncSession, post_id: str, platforms: List[str],
+                                  only_unpublished: bool = False, mode: str = "publish") -> dict:
+    """Queue a post for publication to several platforms at once.
+
+    One job per platform is queued under a common batch id, so the platforms
+    are published concurrently and each reports its result on its own.
+    """
+    post = await db.get(Post, post_id)
+    if post is None:
+        raise NotFoundError("Post not found")
+
+    platforms = list(dict.fromkeys(platforms))
+    if not platforms or any(platform not in PLATFORMS for platform in platforms):
+        raise ServiceError("Invalid platform")
+
+    if mode not in PUBLISH_MODES:
+        raise ServiceError("Invalid publish mode")
+
+    if only_unpublished:
+        platforms = [platform for platform in platforms if not getattr(post, f"is_published_{platform}")]
+
+    batch_id = str(uuid.uuid4())
+    jobs = [await enqueue_job(db, "post", platform, post_id=post.id, batch_id=batch_id, mode=mode)
+            for platform in platforms]
+    return {"batch_id": batch_id, "jobs": jobs}
+
+
+async def publish_story(db: AsyncSession, story_id: str) -> PublishJob:
+    """Queue a story for publication."""
+    story = await db.get(Story, story_id)
+    if story is None:
+        raise NotFoundError("Story not found")
+
+    # The publication itself runs in a queue worker (publishers skip already published stories)
+    return await enqueue_job(db, "story", story.platform, story_id=story.id)
+
+
+async def get_job(db: AsyncSession, job_id: str) -> PublishJob:
+    """Get a publication job."""
+    job = await db.get(PublishJob, job_id)
+    if job is None:
+        raise NotFoundError("Job not found")
+    return job
+
+
+async def get_job_batch(db: AsyncSession, batch_id: str) -> dict:
+    """Get all jobs queued by one publish request."""
+    jobs = (await db.execute(
+        select(PublishJob).where(PublishJob.batch_id == batch_id).order_by(PublishJob.created_at)
+    )).scalars().all()
+    if not jobs:
+        raise NotFoundError("Batch not found")
+    return {"batch_id": batch_id, "jobs": jobs}
+
+
+async def job_metrics(db: AsyncSession, hours: int = 24) -> dict:
+    """Queue wait and rate limit wait of the jobs finished in the last ``hours`` per kind and platform."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    rows = (await db.execute(
+        select(
+            PublishJob.kind, PublishJob.platform, PublishJob.status,
+            PublishJob.created_at, PublishJob.started_at, PublishJob.throttled_seconds
+        ).where(PublishJob.finished_at >= since)
+    )).all()
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.kind, row.platform), []).append(row)
+
+    platforms = []
+    for (kind, platform), jobs in sorted(groups.items()):
+        queue_waits = [
+            (job.started_at - job.created_at).total_seconds()
+            for job in jobs if job.started_at and job.created_at
+        ] or [0.0]
+        throttled = [job.throttled_seconds or 0.0 for job in jobs]
+        platforms.append({
+            "kind": kind,
+            "platform": platform,
+            "jobs": len(jobs),
+            "failed": sum(job.status == "error" for job in jobs),
+            "avg_queue_wait": sum(queue_waits) / len(queue_waits),
+            "max_queue_wait": max(queue_waits),
+            "avg_throttled": sum(throttled) / len(throttled),
+            "max_throttled": max(throttled),
+        })
+    return {"since": since, "platforms": platforms}
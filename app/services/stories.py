@@ -0,0 +1,66 @@
+"""Story operations shared by the stories router and the bot."""
+from sqlalchemy.orm import Session
+
+from app.api.models.story import Story
+from app.services.errors import ServiceError, NotFoundError
+from app.services.posts import PLATFORMS, get_post
+from app.utils.text_extractor import extract_model_and_price
+
+
+def create_story(db: Session, post_id: str, platform: str) -> Story:
+    """Create a story for a post; an existing story for the platform is returned as is."""
+    # Check if platform is valid
+    if platform not in PLATFORMS:
+        raise ServiceError("Invalid platform")
+
+    # Get post from database
+    post = get_post(db, post_id)
+
+    # Check if story already exists for this post and platform
+    existing_story = db.query(Story).filter(
+        Story.post_id == post_id,
+        Story.platform == platform
+    ).first()
+
+    if existing_story:
+        return existing_story
+
+    # Extract model name and price from post text
+    model_name, price = extract_model_and_price(post.text)
+
+    # Get first photo as media file
+    media_file_id = post.photos[0] if post.photos else None
+
+    # Post link is set after the post is published
+    post_link = None
+
+    # Create story object
+    db_story = Story(
+        post_id=post_id,
+        platform=platform,
+        model_name=model_name,
+        price=price,
+        media_file_id=media_file_id,
+        post_link=post_link
+    )
+
+    # Save story to database
+    db.add(db_story)
+    db.commit()
+    db.refresh(db_story)
+
+    return db_story
+
+
+def list_stories(db: Session, skip: int = 0, limit: int = 100) -> dict:
+    """Get all stories."""
+    stories = db.query(Story).offset(skip).limit(limit).all()
+    return {"stories": stories}
+
+
+def get_story(db: Session, story_id: str) -> Story:
+    """Get a story by ID."""
+    story = db.query(Story).filter(Story.id == story_id).first()
+    if story is None:
+        raise NotFoundError("Story not found")
+    return story
@@ -0,0 +1,76 @@
+"""
+Application-scoped network clients shared by the API, the bot and the workers.
+
+``startup()`` creates one keep-alive aiohttp session and one aiogram ``Bot``,
+``shutdown()`` closes them. The bot's requests go through the Telegram rate
+limiter (``app.workers.rate_limit``). Both getters also create the clients lazily, so
+code running outside ``main.py`` (for example ``uvicorn app.api.main:app``)
+works without an explicit startup call.
+"""
+import logging
+from typing import Optional
+
+import aiohttp
+from aiogram import Bot
+
+from app.config.settings import (
+    TELEGRAM_BOT_TOKEN, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_TIMEOUT
+)
+from app.workers.rate_limit import TelegramRateLimitMiddleware
+
+logger = logging.getLogger(__name__)
+
+_http_session: Optional[aiohttp.ClientSession] = None
+_bot: Optional[Bot] = None
+
+
+def _create_http_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+    )
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared aiohttp session. Callers must not close it."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = _create_http_session()
+    return _http_session
+
+
+def get_bot() -> Bot:
+    """Return the shared aiogram Bot. Callers must not close its session."""
+    global _bot
+    if _bot is None:
+        _bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        # All requests of the bot share the Telegram rate limits of this process
+        _bot.session.middleware(TelegramRateLimitMiddleware())
+    return _bot
+
+
+async def startup():
+    """Create the shared clients (safe to call more than once)."""
+    get_http_session()
+    get_bot()
+    logger.info("Shared HTTP session and Telegram bot created")
+
+
+async def shutdown():
+    """Close the shared clients."""
+    global _http_session, _bot
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+    if _bot is not None:
+        await _bot.session.close()
+    _bot = None
+    logger.info("Shared HTTP session and Telegram bot closed")
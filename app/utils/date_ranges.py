@@ -0,0 +1,60 @@
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+
+def period_bounds(year: int, month: Optional[int] = None, day: Optional[int] = None) -> Tuple[datetime, datetime]:
+    """Return the half-open range [start, end) covering a year, a month or a day.
+
+    Filtering with ``start <= created_at < end`` can use an index on
+    ``created_at``, unlike ``extract(...) == value`` comparisons.
+    Raises ValueError for dates that do not exist.
+    """
+    if month is None:
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+    if day is None:
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        return start, end
+
+    start = datetime(year, month, day)
+    return start, start + timedelta(days=1)
+
+
+# Date formats tried in order: regex with named groups; "yy" is a 2-digit year.
+# ".", "/" or "-" are optional separators.
+DATE_PATTERNS = [
+    re.compile(r"(?P<year>\d{4})"),
+    re.compile(r"(?P<month>\d{2})[./-]?(?P<yy>\d{2})"),
+    re.compile(r"(?P<day>\d{2})[./-]?(?P<month>\d{2})[./-]?(?P<yy>\d{2})"),
+    re.compile(r"(?P<year>\d{4})[./-]?(?P<month>\d{2})"),
+    re.compile(r"(?P<year>\d{4})[./-]?(?P<month>\d{2})[./-]?(?P<day>\d{2})"),
+]
+
+
+def parse_date_query(search: str) -> Optional[Tuple[datetime, datetime]]:
+    """Parse a search string that looks like a date into a [start, end) range.
+
+    Supported formats: YYYY, MMYY / MM.YY, DDMMYY / DD.MM.YY, YYYYMM / YYYY.MM
+    and YYYYMMDD / YYYY.MM.DD. An ambiguous string (e.g. 202403) gets the
+    first format that gives a valid date. Returns None if nothing matches.
+    """
+    search = search.strip()
+    for pattern in DATE_PATTERNS:
+        match = pattern.fullmatch(search)
+        if not match:
+            continue
+
+        parts = {key: int(value) for key, value in match.groupdict().items()}
+        year = parts.get("year") or parts["yy"] + 2000
+        # Проверяем, что год находится в разумных пределах (1900-2100)
+        if not 1900 <= year <= 2100:
+            continue
+        try:
+            return period_bounds(year, parts.get("month"), parts.get("day"))
+        except ValueError:
+            # Например, 31.02 или 13-й месяц
+            continue
+
+    return None
@@ -0,0 +1,378 @@
+import os
+import ssl
+import json
+import time
+import fcntl
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.config.settings import TELEGRAM_BOT_TOKEN, MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES
+from app.utils.clients import get_http_session
+from app.utils.telegram_files import file_resolver
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# How often a process waiting for another process's download checks its lock
+DOWNLOAD_LOCK_POLL_INTERVAL = 0.1
+# Files added by other processes are not in this process's size estimate:
+# rescan the cache at least this often (seconds)
+EVICT_RESCAN_INTERVAL = 300
+
+
+class MediaCache:
+    """On-disk LRU cache for Telegram files.
+
+    Files are stored once per ``file_unique_id`` under ``<root>/files``.
+    Every ``file_id`` that was ever resolved gets a small index entry under
+    ``<root>/ids`` pointing to the stored file, so later lookups by the same
+    ``file_id`` never touch the network. The total size of ``<root>/files``
+    and of the directories of files derived from them (``derived_dir``, e.g.
+    rendered stories) is kept under ``max_bytes`` by evicting the least
+    recently used files.
+
+    Downloads of the same file are shared by the coroutines of a process
+    (per-``file_id`` locks) and by all processes using the cache (a file lock
+    per stored file), so API, bot and worker processes download a file once.
+
+    Disk reads and writes run in threads, off the event loop. The cache is
+    scanned for eviction only when the estimated size exceeds ``max_bytes``
+    or the last scan is older than ``EVICT_RESCAN_INTERVAL``.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.files_dir = self.root / "files"
+        self.ids_dir = self.root / "ids"
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._prefetch_tasks: Set[asyncio.Task] = set()
+        self._evicted_dirs: List[Path] = [self.files_dir]
+        # Size estimate of the evicted directories (None until the first scan)
+        self._size: Optional[int] = None
+        self._scanned_at = 0.0
+        self._size_lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self.ids_dir.mkdir(parents=True, exist_ok=True)
+
+    def derived_dir(self, name: str) -> Path:
+        """Directory for files made from cached files; they count against ``max_bytes``."""
+        path = self.root / name
+        path.mkdir(parents=True, exist_ok=True)
+        if path not in self._evicted_dirs:
+            self._evicted_dirs.append(path)
+        return path
+
+    def _index_path(self, file_id: str) -> Path:
+        return self.ids_dir / f"{hashlib.sha1(file_id.encode()).hexdigest()}.json"
+
+    def _read_entry(self, file_id: str) -> Optional[dict]:
+        try:
+            with open(self._index_path(file_id), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_entry(self, file_id: str, entry: dict):
+        index_path = self._index_path(file_id)
+        temp_path = index_path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, index_path)
+
+    @staticmethod
+    def _touch(path: Path):
+        """Mark a file as recently used (LRU order is based on mtime)."""
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    def lookup(self, file_id: str) -> Optional[Path]:
+        """Return the cached file for ``file_id`` or None, without any network calls."""
+        entry = self._read_entry(file_id)
+        if not entry:
+            return None
+
+        path = self.files_dir / entry["name"]
+        if not path.exists():
+            return None
+
+        self._touch(path)
+        return path
+
+    def content_type(self, file_id: str) -> str:
+        """Guess the content type of a cached file from its Telegram file_path."""
+        entry = self._read_entry(file_id) or {}
+        content_type, _ = mimetypes.guess_type(entry.get("file_path") or entry.get("name", ""))
+        return content_type or "application/octet-stream"
+
+    async def get_path(self, file_id: str) -> Optional[Path]:
+        """Return a local path for ``file_id``, downloading it from Telegram on a miss.
+
+        Concurrent requests for the same file_id share a single download.
+        """
+        path = self.lookup(file_id)
+        if path:
+            return path
+
+        lock = self._locks.setdefault(file_id, asyncio.Lock())
+        async with lock:
+            try:
+                # Another coroutine may have finished the download while we waited
+                path = self.lookup(file_id)
+                if path:
+                    return path
+                return await self._fetch(file_id)
+            except Exception as e:
+                logger.error(f"Error caching Telegram file {file_id}: {str(e)}")
+                return None
+            finally:
+                self._locks.pop(file_id, None)
+
+    async def get_bytes(self, file_id: str) -> Optional[bytes]:
+        """Return the content of ``file_id`` (read from the local cache)."""
+        path = await self.get_path(file_id)
+        if not path:
+            return None
+        return await asyncio.to_thread(path.read_bytes)
+
+    async def prefetch(self, file_ids: Iterable[str]):
+        """Download several files into the cache concurrently."""
+        await asyncio.gather(*(self.get_path(file_id) for file_id in dict.fromkeys(file_ids)))
+
+    def schedule_prefetch(self, file_ids: Iterable[str]):
+        """Start ``prefetch`` in the background.
+
+        Publishers that ask for the same files in the meantime, in this or
+        another process, wait for these downloads instead of starting their own.
+        """
+        task = asyncio.ensure_future(self.prefetch(list(file_ids)))
+        self._prefetch_tasks.add(task)
+        task.add_done_callback(self._prefetch_tasks.discard)
+
+    async def resolve(self, file_id: str):
+        """Return Telegram file info (file_path, file_unique_id, file_size)."""
+        return await file_resolver.resolve(file_id)
+
+    async def unique_id(self, file_id: str) -> Optional[str]:
+        """Return the file_unique_id of ``file_id`` (from the index, else via getFile)."""
+        entry = self._read_entry(file_id)
+        if entry and entry.get("file_unique_id"):
+            return entry["file_unique_id"]
+        try:
+            return (await self.resolve(file_id)).file_unique_id
+        except Exception as e:
+            logger.warning(f"Could not resolve file_unique_id of {file_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def file_url(file_path: str) -> str:
+        return f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
+
+    @staticmethod
+    def ssl_context() -> ssl.SSLContext:
+        """SSL context without certificate verification (same as the old download helpers)."""
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return ssl_context
+
+    def _entry_for(self, file_info) -> dict:
+        extension = os.path.splitext(file_info.file_path or "")[1].lower() or ".bin"
+        return {
+            "name": f"{file_info.file_unique_id}{extension}",
+            "file_path": file_info.file_path,
+            "file_unique_id": file_info.file_unique_id,
+        }
+
+    def link_existing(self, file_id: str, file_info) -> Optional[Path]:
+        """Index ``file_id`` if the same file is already cached under another file_id."""
+        entry = self._entry_for(file_info)
+        path = self.files_dir / entry["name"]
+        if not path.exists():
+            return None
+
+        self._write_entry(file_id, entry)
+        self._touch(path)
+        return path
+
+    def open_writer(self, file_id: str, file_info) -> "CacheWriter":
+        """Start writing a file into the cache; call ``commit()`` once all chunks are written."""
+        return CacheWriter(self, file_id, self._entry_for(file_info))
+
+    def _lock_path(self, name: str) -> Path:
+        return self.files_dir / f".{name}.lock"
+
+    @asynccontextmanager
+    async def _download_lock(self, name: str):
+        """Exclusive lock on a stored file shared by all processes using the cache."""
+        with open(self._lock_path(name), "a") as lock_file:
+            # Poll instead of blocking the event loop while another process downloads
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(DOWNLOAD_LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def _fetch(self, file_id: str) -> Optional[Path]:
+        """Download a file from Telegram into the cache."""
+        file_info = await self.resolve(file_id)
+
+        # The same file may already be cached under a different file_id
+        path = self.link_existing(file_id, file_info)
+        if path:
+            return path
+
+        async with self._download_lock(self._entry_for(file_info)["name"]):
+            # Another process may have downloaded it while we waited
+            path = self.link_existing(file_id, file_info)
+            if path:
+                return path
+            return await self._download(file_id, file_info)
+
+    async def _download(self, file_id: str, file_info) -> Optional[Path]:
+        session = get_http_session()
+        async with session.get(self.file_url(file_info.file_path), ssl=self.ssl_context()) as response:
+            if response.status != 200:
+                logger.error(f"Failed to download file {file_id} from Telegram: {response.status}")
+                # The cached file_path may have expired
+                file_resolver.invalidate(file_id)
+                return None
+
+            writer = await asyncio.to_thread(self.open_writer, file_id, file_info)
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    await asyncio.to_thread(writer.write, chunk)
+                return await asyncio.to_thread(writer.commit)
+            finally:
+                writer.discard()
+
+    def added(self, size: int, keep: Optional[Path] = None):
+        """Account for a new file of ``size`` bytes; evict if the cache may be over its limit (blocking)."""
+        with self._size_lock:
+            due = (
+                self._size is None
+                or self._size + size > self.max_bytes
+                or time.monotonic() - self._scanned_at > EVICT_RESCAN_INTERVAL
+            )
+            if not due:
+                self._size += size
+                return
+        self.evict(keep=keep)
+
+    def evict(self, keep: Optional[Path] = None):
+        """Remove least recently used files until the cache fits into ``max_bytes`` (blocking)."""
+        # One scan at a time, a concurrent caller relies on the running one
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            self._evict(keep)
+        finally:
+            self._evict_lock.release()
+
+    def _evict(self, keep: Optional[Path]):
+        entries = []
+        total = 0
+        for directory in self._evicted_dirs:
+            for entry in os.scandir(directory):
+                if not entry.is_file() or entry.name.startswith("."):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+                total += stat.st_size
+
+        evicted = set()
+        for _, size, path in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            try:
+                path.unlink()
+                total -= size
+                evicted.add(path.name)
+                logger.info(f"Evicted {path.name} from media cache")
+                try:
+                    path.with_name(f".{path.name}.lock").unlink()
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.warning(f"Could not evict {path.name} from media cache: {str(e)}")
+
+        with self._size_lock:
+            self._size = total
+            self._scanned_at = time.monotonic()
+
+        if evicted:
+            self._prune_index(evicted)
+
+    def _prune_index(self, names: Set[str]):
+        """Drop the index entries of evicted files."""
+        for entry in os.scandir(self.ids_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, "r") as f:
+                    name = json.load(f).get("name")
+                if name in names:
+                    os.unlink(entry.path)
+            except (OSError, ValueError):
+                pass
+
+
+class CacheWriter:
+    """Writes a file into the cache through a temporary file and publishes it atomically."""
+
+    def __init__(self, cache: MediaCache, file_id: str, entry: dict):
+        self.cache = cache
+        self.file_id = file_id
+        self.entry = entry
+        self.path = cache.files_dir / entry["name"]
+        self.temp_path = self.path.with_name(f".{entry['name']}.{os.getpid()}.{id(self)}.part")
+        self._file = open(self.temp_path, "wb")
+        self._done = False
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+
+    def commit(self) -> Path:
+        """Move the downloaded file into the cache and index it."""
+        self._file.close()
+        os.replace(self.temp_path, self.path)
+        self._done = True
+
+        self.cache._write_entry(self.file_id, self.entry)
+        logger.info(f"Cached Telegram file {self.file_id} as {self.path.name} ({self.path.stat().st_size} bytes)")
+
+        self.cache.added(self.path.stat().st_size, keep=self.path)
+        return self.path
+
+    def discard(self):
+        """Drop a partially written file (no-op after ``commit()``)."""
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        try:
+            self.temp_path.unlink()
+        except OSError:
+            pass
+
+
+# Shared cache instance used by the API and all publishers
+media_cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES)
@@ -0,0 +1,192 @@
+"""
+Story images (1080x1920) with the model name and price drawn over a photo.
+
+Rendering is CPU-bound, so it runs in the shared process pool
+(``app.workers.executor.run_cpu_bound``) instead of the event loop. JPEG
+sources are decoded with ``Image.draft`` at the smallest scale that still
+covers the story size, and fonts are loaded once per process.
+
+Rendered images are cached on disk under ``<MEDIA_CACHE_DIR>/stories``,
+keyed by the source file, the text and the template: publishing the same
+story again (or to another platform with the same template) renders nothing.
+They share the media cache's size limit and LRU eviction.
+"""
+import io
+import asyncio
+import os
+import hashlib
+import logging
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+from app.utils.media_cache import media_cache
+from app.workers.executor import run_cpu_bound
+
+logger = logging.getLogger(__name__)
+
+STORY_SIZE = (1080, 1920)
+JPEG_QUALITY = 95
+
+# Single outlined caption line at the bottom (VK, Instagram) or
+# banners with the model name at the top and the price at the bottom (Telegram)
+TEMPLATE_CAPTION = "caption"
+TEMPLATE_BANNERS = "banners"
+
+# Bump when the drawing code changes, so cached images are rendered again
+TEMPLATE_VERSION = 1
+
+FONT_PATHS = [
+    "arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+
+STORIES_DIR = media_cache.derived_dir("stories")
+
+
+@lru_cache(maxsize=None)
+def get_font(size: int):
+    """First available font of ``FONT_PATHS`` (loaded once per process and size)."""
+    for path in FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except IOError:
+            continue
+    logger.warning("No TrueType font found, using the default font")
+    return ImageFont.load_default()
+
+
+def _open_cropped(source: str) -> Image.Image:
+    """Open the source image, crop it to 9:16 and resize it to the story size."""
+    image = Image.open(source)
+    target_ratio = STORY_SIZE[0] / STORY_SIZE[1]
+
+    # JPEG: decode directly at a reduced scale (1/2, 1/4, 1/8) that still covers
+    # the story size along the side the crop keeps whole
+    width, height = image.size
+    if width / height > target_ratio:
+        image.draft("RGB", (1, STORY_SIZE[1]))
+    else:
+        image.draft("RGB", (STORY_SIZE[0], 1))
+    image = image.convert("RGB")
+
+    width, height = image.size
+    current_ratio = width / height
+
+    if current_ratio > target_ratio:
+        # Image is too wide, crop width
+        new_width = int(height * target_ratio)
+        left = (width - new_width) // 2
+        image = image.crop((left, 0, left + new_width, height))
+    elif current_ratio < target_ratio:
+        # Image is too tall, crop height
+        new_height = int(width / target_ratio)
+        top = (height - new_height) // 2
+        image = image.crop((0, top, width, top + new_height))
+
+    return image.resize(STORY_SIZE)
+
+
+def _draw_caption(image: Image.Image, model_name: Optional[str], price: Optional[str]):
+    # Формируем текст в одну строку
+    text = ""
+    if model_name and price:
+        text = f"{model_name} - {price}"
+    elif model_name:
+        text = model_name
+    elif price:
+        text = f"Цена: {price}"
+
+    if text:
+        draw = ImageDraw.Draw(image)
+        font = get_font(80)
+        # Рисуем текст с обводкой для лучшей видимости на любом фоне
+        # Сначала рисуем черную обводку
+        for offset_x, offset_y in [(-2, -2), (-2, 2), (2, -2), (2, 2)]:
+            draw.text((540 + offset_x, 1800 + offset_y), text, font=font, fill=(0, 0, 0), anchor="ms")
+
+        # Затем рисуем белый текст поверх
+        draw.text((540, 1800), text, font=font, fill=(255, 255, 255), anchor="ms")
+
+
+def _draw_banners(image: Image.Image, model_name: Optional[str], price: Optional[str]):
+    draw = ImageDraw.Draw(image)
+
+    if model_name:
+        # Draw model name at the top
+        font = get_font(60)
+        text_x = (1080 - draw.textlength(model_name, font=font)) // 2
+        draw.rectangle([(0, 100), (1080, 200)], fill=(0, 0, 0, 128))
+        draw.text((text_x, 120), model_name, font=font, fill=(255, 255, 255))
+
+    if price:
+        # Draw price at the bottom
+        font = get_font(48)
+        text = f"Цена: {price}"
+        text_x = (1080 - draw.textlength(text, font=font)) // 2
+        draw.rectangle([(0, 1720), (1080, 1820)], fill=(0, 0, 0, 128))
+        draw.text((text_x, 1740), text, font=font, fill=(255, 255, 255))
+
+
+TEMPLATES = {
+    TEMPLATE_CAPTION: _draw_caption,
+    TEMPLATE_BANNERS: _draw_banners,
+}
+
+
+def render(source: str, target: str, model_name: Optional[str], price: Optional[str], template: str):
+    """Render a story image from ``source`` into ``target`` (runs in a worker process)."""
+    image = _open_cropped(source)
+    TEMPLATES[template](image, model_name, price)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+
+    # Write to a temporary file first: a concurrent reader never sees a partial image
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(temp_path, target)
+
+
+def _cache_path(source: Path, model_name: Optional[str], price: Optional[str], template: str) -> Path:
+    # The cached source file is named after the Telegram file_unique_id
+    key = "\0".join([source.name, model_name or "", price or "", template, str(TEMPLATE_VERSION)])
+    return STORIES_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.jpg"
+
+
+async def render_story_image(file_id: str, model_name: Optional[str], price: Optional[str],
+                             template: str = TEMPLATE_CAPTION) -> Optional[Path]:
+    """Return the path of the story image for a Telegram photo, rendering it if needed."""
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown story template: {template}")
+
+    source = await media_cache.get_path(file_id)
+    if not source:
+        logger.error(f"Failed to download file {file_id}")
+        return None
+
+    target = _cache_path(source, model_name, price, template)
+    if target.exists():
+        logger.info(f"Using cached story image {target.name}")
+        # Mark as recently used for the cache eviction
+        try:
+            os.utime(target)
+        except OSError:
+            pass
+        return target
+
+    try:
+        STORIES_DIR.mkdir(parents=True, exist_ok=True)
+        await run_cpu_bound(render, str(source), str(target), model_name, price, template)
+    except Exception as e:
+        logger.error(f"Error creating story image: {str(e)}")
+        return None
+
+    logger.info(f"Rendered story image {target.name}")
+    await asyncio.to_thread(media_cache.added, target.stat().st_size, target)
+    return target
@@ -0,0 +1,77 @@
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from aiogram.types import File
+
+from app.config.settings import TELEGRAM_FILE_PATH_TTL, TELEGRAM_FILE_PATH_NEGATIVE_TTL
+from app.utils.clients import get_bot
+
+logger = logging.getLogger(__name__)
+
+# Expired entries are dropped once the cache grows past this size
+MAX_ENTRIES = 10000
+
+
+class TelegramFileResolver:
+    """Process-wide cache for Telegram ``getFile`` results.
+
+    Successful lookups are kept for ``ttl`` seconds (Telegram keeps a file_path
+    valid for about an hour), failures are remembered for ``negative_ttl``
+    seconds, and concurrent lookups of the same file_id share one request.
+    """
+
+    def __init__(self, ttl: int, negative_ttl: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache: Dict[str, Tuple[float, Optional[File], Optional[Exception]]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def resolve(self, file_id: str) -> File:
+        """Return file info for ``file_id``; raises the (cached) error if the lookup failed."""
+        cached = self._cache.get(file_id)
+        if cached:
+            expires_at, file_info, error = cached
+            if expires_at > time.monotonic():
+                if error is not None:
+                    raise error
+                return file_info
+            del self._cache[file_id]
+
+        task = self._inflight.get(file_id)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(file_id))
+            self._inflight[file_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(file_id, None))
+
+        return await asyncio.shield(task)
+
+    async def _lookup(self, file_id: str) -> File:
+        try:
+            file_info = await get_bot().get_file(file_id)
+        except Exception as e:
+            logger.warning(f"getFile failed for {file_id}: {str(e)}")
+            self._cache[file_id] = (time.monotonic() + self.negative_ttl, None, e)
+            raise
+
+        self._cache[file_id] = (time.monotonic() + self.ttl, file_info, None)
+        if len(self._cache) > MAX_ENTRIES:
+            self._prune()
+        return file_info
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _, _) in self._cache.items() if expires_at <= now]:
+            del self._cache[key]
+
+    async def get_file_path(self, file_id: str) -> str:
+        return (await self.resolve(file_id)).file_path
+
+    def invalidate(self, file_id: str):
+        """Forget a cached file_path (for example after the download URL expired)."""
+        self._cache.pop(file_id, None)
+
+
+# Shared resolver instance
+file_resolver = TelegramFileResolver(TELEGRAM_FILE_PATH_TTL, TELEGRAM_FILE_PATH_NEGATIVE_TTL)
@@ -0,0 +1,96 @@
+"""
+Thread pools for the blocking platform SDKs (vk_api, requests, instagrapi).
+
+The API, the bot and the publishers share one event loop, so every
+synchronous network call has to go through ``run_blocking``. Each platform
+gets its own bounded pool: a slow VK video upload can occupy at most
+``VK_MAX_CONCURRENCY`` threads and never delays Instagram, the bot or the API.
+
+CPU-bound work (image rendering) goes through ``run_cpu_bound`` and runs in a
+process pool of ``CPU_WORKERS`` processes, so it does not hold the GIL of the
+event loop process.
+"""
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from app.config.settings import VK_MAX_CONCURRENCY, INSTAGRAM_MAX_CONCURRENCY, CPU_WORKERS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Maximum number of simultaneous blocking calls per platform
+PLATFORM_CONCURRENCY = {
+    "vk": VK_MAX_CONCURRENCY,
+    "instagram": INSTAGRAM_MAX_CONCURRENCY,
+}
+DEFAULT_CONCURRENCY = 4
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_process_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_executor(platform: str) -> ThreadPoolExecutor:
+    """Return the thread pool for ``platform``, creating it on first use."""
+    executor = _executors.get(platform)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(platform)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=PLATFORM_CONCURRENCY.get(platform, DEFAULT_CONCURRENCY),
+                    thread_name_prefix=f"{platform}-sdk"
+                )
+                _executors[platform] = executor
+    return executor
+
+
+async def run_blocking(platform: str, func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking SDK call in the platform's thread pool and await the result."""
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context, like asyncio.to_thread (the rate limiter
+    # adds the time the call waits to the job that made it)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(platform), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the process pool for CPU-bound work, creating it on first use."""
+    global _process_pool
+    with _lock:
+        if _process_pool is None:
+            # Forking a process that runs threads and an event loop can deadlock the child
+            # on locks held by other threads: start clean interpreters instead
+            _process_pool = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+async def run_cpu_bound(func: Callable[..., T], *args) -> T:
+    """Run a CPU-bound function in the process pool; ``func`` and its arguments must be picklable."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def shutdown(wait: bool = True):
+    """Stop all platform thread pools and the process pool."""
+    global _process_pool
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+        if _process_pool is not None:
+            executors.append(_process_pool)
+        _process_pool = None
+    for executor in executors:
+        executor.shutdown(wait=wait)
+    logger.info("Platform thread pools stopped")
@@ -1,94 +1,74 @@
 import os
 import logging
 import asyncio
-import ssl
 from datetime import datetime, timezone
-import aiohttp
 import json
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from instagrapi import Client
 
-from app.db.database import SessionLocal
+from app.db.database import AsyncSessionLocal
 from app.api.models.post import Post, PublicationLog
-from app.config.settings import MEDIA_DIR
+from app.utils.media_cache import media_cache
+from app.workers.executor import run_blocking
+from app.workers.instagram.session import instagram_session
 from app.utils.text_formatter import format_for_instagram
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Получение данных из переменных окружения
-INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME", "")
-INSTAGRAM_PASSWORD = os.getenv("INSTAGRAM_PASSWORD", "")
-INSTAGRAM_SESSION_PATH = os.getenv("INSTAGRAM_SESSION_PATH", "instagram_session.json")
-
 class InstagramPublisher:
     """Класс для публикации постов в Instagram."""
 
-    def __init__(self):
-        """Инициализация клиента Instagram."""
-        self.client = Client()
-        self.is_logged_in = False
+    def __init__(self, client: Optional[Client]):
+        """Общий авторизованный клиент Instagram (None, если вход не удался)."""
+        self.client = client
 
     async def login(self) -> bool:
-        """Авторизация в Instagram."""
-        try:
-            # Проверяем наличие сохраненной сессии
-            if os.path.exists(INSTAGRAM_SESSION_PATH):
-                try:
-                    # Загружаем сессию из файла
-                    with open(INSTAGRAM_SESSION_PATH, 'r') as f:
-                        session_data = json.load(f)
-
-                    # Устанавливаем сессию
-                    self.client.set_settings(session_data)
-
-                    # Проверяем валидность сессии
-                    self.client.get_timeline_feed()
-                    self.is_logged_in = True
-                    logger.info("Успешно восстановлена сессия Instagram")
-                    return True
-                except Exception as e:
-                    logger.warning(f"Не удалось восстановить сессию Instagram: {str(e)}")
+        """Проверка авторизации в Instagram (вход выполняет менеджер сессии)."""
+        return self.client is not None
 
-            # Если сессия не найдена или недействительна, выполняем вход
-            if not self.is_logged_in:
-                if not INSTAGRAM_USERNAME or not INSTAGRAM_PASSWORD:
-                    logger.error("Отсутствуют учетные данные Instagram")
-                    return False
+    async def _update(self, published: dict, caption: str, media: List[str]) -> bool:
+        """Изменение подписи опубликованного поста.
 
-                # Выполняем вход
-                self.client.login(INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD)
+        Возвращает False, если изменились медиафайлы: Instagram не позволяет
+        заменить их в опубликованном посте, поэтому пост публикуется заново.
+        """
+        if published.get("media") != media:
+            return False
 
-                # Сохраняем сессию
-                session_data = self.client.get_settings()
-                with open(INSTAGRAM_SESSION_PATH, 'w') as f:
-                    json.dump(session_data, f)
+        for media_id in published["media_ids"]:
+            await run_blocking("instagram", self.client.media_edit, media_id, caption)
+        return True
 
-                self.is_logged_in = True
-                logger.info("Успешная авторизация в Instagram")
-                return True
-
-        except Exception as e:
-            logger.error(f"Ошибка при авторизации в Instagram: {str(e)}")
-            return False
+    async def _delete(self, media_ids: List[str]):
+        """Удаление старых публикаций после того, как новая успешно загружена."""
+        for media_id in media_ids:
+            try:
+                await run_blocking("instagram", self.client.media_delete, media_id)
+            except Exception as e:
+                logger.warning(f"Не удалось удалить старый пост {media_id} в Instagram: {str(e)}")
 
-    async def publish_post(self, post_id: str) -> bool:
-        """Публикация поста в Instagram."""
+    async def publish_post(self, post_id: str, mode: str = "publish") -> bool:
+        """Публикация поста в Instagram (в режиме "update" - изменение опубликованного поста)."""
         # Получаем сессию базы данных
-        db = SessionLocal()
+        db = AsyncSessionLocal()
 
         try:
             # Получаем пост из базы данных
-            post = db.query(Post).filter(Post.id == post_id).first()
+            post = await db.get(Post, post_id)
 
             if not post:
                 logger.error(f"Пост с ID {post_id} не найден")
                 return False
 
-            # Логируем, если пост уже опубликован, но продолжаем с повторной публикацией
-            if post.is_published_instagram:
+            # Опубликованный ранее пост изменяется на месте
+            published = post.get_remote_ids("instagram") if mode == "update" else {}
+            if mode == "update" and not published.get("media_ids"):
+                logger.info(f"Пост с ID {post_id} не найден в Instagram, выполняем новую публикацию")
+            elif post.is_published_instagram and not published:
+                # Логируем, если пост уже опубликован, но продолжаем с повторной публикацией
                 logger.info(f"Пост с ID {post_id} уже опубликован в Instagram, выполняем повторную публикацию")
 
             # Авторизуемся в Instagram
@@ -101,15 +81,50 @@ class InstagramPublisher:
                     message="Ошибка авторизации в Instagram"
                 )
                 db.add(log)
-                db.commit()
+                await db.commit()
                 return False
 
-            # Получаем путь к директории с медиафайлами поста
-            post_dir = MEDIA_DIR / post.storage_path
-
             # Получаем текст поста и форматируем его
             caption = format_for_instagram(post.text)
 
+            if published.get("media_ids"):
+                try:
+                    if await self._update(published, caption, post.photos + post.videos):
+                        post.published_instagram_at = datetime.now(timezone.utc)
+                        db.add(PublicationLog(
+                            post_id=post_id,
+                            platform="instagram",
+                            status="success",
+                            message="Пост успешно обновлен в Instagram"
+                        ))
+                        await db.commit()
+                        logger.info(f"Пост с ID {post_id} успешно обновлен в Instagram")
+                        return True
+                except Exception as e:
+                    logger.error(f"Ошибка при обновлении поста в Instagram: {str(e)}")
+                    instagram_session.mark_failed()
+                    db.add(PublicationLog(
+                        post_id=post_id,
+                        platform="instagram",
+                        status="error",
+                        message=f"Ошибка при обновлении: {str(e)}"
+                    ))
+                    await db.commit()
+                    return False
+                logger.info(f"Медиафайлы поста {post_id} изменились, публикуем пост в Instagram заново")
+
+            # Старые публикации удаляются только после успешной загрузки новой,
+            # чтобы при ошибке пост остался в Instagram и его можно было обновить снова
+            replaced = published.get("media_ids", [])
+
+            # Идентификаторы созданных публикаций (для последующего изменения)
+            created = []
+
+            async def upload(method, *args):
+                media = await run_blocking("instagram", method, *args)
+                created.append(media.id)
+                return media
+
             # Загружаем медиафайлы
             media_paths = []
 
@@ -119,24 +134,16 @@ class InstagramPublisher:
 
             # Если есть фотографии или видео, загружаем их
             if photos or videos:
-                # Загружаем фотографии
-                for i, photo_id in enumerate(photos):
-                    photo_path = post_dir / f"photo_{i}.jpg"
-                    if not os.path.exists(photo_path):
-                        # Если файл не существует, скачиваем его
-                        await self._download_telegram_file(photo_id, photo_path)
-
-                    if os.path.exists(photo_path):
+                # Загружаем фотографии через общий кэш медиафайлов
+                for photo_id in photos:
+                    photo_path = await media_cache.get_path(photo_id)
+                    if photo_path:
                         media_paths.append(str(photo_path))
 
                 # Загружаем видео
-                for i, video_id in enumerate(videos):
-                    video_path = post_dir / f"video_{i}.mp4"
-                    if not os.path.exists(video_path):
-                        # Если файл не существует, скачиваем его
-                        await self._download_telegram_file(video_id, video_path)
-
-                    if os.path.exists(video_path):
+                for video_id in videos:
+                    video_path = await media_cache.get_path(video_id)
+                    if video_path:
                         media_paths.append(str(video_path))
 
             # Публикуем пост в Instagram
@@ -153,7 +160,7 @@ class InstagramPublisher:
                         message="Публикация текстового поста в Instagram не поддерживается"
                     )
                     db.add(log)
-                    db.commit()
+                    await db.commit()
                     return False
 
                 elif len(media_paths) == 1:
@@ -163,17 +170,17 @@ class InstagramPublisher:
                     try:
                         if media_path.endswith(('.jpg', '.jpeg', '.png')):
                             # Публикуем фото
-                            self.client.photo_upload(media_path, caption)
+                            await upload(self.client.photo_upload, media_path, caption)
                         elif media_path.endswith(('.mp4', '.mov')):
                             # Публикуем видео
                             try:
                                 # Пробуем использовать video_upload
-                                self.client.video_upload(media_path, caption)
+                                await upload(self.client.video_upload, media_path, caption)
                             except Exception as e:
                                 if "Please install moviepy" in str(e):
                                     # Если ошибка связана с moviepy, используем альтернативный метод
                                     logger.warning(f"Ошибка при загрузке видео через video_upload: {str(e)}. Пробуем clip_upload.")
-                                    self.client.clip_upload(media_path, caption)
+                                    await upload(self.client.clip_upload, media_path, caption)
                                 else:
                                     # Если другая ошибка, пробрасываем её дальше
                                     raise
@@ -188,10 +195,11 @@ class InstagramPublisher:
                                 message=f"Неподдерживаемый формат файла: {media_path}"
                             )
                             db.add(log)
-                            db.commit()
+                            await db.commit()
                             return False
                     except Exception as e:
                         logger.error(f"Ошибка при публикации медиафайла: {str(e)}")
+                        instagram_session.mark_failed()
 
                         # Добавляем лог об ошибке
                         log = PublicationLog(
@@ -201,7 +209,7 @@ class InstagramPublisher:
                             message=f"Ошибка при публикации медиафайла: {str(e)}"
                         )
                         db.add(log)
-                        db.commit()
+                        await db.commit()
                         return False
 
                 else:
@@ -232,17 +240,17 @@ class InstagramPublisher:
 
                                     if len(photo_paths) == 1:
                                         # Если одно фото, публикуем как одиночный пост
-                                        self.client.photo_upload(photo_paths[0], caption)
+                                        await upload(self.client.photo_upload, photo_paths[0], caption)
                                     else:
                                         # Если несколько фото, публикуем как карусель
-                                        self.client.album_upload(photo_paths, caption)
+                                        await upload(self.client.album_upload, photo_paths, caption)
 
                                     # Затем пробуем загрузить видео отдельно
                                     for video_path in video_paths:
                                         try:
                                             logger.info(f"Пробуем загрузить видео отдельно: {video_path}")
                                             # Пробуем использовать clip_upload вместо video_upload
-                                            self.client.clip_upload(video_path, caption)
+                                            await upload(self.client.clip_upload, video_path, caption)
                                             logger.info(f"Видео успешно загружено: {video_path}")
                                         except Exception as video_error:
                                             logger.error(f"Ошибка при загрузке видео {video_path}: {str(video_error)}")
@@ -252,14 +260,14 @@ class InstagramPublisher:
                                         try:
                                             logger.info(f"Пост содержит только видео. Пробуем загрузить первое видео.")
                                             # Пробуем использовать clip_upload вместо video_upload
-                                            self.client.clip_upload(video_paths[0], caption)
+                                            await upload(self.client.clip_upload, video_paths[0], caption)
                                             logger.info(f"Видео успешно загружено: {video_paths[0]}")
                                         except Exception as video_error:
                                             logger.error(f"Ошибка при загрузке видео {video_paths[0]}: {str(video_error)}")
                                             raise
                             else:
                                 # Если нет видео, загружаем все файлы как карусель
-                                self.client.album_upload(valid_paths, caption)
+                                await upload(self.client.album_upload, valid_paths, caption)
                         except Exception as e:
                             if "Please install moviepy" in str(e) and photo_paths:
                                 # Если ошибка связана с moviepy и есть фотографии, публикуем только фото
@@ -267,10 +275,10 @@ class InstagramPublisher:
 
                                 if len(photo_paths) == 1:
                                     # Если одно фото, публикуем как одиночный пост
-                                    self.client.photo_upload(photo_paths[0], caption)
+                                    await upload(self.client.photo_upload, photo_paths[0], caption)
                                 else:
                                     # Если несколько фото, публикуем как карусель
-                                    self.client.album_upload(photo_paths, caption)
+                                    await upload(self.client.album_upload, photo_paths, caption)
                             else:
                                 # Если другая ошибка, пробрасываем её дальше
                                 raise
@@ -285,10 +293,14 @@ class InstagramPublisher:
                             message="Нет доступных медиафайлов для публикации"
                         )
                         db.add(log)
-                        db.commit()
+                        await db.commit()
                         return False
 
+                if replaced:
+                    await self._delete(replaced)
+
                 # Обновляем статус публикации в базе данных
+                post.set_remote_ids("instagram", {"media_ids": created, "media": post.photos + post.videos})
                 post.is_published_instagram = True
                 post.published_instagram_at = datetime.now(timezone.utc)
 
@@ -301,13 +313,14 @@ class InstagramPublisher:
                 )
 
                 db.add(log)
-                db.commit()
+                await db.commit()
 
                 logger.info(f"Пост с ID {post_id} успешно опубликован в Instagram")
                 return True
 
             except Exception as e:
                 logger.error(f"Ошибка при публикации поста в Instagram: {str(e)}")
+                instagram_session.mark_failed()
 
                 # Добавляем лог об ошибке
                 log = PublicationLog(
@@ -317,11 +330,12 @@ class InstagramPublisher:
                     message=f"Ошибка при публикации: {str(e)}"
                 )
                 db.add(log)
-                db.commit()
+                await db.commit()
                 return False
 
         except Exception as e:
             logger.error(f"Ошибка при публикации поста в Instagram: {str(e)}")
+            instagram_session.mark_failed()
 
             # Добавляем лог об ошибке
             log = PublicationLog(
@@ -331,73 +345,15 @@ class InstagramPublisher:
                 message=f"Ошибка: {str(e)}"
             )
             db.add(log)
-            db.commit()
+            await db.commit()
             return False
 
         finally:
-            db.close()
-
-    async def _download_telegram_file(self, file_id: str, save_path: str) -> bool:
-        """Скачивание файла из Telegram."""
-        try:
-            # Получаем токен бота из переменных окружения
-            bot_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
-
-            if not bot_token:
-                logger.error("Отсутствует токен бота Telegram")
-                return False
-
-            # Создаем SSL-контекст, который игнорирует проверку сертификатов
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-
-            # Получаем информацию о файле
-            file_url = f"https://api.telegram.org/bot{bot_token}/getFile?file_id={file_id}"
-
-            # Используем SSL-контекст при создании сессии
-            conn = aiohttp.TCPConnector(ssl=ssl_context)
-            async with aiohttp.ClientSession(connector=conn) as session:
-                async with session.get(file_url) as response:
-                    if response.status != 200:
-                        logger.error(f"Ошибка при получении информации о файле: {response.status}")
-                        return False
-
-                    data = await response.json()
-
-                    if not data.get("ok"):
-                        logger.error(f"Ошибка API Telegram: {data.get('description')}")
-                        return False
-
-                    file_path = data.get("result", {}).get("file_path")
-
-                    if not file_path:
-                        logger.error("Не удалось получить путь к файлу")
-                        return False
-
-                    # Скачиваем файл
-                    download_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
-
-                    # Создаем директорию для сохранения файла, если она не существует
-                    os.makedirs(os.path.dirname(save_path), exist_ok=True)
-
-                    async with session.get(download_url) as file_response:
-                        if file_response.status != 200:
-                            logger.error(f"Ошибка при скачивании файла: {file_response.status}")
-                            return False
-
-                        with open(save_path, 'wb') as f:
-                            f.write(await file_response.read())
-
-                        logger.info(f"Файл успешно скачан и сохранен: {save_path}")
-                        return True
-
-        except Exception as e:
-            logger.error(f"Ошибка при скачивании файла из Telegram: {str(e)}")
-            return False
+            await db.close()
 
 # Функция для публикации поста в Instagram
-async def publish_post_to_instagram(post_id: str) -> bool:
-    """Публикация поста в Instagram."""
-    publisher = InstagramPublisher()
-    return await publisher.publish_post(post_id)
+async def publish_post_to_instagram(post_id: str, mode: str = "publish") -> bool:
+    """Публикация поста в Instagram ("update" изменяет опубликованный пост)."""
+    async with instagram_session.borrow() as client:
+        publisher = InstagramPublisher(client)
+        return await publisher.publish_post(post_id, mode)
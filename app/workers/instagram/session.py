@@ -0,0 +1,129 @@
+"""
+Instagram session shared by the post and story publishers.
+
+There is one authenticated instagrapi ``Client`` per process, kept in the
+platform client registry. Logging in is serialized: in the process by the
+registry lock, between processes (API, bot and queue workers may all run
+publishers) by an exclusive lock on ``INSTAGRAM_SESSION_PATH + ".lock"``.
+A process that waited for the lock reads the session saved by the other one
+instead of logging in a second time, which Instagram would answer with a
+challenge. The session file is replaced atomically, so a reader never sees
+a half-written file.
+
+Publishers borrow the client with ``async with instagram_session.borrow()``;
+at most ``INSTAGRAM_MAX_CONCURRENCY`` publications use it at the same time.
+"""
+import os
+import json
+import fcntl
+import asyncio
+import logging
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Optional
+
+from instagrapi import Client
+
+from app.config.settings import INSTAGRAM_MAX_CONCURRENCY
+from app.workers.executor import run_blocking
+from app.workers.platform_clients import PlatformClient
+
+logger = logging.getLogger(__name__)
+
+# Получение данных из переменных окружения
+INSTAGRAM_USERNAME = os.getenv("INSTAGRAM_USERNAME", "")
+INSTAGRAM_PASSWORD = os.getenv("INSTAGRAM_PASSWORD", "")
+INSTAGRAM_SESSION_PATH = os.getenv("INSTAGRAM_SESSION_PATH", "instagram_session.json")
+
+
+class InstagramSessionManager:
+    """Logs in once and lends the authenticated client to the publishers."""
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        self.client = PlatformClient("Instagram", self._create, self._validate)
+        self._pool = asyncio.Semaphore(max(pool_size, 1))
+
+    @property
+    def configured(self) -> bool:
+        return bool(INSTAGRAM_USERNAME) or os.path.exists(self.path)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by all processes using the session file."""
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _save(self, settings: dict):
+        """Write the session to a temporary file and move it over the old one."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".instagram_session.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(settings, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def _restore_or_login(self) -> Client:
+        """Restore the saved session or log in and save a new one (blocking)."""
+        with self._file_lock():
+            # Проверяем наличие сохраненной сессии (другой процесс мог только что войти)
+            try:
+                settings = self._load()
+                if settings:
+                    client = Client()
+                    client.set_settings(settings)
+                    # Проверяем валидность сессии
+                    client.get_timeline_feed()
+                    logger.info("Успешно восстановлена сессия Instagram")
+                    return client
+            except Exception as e:
+                logger.warning(f"Не удалось восстановить сессию Instagram: {str(e)}")
+
+            # Если сессия не найдена или недействительна, выполняем вход
+            if not INSTAGRAM_USERNAME or not INSTAGRAM_PASSWORD:
+                raise RuntimeError("Отсутствуют учетные данные Instagram")
+
+            client = Client()
+            client.login(INSTAGRAM_USERNAME, INSTAGRAM_PASSWORD)
+            self._save(client.get_settings())
+            logger.info("Успешная авторизация в Instagram")
+            return client
+
+    async def _create(self) -> Client:
+        return await run_blocking("instagram", self._restore_or_login)
+
+    async def _validate(self, client: Client):
+        await run_blocking("instagram", client.get_timeline_feed)
+
+    @asynccontextmanager
+    async def borrow(self) -> AsyncIterator[Optional[Client]]:
+        """Borrow the authenticated client; yields None if the login failed."""
+        async with self._pool:
+            try:
+                client = await self.client.get()
+            except Exception as e:
+                logger.error(f"Ошибка при авторизации в Instagram: {str(e)}")
+                client = None
+            yield client
+
+    def mark_failed(self):
+        """Check the session again before the next publication."""
+        self.client.mark_failed()
+
+
+instagram_session = InstagramSessionManager(INSTAGRAM_SESSION_PATH, INSTAGRAM_MAX_CONCURRENCY)
@@ -0,0 +1,148 @@
+"""
+Long-lived platform SDK clients shared by all publishers of a process.
+
+Each platform client is created on first use (or by ``warm_up`` when the
+queue workers start) and then reused by every publication. A client is
+checked again only when ``PLATFORM_CLIENT_TTL`` seconds have passed since the
+last check or after a publisher reported a failure with ``mark_failed``;
+a client that fails the check is created again. The Instagram client is
+managed by ``app.workers.instagram.session``; Telegram publishers use the
+shared aiogram ``Bot`` from ``app.utils.clients``.
+"""
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+import vk_api
+from vk_api.exceptions import ApiError
+from vk_api.vk_api import TOO_MANY_RPS_CODE
+
+from app.config.settings import VK_ACCESS_TOKEN, VK_GROUP_ID, PLATFORM_CLIENT_TTL, RATE_LIMIT_RETRIES
+from app.workers.executor import run_blocking
+from app.workers.rate_limit import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class PlatformClient(Generic[T]):
+    """A lazily created client, validated again after a TTL or a failure."""
+
+    def __init__(self, name: str, create: Callable[[], Awaitable[T]],
+                 validate: Optional[Callable[[T], Awaitable[None]]] = None, ttl: int = PLATFORM_CLIENT_TTL):
+        self.name = name
+        self._create = create
+        self._validate = validate
+        self.ttl = ttl
+        self._client: Optional[T] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._checked_at > self.ttl
+
+    async def get(self) -> T:
+        """Return the client, creating or validating it if needed."""
+        if self._client is not None and not self._expired():
+            return self._client
+
+        # Only one coroutine creates or checks the client, the others wait for it
+        async with self._lock:
+            if self._client is not None and self._expired() and self._validate is not None:
+                try:
+                    await self._validate(self._client)
+                    self._checked_at = time.monotonic()
+                except Exception as e:
+                    logger.warning(f"{self.name} client is no longer valid, creating a new one: {str(e)}")
+                    self._client = None
+
+            if self._client is None:
+                self._client = await self._create()
+                logger.info(f"{self.name} client created")
+            self._checked_at = time.monotonic()
+            return self._client
+
+    def mark_failed(self):
+        """Check the client again before its next use (call after a failed request)."""
+        self._checked_at = 0.0
+
+    def reset(self):
+        """Drop the client, the next ``get`` creates a new one."""
+        self._client = None
+        self._checked_at = 0.0
+
+
+class RateLimitedVkApi(vk_api.VkApi):
+    """vk_api session whose calls share the process-wide VK rate limit.
+
+    vk_api only spaces out the calls of one session; all sessions of the
+    process use the same token, so they take their turns from one bucket.
+    Error 6 ("too many requests per second") pauses the bucket and the call is
+    retried at most ``RATE_LIMIT_RETRIES`` times.
+    """
+
+    # Spacing is done by the shared rate limiter
+    RPS_DELAY = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # vk_api's own handler sleeps and retries without a limit
+        self.error_handlers.pop(TOO_MANY_RPS_CODE, None)
+
+    def method(self, method, values=None, **kwargs):
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            rate_limiter.acquire_sync("vk")
+            try:
+                return super().method(method, values, **kwargs)
+            except ApiError as e:
+                if e.code != TOO_MANY_RPS_CODE or attempt == RATE_LIMIT_RETRIES:
+                    raise
+                logger.warning(f"VK flood control on {method}, retrying")
+                rate_limiter.pause("vk", seconds=1.0)
+
+
+class VKClient:
+    """A vk_api session with its API and upload helpers."""
+
+    def __init__(self, api_version: Optional[str] = None):
+        options = {"api_version": api_version} if api_version else {}
+        self.session = RateLimitedVkApi(token=VK_ACCESS_TOKEN, **options)
+        self.vk = self.session.get_api()
+        self.upload = vk_api.VkUpload(self.session)
+
+
+async def _validate_vk(client: VKClient):
+    await run_blocking("vk", client.vk.groups.getById, group_id=abs(int(VK_GROUP_ID)))
+
+
+async def _create_vk() -> VKClient:
+    return VKClient()
+
+
+async def _create_vk_stories() -> VKClient:
+    # Stories API needs a newer API version than vk_api's default
+    return VKClient(api_version="5.131")
+
+
+vk_client: PlatformClient[VKClient] = PlatformClient("VK", _create_vk, _validate_vk)
+vk_stories_client: PlatformClient[VKClient] = PlatformClient("VK stories", _create_vk_stories, _validate_vk)
+
+
+async def warm_up():
+    """Create the clients of the configured platforms before the first publication."""
+    from app.workers.instagram.session import instagram_session
+
+    clients = []
+    if VK_ACCESS_TOKEN and VK_GROUP_ID:
+        clients += [vk_client, vk_stories_client]
+    if instagram_session.configured:
+        clients.append(instagram_session.client)
+
+    for client in clients:
+        try:
+            await client.get()
+        except Exception as e:
+            # The publisher tries again on the first publication
+            logger.warning(f"Could not warm up {client.name} client: {str(e)}")
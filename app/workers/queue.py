@@ -0,0 +1,367 @@
+"""
+DB-backed queue for publication jobs.
+
+The API only inserts a ``PublishJob`` row and returns; workers claim jobs and
+run the platform publishers. On PostgreSQL jobs are claimed with
+``SELECT ... FOR UPDATE SKIP LOCKED``, on SQLite with a compare-and-set
+``UPDATE``, so any number of worker processes can drain the same queue.
+A claimed job holds a lease that the worker keeps extending while it runs;
+if the worker dies the lease expires and another worker picks the job up.
+
+All queue queries go through the async session, so waiting for the
+database never blocks the event loop shared with the API and the bot.
+
+Run standalone workers with ``python -m app.workers.queue``.
+"""
+import os
+import signal
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import (
+    JOB_WORKERS, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY
+)
+from app.db.database import AsyncSessionLocal, async_engine
+from app.api.models.job import PublishJob
+from app.api.models.post import Post, PublicationLog
+from app.api.models.story import StoryPublicationLog
+from app.utils.media_cache import media_cache
+from app.workers.rate_limit import track_throttling
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("success", "error")
+
+# Wakes up the workers of this process when a job is queued here
+_wakeup = asyncio.Event()
+
+
+def notify():
+    """Wake up local workers (workers in other processes poll the table)."""
+    _wakeup.set()
+
+
+async def enqueue_job(db: AsyncSession, kind: str, platform: str, post_id: Optional[str] = None,
+                      story_id: Optional[str] = None, batch_id: Optional[str] = None,
+                      mode: str = "publish") -> PublishJob:
+    """Queue a publication job; an active job for the same target is reused."""
+    existing = (await db.execute(select(PublishJob).where(
+        PublishJob.kind == kind,
+        PublishJob.platform == platform,
+        PublishJob.post_id == post_id,
+        PublishJob.story_id == story_id,
+        PublishJob.mode == mode,
+        PublishJob.status.in_(ACTIVE_STATUSES)
+    ).limit(1))).scalars().first()
+    if existing:
+        if batch_id and existing.batch_id != batch_id:
+            # Report the running job as part of the new batch
+            existing.batch_id = batch_id
+            await db.commit()
+            await db.refresh(existing)
+        return existing
+
+    job = PublishJob(
+        kind=kind,
+        platform=platform,
+        post_id=post_id,
+        story_id=story_id,
+        batch_id=batch_id,
+        mode=mode,
+        max_attempts=JOB_MAX_ATTEMPTS
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+
+    logger.info(f"Queued {kind} job {job.id} for {platform} ({mode})")
+    notify()
+    return job
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(PublishJob.status == "queued", PublishJob.run_after <= now),
+        # The worker that held the job stopped extending its lease
+        and_(PublishJob.status == "running", PublishJob.locked_until < now)
+    )
+
+
+def _claim_values(worker_id: str, now: datetime) -> dict:
+    return {
+        "status": "running",
+        "attempts": PublishJob.attempts + 1,
+        "worker_id": worker_id,
+        "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+        "started_at": now,
+    }
+
+
+async def claim_job(db: AsyncSession, worker_id: str) -> Optional[PublishJob]:
+    """Claim the next job for ``worker_id`` or return None if the queue is empty."""
+    now = datetime.utcnow()
+
+    if async_engine.dialect.name == "postgresql":
+        job = (await db.execute(
+            select(PublishJob).where(_claimable(now)).order_by(
+                PublishJob.run_after
+            ).limit(1).with_for_update(skip_locked=True)
+        )).scalars().first()
+        if job is None:
+            await db.rollback()
+            return None
+
+        await db.execute(update(PublishJob).where(PublishJob.id == job.id).values(**_claim_values(worker_id, now)))
+        await db.commit()
+        await db.refresh(job)
+        return job
+
+    # SQLite has no row locks: claim with a compare-and-set UPDATE and retry if
+    # another worker got the job first
+    for _ in range(5):
+        candidate = (await db.execute(
+            select(PublishJob.id, PublishJob.status, PublishJob.attempts).where(
+                _claimable(now)
+            ).order_by(PublishJob.run_after).limit(1)
+        )).first()
+        if candidate is None:
+            return None
+
+        result = await db.execute(
+            update(PublishJob).where(
+                PublishJob.id == candidate.id,
+                PublishJob.status == candidate.status,
+                PublishJob.attempts == candidate.attempts
+            ).values(**_claim_values(worker_id, now))
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            return await db.get(PublishJob, candidate.id)
+
+    return None
+
+
+async def _prefetch_media(job: PublishJob):
+    """Start downloading the media of a batch's post in the worker that runs one of its jobs.
+
+    Publishers of the batch running in this or another worker process wait
+    for these downloads (media cache file locks) instead of starting their own.
+    Telegram sends the files by their ids and downloads nothing.
+    """
+    if job.kind != "post" or not job.batch_id or job.platform == "telegram":
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            post = await db.get(Post, job.post_id)
+        if post is not None:
+            media_cache.schedule_prefetch((post.photos or []) + (post.videos or []))
+    except Exception as e:
+        logger.warning(f"Could not prefetch media of job {job.id}: {str(e)}")
+
+
+async def _run_job(job: PublishJob) -> bool:
+    """Call the publisher for the job's kind and platform."""
+    if job.kind == "post":
+        if job.platform == "vk":
+            from app.workers.vk.publisher import publish_post_to_vk
+            return await publish_post_to_vk(job.post_id, mode=job.mode)
+        elif job.platform == "telegram":
+            from app.workers.telegram.publisher import publish_post_to_telegram
+            return await publish_post_to_telegram(job.post_id, mode=job.mode)
+        elif job.platform == "instagram":
+            from app.workers.instagram.publisher import publish_post_to_instagram
+            return await publish_post_to_instagram(job.post_id, mode=job.mode)
+    elif job.kind == "story":
+        if job.platform == "vk":
+            from app.workers.vk.story_publisher import publish_story_to_vk
+            return await publish_story_to_vk(job.story_id)
+        elif job.platform == "telegram":
+            from app.workers.telegram.story_publisher import publish_story_to_telegram
+            return await publish_story_to_telegram(job.story_id)
+        elif job.platform == "instagram":
+            from app.workers.instagram.story_publisher import publish_story_to_instagram
+            return await publish_story_to_instagram(job.story_id)
+
+    raise ValueError(f"Unsupported job: {job.kind} to {job.platform}")
+
+
+async def _last_error(db: AsyncSession, job: PublishJob) -> Optional[str]:
+    """Message of the latest error log written by the publisher."""
+    if job.kind == "post":
+        statement = select(PublicationLog.message).where(
+            PublicationLog.post_id == job.post_id,
+            PublicationLog.platform == job.platform,
+            PublicationLog.status == "error"
+        ).order_by(PublicationLog.id.desc())
+    else:
+        statement = select(StoryPublicationLog.message).where(
+            StoryPublicationLog.story_id == job.story_id,
+            StoryPublicationLog.status == "error"
+        ).order_by(StoryPublicationLog.id.desc())
+    return (await db.execute(statement.limit(1))).scalar()
+
+
+def _log_exception(db: AsyncSession, job: PublishJob, message: str):
+    """Add a publication log for an exception the publisher did not handle."""
+    if job.kind == "post":
+        db.add(PublicationLog(post_id=job.post_id, platform=job.platform, status="error", message=message))
+    else:
+        db.add(StoryPublicationLog(story_id=job.story_id, status="error", message=message))
+
+
+async def _finish_job(job_id: str, success: bool, error: Optional[str] = None, exception: bool = False,
+                      throttled: float = 0.0):
+    async with AsyncSessionLocal() as db:
+        job = await db.get(PublishJob, job_id)
+        if job is None:
+            # The post or story was deleted while the job was running
+            return
+
+        now = datetime.utcnow()
+        job.locked_until = None
+        job.throttled_seconds = (job.throttled_seconds or 0.0) + throttled
+        if success:
+            job.status = "success"
+            job.error = None
+            job.finished_at = now
+        else:
+            if exception:
+                _log_exception(db, job, error)
+            job.error = error or await _last_error(db, job) or f"Failed to publish to {job.platform}"
+            if job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_after = now + timedelta(seconds=JOB_RETRY_DELAY * job.attempts)
+            else:
+                job.status = "error"
+                job.finished_at = now
+        await db.commit()
+
+        logger.info(f"Job {job_id} finished with status {job.status}")
+
+
+async def _keep_lease(job_id: str, worker_id: str):
+    """Extend the job lease while the publisher is running."""
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(PublishJob).where(
+                        PublishJob.id == job_id,
+                        PublishJob.worker_id == worker_id,
+                        PublishJob.status == "running"
+                    ).values(locked_until=datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS))
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Could not extend lease of job {job_id}: {str(e)}")
+
+
+async def process_job(job: PublishJob, worker_id: str):
+    """Run a claimed job and store its result."""
+    if job.attempts > job.max_attempts:
+        # Claimed again after the previous worker died, do not publish twice
+        await _finish_job(job.id, False, "Worker stopped before the job finished")
+        return
+
+    logger.info(f"Worker {worker_id} started job {job.id} ({job.kind} to {job.platform}, attempt {job.attempts})")
+    lease = asyncio.ensure_future(_keep_lease(job.id, worker_id))
+    await _prefetch_media(job)
+    # Time the publisher waits for the platform rate limits is stored on the job
+    with track_throttling() as throttled:
+        try:
+            success = await _run_job(job)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            await _finish_job(job.id, False, str(e), exception=True, throttled=throttled.seconds)
+            return
+        finally:
+            lease.cancel()
+
+    if throttled.seconds:
+        logger.info(f"Job {job.id} waited {throttled.seconds:.2f}s for {job.platform} rate limits")
+    await _finish_job(job.id, success, throttled=throttled.seconds)
+
+
+async def worker_loop(worker_id: str, stop_event: asyncio.Event):
+    """Claim and run jobs until ``stop_event`` is set."""
+    while not stop_event.is_set():
+        job = None
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await claim_job(db, worker_id)
+                if job is not None:
+                    db.expunge(job)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+
+        if job is not None:
+            await process_job(job, worker_id)
+            continue
+
+        # Queue is empty: sleep until a local enqueue or the next poll
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_workers(count: int = JOB_WORKERS, stop_event: Optional[asyncio.Event] = None):
+    """Run ``count`` workers in this process."""
+    if count <= 0:
+        logger.info("Job workers are disabled in this process")
+        return
+
+    from app.workers import platform_clients
+
+    stop_event = stop_event or asyncio.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Starting {count} job workers")
+
+    # Log in to the platforms in the background, a job that needs a client waits for it
+    warm_up = asyncio.ensure_future(platform_clients.warm_up())
+    try:
+        await asyncio.gather(*(worker_loop(f"{prefix}:{i}", stop_event) for i in range(count)))
+    finally:
+        warm_up.cancel()
+
+
+async def main():
+    """Run standalone workers until SIGTERM/SIGINT; running jobs are finished first."""
+    from app.utils import clients
+    from app.workers import executor
+
+    stop_event = asyncio.Event()
+
+    def request_stop():
+        logger.info("Stopping job workers after the running jobs")
+        stop_event.set()
+        notify()
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, request_stop)
+
+    await clients.startup()
+    try:
+        await run_workers(max(JOB_WORKERS, 1), stop_event)
+    finally:
+        await clients.shutdown()
+        executor.shutdown(wait=False)
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(main())
@@ -0,0 +1,199 @@
+"""
+Process-wide rate limits of the platform APIs.
+
+Every Telegram request (``TelegramRateLimitMiddleware`` on the shared bot) and
+every VK API call (``RateLimitedVkApi``) takes tokens from the bucket of its
+platform and, where a target limit is configured, from the bucket of its
+target chat. Callers queue for tokens instead of running into flood control.
+
+Flood-control answers that still happen (Telegram 429 ``retry_after``, VK
+error 6 "too many requests per second") pause the bucket for the requested
+time and the call is retried up to ``RATE_LIMIT_RETRIES`` times.
+
+The limits apply per process: with several worker processes, lower them so
+that their sum stays under the platform limits. The time a job waits for
+tokens is collected with ``track_throttling`` and stored on the job.
+"""
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMediaGroup
+
+from app.config.settings import (
+    TELEGRAM_RATE_LIMIT, TELEGRAM_CHAT_RATE_LIMIT, VK_RATE_LIMIT, RATE_LIMIT_RETRIES, TELEGRAM_CHANNEL_ID
+)
+
+logger = logging.getLogger(__name__)
+
+# Requests per second and burst size of each platform
+PLATFORM_LIMITS = {
+    "telegram": (TELEGRAM_RATE_LIMIT, TELEGRAM_RATE_LIMIT),
+    # VK limits requests per access token, all VK sessions share it
+    "vk": (VK_RATE_LIMIT, VK_RATE_LIMIT),
+}
+
+# Requests per second and burst size for each target of a platform
+TARGET_LIMITS = {
+    # Telegram allows about 20 messages per minute to one group or channel,
+    # private chats have no limit of their own
+    "telegram": (TELEGRAM_CHAT_RATE_LIMIT / 60, TELEGRAM_CHAT_RATE_LIMIT),
+}
+
+
+class TokenBucket:
+    """Token bucket that hands out tokens in arrival order (thread-safe)."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, cost: float = 1) -> float:
+        """Take ``cost`` tokens and return how many seconds to wait before using them."""
+        cost = min(cost, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: later callers wait behind the earlier ones
+            self._tokens -= cost
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for ``seconds`` (the platform asked to slow down)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class _WaitCounter:
+    def __init__(self):
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.seconds += seconds
+
+
+_throttled: ContextVar[Optional[_WaitCounter]] = ContextVar("throttled", default=None)
+
+
+@contextmanager
+def track_throttling() -> Iterator[_WaitCounter]:
+    """Sum the time the calls made in this context wait for the rate limits."""
+    counter = _WaitCounter()
+    token = _throttled.set(counter)
+    try:
+        yield counter
+    finally:
+        _throttled.reset(token)
+
+
+def _record_wait(seconds: float):
+    counter = _throttled.get()
+    if counter is not None:
+        counter.add(seconds)
+
+
+class RateLimiter:
+    """Token buckets per platform and per platform target."""
+
+    def __init__(self, platform_limits: Dict[str, Tuple[float, float]],
+                 target_limits: Dict[str, Tuple[float, float]]):
+        self.platform_limits = platform_limits
+        self.target_limits = target_limits
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, platform: str, target: Optional[str]) -> Optional[TokenBucket]:
+        limits = self.target_limits.get(platform) if target is not None else self.platform_limits.get(platform)
+        if limits is None:
+            return None
+        key = (platform, target)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(*limits)
+            return bucket
+
+    def _buckets_for(self, platform: str, target) -> List[TokenBucket]:
+        buckets = [self._bucket(platform, None)]
+        if target is not None:
+            buckets.append(self._bucket(platform, str(target)))
+        return [bucket for bucket in buckets if bucket is not None]
+
+    def reserve(self, platform: str, target=None, cost: float = 1) -> float:
+        """Take tokens for one call and return how many seconds to wait before making it."""
+        wait = max([bucket.reserve(cost) for bucket in self._buckets_for(platform, target)], default=0.0)
+        if wait > 0:
+            _record_wait(wait)
+        return wait
+
+    async def acquire(self, platform: str, target=None, cost: float = 1):
+        """Wait until a call to ``target`` of ``platform`` is allowed."""
+        wait = self.reserve(platform, target, cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, platform: str, target=None, cost: float = 1):
+        """Blocking ``acquire`` for calls made in worker threads."""
+        wait = self.reserve(platform, target, cost)
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, platform: str, target=None, seconds: float = 1.0):
+        """Pause the target's bucket (or the platform's without a target) after a flood-control error."""
+        bucket = self._bucket(platform, str(target) if target is not None else None)
+        if bucket is None:
+            bucket = self._bucket(platform, None)
+        if bucket is not None:
+            bucket.pause(seconds)
+
+
+rate_limiter = RateLimiter(PLATFORM_LIMITS, TARGET_LIMITS)
+
+
+def _telegram_target(chat_id):
+    """Chat with its own message limit: a group or channel (negative id, username or the publishing channel).
+
+    Private chats, such as the bot's dialogs with the admins, only count
+    against the per-bot limit.
+    """
+    if chat_id is None:
+        return None
+    if str(chat_id) == str(TELEGRAM_CHANNEL_ID) or str(chat_id).startswith("@"):
+        return chat_id
+    try:
+        return chat_id if int(chat_id) < 0 else None
+    except ValueError:
+        return None
+
+
+class TelegramRateLimitMiddleware(BaseRequestMiddleware):
+    """Rate limits the requests of an aiogram bot and retries 429 answers."""
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = _telegram_target(getattr(method, "chat_id", None))
+        # Every item of an album counts as a message
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await rate_limiter.acquire("telegram", chat_id, cost)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                logger.warning(f"Telegram flood control on {type(method).__name__}, retrying in {e.retry_after}s")
+                rate_limiter.pause("telegram", chat_id, e.retry_after)
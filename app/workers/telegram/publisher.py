@@ -1,15 +1,16 @@
 
 import logging
 import asyncio
-from aiogram import Bot
 from aiogram.types import InputMediaPhoto, InputMediaVideo
 from aiogram.enums import ParseMode  # Изменен импорт ParseMode
+from aiogram.exceptions import TelegramBadRequest
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 
-from app.config.settings import TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID
-from app.db.database import SessionLocal
+from app.config.settings import TELEGRAM_CHANNEL_ID
+from app.db.database import AsyncSessionLocal
 from app.api.models.post import Post, PublicationLog
+from app.utils.clients import get_bot
 from app.utils.text_formatter import format_for_telegram
 
 logger = logging.getLogger(__name__)
@@ -18,79 +19,142 @@ class TelegramPublisher:
     """Class for publishing posts to Telegram channel."""
 
     def __init__(self):
-        """Initialize Telegram bot."""
-        self.bot = Bot(token=TELEGRAM_BOT_TOKEN)
+        """Use the shared Telegram bot."""
+        self.bot = get_bot()
+
+    async def _send(self, text, photos, videos):
+        """Send the post and return the ids of the sent messages in media order."""
+        # Check if post has media
+        if photos or videos:
+            # Prepare media group
+            media = []
+
+            # Log the media order for debugging
+            logger.info(f"Original photos order: {photos}")
+            logger.info(f"Original videos order: {videos}")
+
+            # Add all media to the group with caption on the first item
+            if len(photos) > 0:
+                # First photo gets the caption
+                media.append(InputMediaPhoto(media=photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2))
+                # Add remaining photos without caption
+                for file_id in photos[1:]:
+                    media.append(InputMediaPhoto(media=file_id))
+                # Add all videos without caption
+                for file_id in videos:
+                    media.append(InputMediaVideo(media=file_id))
+            else:
+                # First video gets the caption
+                media.append(InputMediaVideo(media=videos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2))
+                # Add remaining videos without caption
+                for file_id in videos[1:]:
+                    media.append(InputMediaVideo(media=file_id))
+
+            # Send media group in batches of 10 (Telegram limit)
+            message_ids = []
+            for i in range(0, len(media), 10):
+                batch = media[i:i + 10]
+                logger.info(f"Sending batch of {len(batch)} media items")
+                messages = await self.bot.send_media_group(TELEGRAM_CHANNEL_ID, media=batch)
+                message_ids += [message.message_id for message in messages]
+            return message_ids
+
+        # Send text only
+        message = await self.bot.send_message(TELEGRAM_CHANNEL_ID, text, parse_mode=ParseMode.MARKDOWN_V2)
+        return [message.message_id]
+
+    @staticmethod
+    async def _edit_message(request):
+        """Run an edit request; an edit that changes nothing is not an error."""
+        try:
+            await request
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
+
+    async def _edit(self, published, text, photos, videos):
+        """Edit the messages sent before: only the changed media and the caption.
+
+        Returns False if the layout changed (number of media items, or text
+        only vs media), which Telegram cannot edit in place, or if a message
+        cannot be edited any more (for example, it was deleted from the channel).
+        """
+        try:
+            return await self._edit_messages(published, text, photos, videos)
+        except TelegramBadRequest as e:
+            logger.warning(f"Could not edit Telegram messages {published['message_ids']}: {str(e)}")
+            return False
+
+    async def _edit_messages(self, published, text, photos, videos):
+        message_ids = published["message_ids"]
+        old_media = published.get("media", [])
+        new_media = photos + videos
+        if len(old_media) != len(new_media) or len(message_ids) != max(len(new_media), 1):
+            return False
 
-    async def publish_post(self, post_id):
-        """Publish a post to Telegram channel."""
-        db = SessionLocal()
+        if not new_media:
+            if text != published.get("text"):
+                await self._edit_message(self.bot.edit_message_text(
+                    text, chat_id=TELEGRAM_CHANNEL_ID, message_id=message_ids[0], parse_mode=ParseMode.MARKDOWN_V2
+                ))
+            return True
+
+        caption_changed = text != published.get("text")
+        for index, (old_file_id, new_file_id) in enumerate(zip(old_media, new_media)):
+            if old_file_id == new_file_id:
+                continue
+            # The caption stays on the first item of the album
+            caption = {"caption": text, "parse_mode": ParseMode.MARKDOWN_V2} if index == 0 else {}
+            input_media = InputMediaPhoto if new_file_id in photos else InputMediaVideo
+            await self._edit_message(self.bot.edit_message_media(
+                input_media(media=new_file_id, **caption), chat_id=TELEGRAM_CHANNEL_ID, message_id=message_ids[index]
+            ))
+            if index == 0:
+                caption_changed = False
+
+        if caption_changed:
+            await self._edit_message(self.bot.edit_message_caption(
+                chat_id=TELEGRAM_CHANNEL_ID, message_id=message_ids[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2
+            ))
+        return True
+
+    async def publish_post(self, post_id, mode="publish"):
+        """Publish a post to Telegram channel; in "update" mode edit the messages sent before."""
+        db = AsyncSessionLocal()
         try:
             # Get post from database
-            post = db.query(Post).filter(Post.id == post_id).first()
+            post = await db.get(Post, post_id)
 
             if not post:
                 logger.error(f"Post {post_id} not found")
                 return False
 
-            # Log if already published, but continue with republishing
-            if post.is_published_telegram:
-                logger.info(f"Post {post_id} already published to Telegram, republishing")
-
             # Get post text and format it
             text = format_for_telegram(post.text)
+            photos = post.photos
+            videos = post.videos
+
+            published = post.get_remote_ids("telegram") if mode == "update" else {}
+            updated = False
+            if published.get("message_ids"):
+                logger.info(f"Updating Telegram messages of post {post_id}")
+                updated = await self._edit(published, text, photos, videos)
+                if not updated:
+                    # Media were added or removed, or the messages were deleted: replace them with new ones
+                    logger.info(f"Telegram messages of post {post_id} cannot be edited, sending the post again")
+                    try:
+                        await self.bot.delete_messages(TELEGRAM_CHANNEL_ID, published["message_ids"])
+                    except Exception as e:
+                        logger.warning(f"Could not delete old Telegram messages of post {post_id}: {str(e)}")
+                    post.set_remote_ids("telegram", {})
+            elif mode == "update":
+                logger.info(f"Post {post_id} has no known Telegram messages, publishing new ones")
+            elif post.is_published_telegram:
+                # Log if already published, but continue with republishing
+                logger.info(f"Post {post_id} already published to Telegram, republishing")
 
-            # Check if post has media
-            if post.photos or post.videos:
-                # Prepare media group
-                media = []
-
-                # Preserve the exact order of media as it was added by the user
-                all_media = []
-
-                # Get all photos and videos with their original order
-                photos = post.photos
-                videos = post.videos
-
-                # Log the media order for debugging
-                logger.info(f"Original photos order: {photos}")
-                logger.info(f"Original videos order: {videos}")
-
-                # Add all media to the group with caption on the first item
-                if len(photos) > 0 or len(videos) > 0:
-                    # Add the first item with caption
-                    if len(photos) > 0:
-                        # First photo gets the caption
-                        media.append(InputMediaPhoto(media=photos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2))
-                        # Add remaining photos without caption
-                        for file_id in photos[1:]:
-                            media.append(InputMediaPhoto(media=file_id))
-                        # Add all videos without caption
-                        for file_id in videos:
-                            media.append(InputMediaVideo(media=file_id))
-                    else:
-                        # First video gets the caption
-                        media.append(InputMediaVideo(media=videos[0], caption=text, parse_mode=ParseMode.MARKDOWN_V2))
-                        # Add remaining videos without caption
-                        for file_id in videos[1:]:
-                            media.append(InputMediaVideo(media=file_id))
-
-                # Send media group in batches of 10 (Telegram limit)
-                if len(media) > 0:
-                    # Send first batch (up to 10 items)
-                    first_batch = media[:min(10, len(media))]
-                    logger.info(f"Sending first batch of {len(first_batch)} media items")
-                    await self.bot.send_media_group(TELEGRAM_CHANNEL_ID, media=first_batch)
-
-                    # If there are more than 10 media files, send them in additional batches
-                    if len(media) > 10:
-                        for i in range(10, len(media), 10):
-                            batch = media[i:min(i+10, len(media))]
-                            if batch:
-                                logger.info(f"Sending additional batch of {len(batch)} media items")
-                                await self.bot.send_media_group(TELEGRAM_CHANNEL_ID, media=batch)
-            else:
-                # Send text only
-                await self.bot.send_message(TELEGRAM_CHANNEL_ID, text, parse_mode=ParseMode.MARKDOWN_V2)
+            message_ids = published["message_ids"] if updated else await self._send(text, photos, videos)
+            post.set_remote_ids("telegram", {"message_ids": message_ids, "media": photos + videos, "text": text})
 
             # Update post status in database
             post.is_published_telegram = True
@@ -101,13 +165,13 @@ class TelegramPublisher:
                 post_id=post.id,
                 platform="telegram",
                 status="success",
-                message="Published to Telegram"
+                message="Updated in Telegram" if updated else "Published to Telegram"
             )
             db.add(log)
 
-            db.commit()
+            await db.commit()
 
-            logger.info(f"Post {post_id} published to Telegram successfully")
+            logger.info(f"Post {post_id} {'updated in' if updated else 'published to'} Telegram successfully")
             return True
         except Exception as e:
             logger.error(f"Error publishing post {post_id} to Telegram: {str(e)}")
@@ -120,14 +184,13 @@ class TelegramPublisher:
                 message=str(e)
             )
             db.add(log)
-            db.commit()
+            await db.commit()
 
             return False
         finally:
-            db.close()
-            await self.bot.session.close()
+            await db.close()
 
-async def publish_post_to_telegram(post_id):
-    """Publish a post to Telegram channel."""
+async def publish_post_to_telegram(post_id, mode="publish"):
+    """Publish a post to Telegram channel ("update" edits the messages sent before)."""
     publisher = TelegramPublisher()
-    return await publisher.publish_post(post_id)
+    return await publisher.publish_post(post_id, mode)
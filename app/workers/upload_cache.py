@@ -0,0 +1,63 @@
+"""
+Remote ids of media already uploaded to a platform.
+
+Publishing a post again (or another post with the same Telegram file) looks
+up ``(platform, target, file_unique_id)`` in ``media_uploads`` and reuses the
+remote media instead of downloading and uploading the file again.
+``file_unique_id`` is the same for every file_id of one Telegram file.
+"""
+import logging
+from typing import Dict, Iterable
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.models.media_upload import MediaUpload
+
+logger = logging.getLogger(__name__)
+
+
+async def lookup_uploads(db: AsyncSession, platform: str, target: str,
+                         file_unique_ids: Iterable[str]) -> Dict[str, str]:
+    """Return ``{file_unique_id: remote_id}`` for the files already uploaded to ``target``."""
+    file_unique_ids = [file_unique_id for file_unique_id in set(file_unique_ids) if file_unique_id]
+    if not file_unique_ids:
+        return {}
+
+    rows = (await db.execute(
+        select(MediaUpload.file_unique_id, MediaUpload.remote_id).where(
+            MediaUpload.platform == platform,
+            MediaUpload.target == target,
+            MediaUpload.file_unique_id.in_(file_unique_ids)
+        )
+    )).all()
+    return {row.file_unique_id: row.remote_id for row in rows}
+
+
+async def save_uploads(db: AsyncSession, platform: str, target: str, uploads: Iterable[tuple]):
+    """Remember uploaded media: ``uploads`` are ``(file_unique_id, kind, remote_id)`` tuples."""
+    for file_unique_id, kind, remote_id in uploads:
+        if not file_unique_id:
+            continue
+        try:
+            # Savepoint: a concurrent publication may have stored the same file first
+            async with db.begin_nested():
+                db.add(MediaUpload(
+                    platform=platform,
+                    target=target,
+                    file_unique_id=file_unique_id,
+                    kind=kind,
+                    remote_id=remote_id
+                ))
+        except IntegrityError:
+            logger.info(f"Upload of {file_unique_id} to {platform} {target} is already stored")
+
+
+async def forget_uploads(db: AsyncSession, platform: str, target: str, file_unique_ids: Iterable[str]):
+    """Drop stored uploads, e.g. when the platform no longer accepts the remote media."""
+    await db.execute(delete(MediaUpload).where(
+        MediaUpload.platform == platform,
+        MediaUpload.target == target,
+        MediaUpload.file_unique_id.in_(list(file_unique_ids))
+    ))
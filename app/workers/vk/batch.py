@@ -0,0 +1,108 @@
+"""
+Batching of independent VK API calls into ``execute`` requests.
+
+VK runs up to 25 API calls sent as one ``execute`` request in order and
+returns all their results at once, so a publication that needs a dozen
+independent calls pays for one round trip (and one rate limit token)
+instead of a dozen. A call that failed inside ``execute`` gets its own
+``ApiError``; the other calls of the request are not affected.
+
+    batch = VKBatch(client.session)
+    server = batch.add("photos.getWallUploadServer", group_id=group_id)
+    saves = [batch.add("video.save", name=name, group_id=group_id) for name in names]
+    batch.execute()
+    server.result()  # the response, or raises the call's ApiError
+"""
+import json
+import logging
+from typing import Any, List, Optional
+
+import vk_api
+from vk_api.exceptions import ApiError
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of API calls in one execute request
+MAX_CALLS = 25
+
+
+class VKCall:
+    """One API call of a batch and, after ``VKBatch.execute``, its result."""
+
+    def __init__(self, method: str, params: dict):
+        self.method = method
+        self.params = params
+        self.done = False
+        self.error: Optional[ApiError] = None
+        self._result: Any = None
+
+    @classmethod
+    def resolved(cls, method: str, result: Any) -> "VKCall":
+        """A call answered without a request (for example from a cache)."""
+        call = cls(method, {})
+        call._result = result
+        call.done = True
+        return call
+
+    def result(self) -> Any:
+        """Response of the call; raises its ``ApiError`` if it failed."""
+        if not self.done:
+            raise RuntimeError(f"{self.method} has not been executed")
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+
+class VKBatch:
+    """Collects API calls and runs them in ``execute`` requests of up to 25 calls (blocking)."""
+
+    def __init__(self, session: vk_api.VkApi):
+        self.session = session
+        self._pending: List[VKCall] = []
+
+    def add(self, method: str, **params) -> VKCall:
+        call = VKCall(method, {key: value for key, value in params.items() if value is not None})
+        self._pending.append(call)
+        return call
+
+    def __len__(self):
+        return len(self._pending)
+
+    @staticmethod
+    def _code(calls: List[VKCall]) -> str:
+        # VKScript object literals are JSON
+        return "return [{}];".format(",".join(
+            f"API.{call.method}({json.dumps(call.params, ensure_ascii=False)})" for call in calls
+        ))
+
+    def _run(self, calls: List[VKCall]):
+        if len(calls) == 1:
+            # Nothing to batch: a plain call has clearer errors
+            call = calls[0]
+            try:
+                call._result = self.session.method(call.method, call.params)
+            except ApiError as e:
+                call.error = e
+            call.done = True
+            return
+
+        response = self.session.method("execute", {"code": self._code(calls)}, raw=True)
+        results = response.get("response") or [False] * len(calls)
+        # Failed calls return false, their errors are listed in the same order
+        errors = iter(response.get("execute_errors", []))
+        for call, result in zip(calls, results):
+            if result is False:
+                error = next(errors, None) or {"error_code": 0, "error_msg": "Unknown execute error"}
+                call.error = ApiError(self.session, call.method, call.params, False, error)
+            else:
+                call._result = result
+            call.done = True
+
+    def execute(self) -> List[VKCall]:
+        """Run all pending calls; each call keeps its own result or error."""
+        calls, self._pending = self._pending, []
+        for start in range(0, len(calls), MAX_CALLS):
+            chunk = calls[start:start + MAX_CALLS]
+            self._run(chunk)
+            logger.debug(f"Executed {len(chunk)} VK calls in one request")
+        return calls
@@ -0,0 +1,98 @@
+"""
+Memoized VK lookups: the "Wall Photos" album id, the wall and album photo
+upload servers and the story upload server, per group.
+
+Entries expire after ``VK_LOOKUP_TTL`` seconds. A publisher wraps the calls
+that use an entry in ``invalidate_on_error``: when such a call fails (the
+upload URL expired, the album was deleted), the entry is dropped and the
+next lookup asks VK again. Concurrent lookups of the same missing entry
+wait for one request instead of each making their own.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from vk_api.exceptions import ApiError
+
+from app.config.settings import VK_LOOKUP_TTL
+
+logger = logging.getLogger(__name__)
+
+# VK errors meaning that the album is gone or not accessible any more
+# (114: invalid album id, 200: access to album denied)
+ALBUM_ERRORS = (114, 200)
+
+
+class LookupCache:
+    """Thread-safe TTL cache for values fetched with blocking VK calls."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Cached value of ``key`` or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return entry[0]
+            return None
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def get(self, key: Hashable, fetch: Callable[[], Any]) -> Any:
+        """Cached value of ``key``, fetched with ``fetch()`` if missing or expired (blocking)."""
+        value = self.peek(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another thread may have fetched it while we waited
+            value = self.peek(key)
+            if value is None:
+                value = fetch()
+                self.put(key, value)
+            return value
+
+    def invalidate(self, *keys: Hashable):
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    logger.info(f"Dropped cached VK lookup {key}")
+
+    @contextmanager
+    def invalidate_on_error(self, *keys: Hashable, codes: Optional[Iterable[int]] = None):
+        """Drop ``keys`` if the block fails (only for VK errors with ``codes``, if given)."""
+        try:
+            yield
+        except Exception as e:
+            if codes is None or (isinstance(e, ApiError) and e.code in codes):
+                self.invalidate(*keys)
+            raise
+
+
+vk_lookups = LookupCache(VK_LOOKUP_TTL)
+
+
+def wall_album_key(group_id: int):
+    return ("wall_album", group_id)
+
+
+def wall_upload_key(group_id: int):
+    return ("wall_upload_server", group_id)
+
+
+def album_upload_key(group_id: int, album_id: int):
+    return ("album_upload_server", group_id, album_id)
+
+
+def story_upload_key(group_id: int):
+    return ("story_upload_server", group_id)
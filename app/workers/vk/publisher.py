@@ -1,257 +1,394 @@
-import vk_api
+import time
 import logging
-import aiohttp
 import asyncio
-import requests
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
+from vk_api.exceptions import ApiError
 
-from app.config.settings import VK_ACCESS_TOKEN, VK_GROUP_ID, API_HOST, API_PORT
-from app.db.database import SessionLocal
+from app.config.settings import VK_GROUP_ID, VK_DOWNLOAD_CONCURRENCY, VK_UPLOAD_CONCURRENCY
+from app.db.database import AsyncSessionLocal
 from app.api.models.post import Post, PublicationLog
+from app.utils.media_cache import media_cache
+from app.workers.executor import run_blocking
+from app.workers.platform_clients import VKClient, vk_client
+from app.workers.upload_cache import lookup_uploads, save_uploads, forget_uploads
+from app.workers.vk.batch import VKBatch, VKCall
+from app.workers.vk.lookups import (
+    vk_lookups, ALBUM_ERRORS, wall_album_key, wall_upload_key, album_upload_key
+)
 from app.utils.text_formatter import format_for_vk
 
 logger = logging.getLogger(__name__)
 
+# wall.edit errors meaning that the wall post is gone or cannot be edited any more
+# (15: access denied, 100: invalid post id, 210: access to wall's post denied)
+WALL_POST_ERRORS = (15, 100, 210)
+
+
+def _attachments_error(error: Exception) -> bool:
+    """Whether VK rejected the attachments of a wall post (media deleted in VK)."""
+    return isinstance(error, ApiError) and error.code == 100 and "attachment" in str(error).lower()
+
+
 class VKPublisher:
     """Class for publishing posts to VK."""
 
-    def __init__(self):
-        """Initialize VK API session."""
-        self.vk_session = vk_api.VkApi(token=VK_ACCESS_TOKEN)
-        self.vk = self.vk_session.get_api()
-        self.upload = vk_api.VkUpload(self.vk_session)
+    def __init__(self, client: VKClient):
+        """Use the shared VK API session."""
+        self.client = client
+        self.vk_session = client.session
+        self.vk = client.vk
+        self.upload = client.upload
+
+    def _find_wall_album(self):
+        """Find the "Wall Photos" album, creating it if needed (blocking)."""
+        albums = self.vk.photos.getAlbums(owner_id=-abs(int(VK_GROUP_ID)))
+
+        # Look for a "Wall Photos" album
+        for album in albums.get("items", []):
+            if album.get("title") == "Wall Photos":
+                return album.get("id")
+
+        # If no album found, create one
+        album = self.vk.photos.createAlbum(
+            title="Wall Photos",
+            group_id=abs(int(VK_GROUP_ID)),
+            description="Photos for wall posts"
+        )
+        return album.get("id")
+
+    def _get_wall_album_id(self):
+        """Return the id of the "Wall Photos" album (cached; only one thread creates it)."""
+        return vk_lookups.get(wall_album_key(abs(int(VK_GROUP_ID))), self._find_wall_album)
+
+    def _upload_to_album(self, temp_file):
+        """Upload a photo to the "Wall Photos" album (blocking)."""
+        group_id = abs(int(VK_GROUP_ID))
+        album_id = self._get_wall_album_id()
+        server_key = album_upload_key(group_id, album_id)
+
+        with vk_lookups.invalidate_on_error(wall_album_key(group_id), server_key, codes=ALBUM_ERRORS), \
+                vk_lookups.invalidate_on_error(server_key):
+            upload_server = vk_lookups.get(
+                server_key, lambda: self.vk.photos.getUploadServer(album_id=album_id, group_id=group_id)
+            )
+            with open(temp_file, 'rb') as f:
+                response = self.vk_session.http.post(upload_server['upload_url'], files={'file1': f}).json()
+
+            return self.vk.photos.save(
+                album_id=album_id,
+                group_id=group_id,
+                server=response['server'],
+                photos_list=response['photos_list'],
+                hash=response['hash']
+            )
 
-    async def download_telegram_file(self, file_id):
-        """Download file from Telegram by file_id."""
-        # Create a bot instance to get file info
-        bot = None
-        try:
-            from app.config.settings import TELEGRAM_BOT_TOKEN
-            from aiogram import Bot
-            bot = Bot(token=TELEGRAM_BOT_TOKEN)
+    def _upload_to_wall(self, temp_file):
+        """Upload a photo through the wall upload server (blocking)."""
+        group_id = abs(int(VK_GROUP_ID))
+        server_key = wall_upload_key(group_id)
 
-            # Get file info directly from Telegram
-            file_info = await bot.get_file(file_id)
-            file_path = file_info.file_path
+        with vk_lookups.invalidate_on_error(server_key):
+            upload_server = vk_lookups.get(server_key, lambda: self.vk.photos.getWallUploadServer(group_id=group_id))
 
-            # Get direct file URL
-            file_url = f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}"
+            # Upload photo to server
+            with open(temp_file, 'rb') as f:
+                response = self.vk_session.http.post(upload_server['upload_url'], files={'photo': f}).json()
 
-            # Download file with SSL verification disabled
-            async with aiohttp.ClientSession() as session:
-                try:
-                    # Create a custom SSL context that doesn't verify certificates
-                    import ssl
-                    ssl_context = ssl.create_default_context()
-                    ssl_context.check_hostname = False
-                    ssl_context.verify_mode = ssl.CERT_NONE
-
-                    async with session.get(file_url, ssl=ssl_context) as response:
-                        if response.status == 200:
-                            return await response.read()
-                        logger.error(f"Failed to download file from Telegram: {response.status}")
-                        return None
-                except Exception as e:
-                    logger.error(f"Error downloading file from Telegram: {str(e)}")
-                    return None
-        except Exception as e:
-            logger.error(f"Error downloading file {file_id} from Telegram: {str(e)}")
+            # Save photo to wall
+            return self.vk.photos.saveWallPhoto(
+                group_id=group_id,
+                photo=response['photo'],
+                server=response['server'],
+                hash=response['hash']
+            )
 
-            # Fallback to our API endpoint
+    def _upload_photo(self, temp_file):
+        """Upload a photo with vk_api and its fallbacks, return its attachment strings (blocking).
+
+        Used when the batched upload of a photo fails.
+        """
+        try:
+            # Try using photo_wall method
+            upload_result = self.upload.photo_wall(
+                temp_file,
+                group_id=abs(int(VK_GROUP_ID))
+            )
+        except Exception as e:
+            logger.error(f"Error using photo_wall: {str(e)}")
+            # Fallback to regular photo upload
             try:
-                async with aiohttp.ClientSession() as session:
-                    url = f"http://{API_HOST}:{API_PORT}/api/telegram/file/{file_id}"
-
-                    # Try to download directly from our API
-                    try:
-                        async with session.get(url) as response:
-                            if response.status == 200:
-                                return await response.read()
-                            logger.error(f"Failed to download file from API: {response.status}")
-                    except Exception as e2:
-                        logger.error(f"Error connecting to API: {str(e2)}")
-
-                    # If that fails, try a different approach - download directly from Telegram
-                    # but save to a temporary file first
-                    try:
-                        import tempfile
-                        import os
-
-                        # Create a temporary file
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-                            temp_path = temp_file.name
-
-                        # Use curl to download the file (curl handles SSL issues better)
-                        import subprocess
-                        curl_cmd = [
-                            "curl",
-                            "-s",
-                            "-k",  # Skip SSL verification
-                            f"https://api.telegram.org/file/bot{TELEGRAM_BOT_TOKEN}/{file_path}",
-                            "-o", temp_path
-                        ]
-
-                        process = subprocess.run(curl_cmd, capture_output=True)
-
-                        if process.returncode == 0:
-                            # Read the file
-                            with open(temp_path, "rb") as f:
-                                content = f.read()
-
-                            # Clean up
-                            os.unlink(temp_path)
-
-                            return content
-                    except Exception as e3:
-                        logger.error(f"Error using curl fallback: {str(e3)}")
-
-                # If all methods fail
-                return None
+                # Upload to the album
+                upload_result = self._upload_to_album(temp_file)
             except Exception as e2:
-                logger.error(f"Error in fallback methods for file {file_id}: {str(e2)}")
-                return None
-        finally:
-            if bot:
-                await bot.session.close()
-
-    async def publish_post(self, post_id):
-        """Publish a post to VK."""
-        db = SessionLocal()
+                logger.error(f"Error with fallback photo upload: {str(e2)}")
+                # Last resort - try uploading to wall directly
+                upload_result = self._upload_to_wall(temp_file)
+
+        # Format attachment string
+        return self._photo_attachments(upload_result)
+
+    @staticmethod
+    def _photo_attachments(photos):
+        return [f"photo{photo['owner_id']}_{photo['id']}" for photo in photos]
+
+    def _upload_servers(self, kinds, name, description):
+        """Upload servers for the new files of a post, in one execute request (blocking).
+
+        All photos share one wall upload server (cached between posts), each
+        video gets its own from video.save. Returns the batched call of each file.
+        """
+        group_id = abs(int(VK_GROUP_ID))
+        batch = VKBatch(self.vk_session)
+        photo_server = None
+        if "photo" in kinds:
+            cached = vk_lookups.peek(wall_upload_key(group_id))
+            if cached is not None:
+                photo_server = VKCall.resolved("photos.getWallUploadServer", cached)
+            else:
+                photo_server = batch.add("photos.getWallUploadServer", group_id=group_id)
+        servers = [
+            photo_server if kind == "photo" else
+            batch.add("video.save", name=name, description=description, group_id=group_id)
+            for kind in kinds
+        ]
+        batch.execute()
+
+        if photo_server is not None and photo_server.error is None:
+            vk_lookups.put(wall_upload_key(group_id), photo_server.result())
+        return servers
+
+    def _send_file(self, upload_url, kind, path):
+        """Send a file to a VK upload server and return its answer (blocking)."""
+        field = "photo" if kind == "photo" else "video_file"
+        with open(path, "rb") as f:
+            response = self.vk_session.http.post(upload_url, files={field: f})
+        response.raise_for_status()
+        data = response.json()
+        if kind == "photo" and data.get("photo") in (None, "", "[]"):
+            raise Exception(f"Upload server did not accept the photo: {data}")
+        return data
+
+    def _save_wall_photos(self, responses):
+        """Save photos sent to the wall upload server, in one execute request (blocking)."""
+        batch = VKBatch(self.vk_session)
+        calls = [
+            batch.add(
+                "photos.saveWallPhoto",
+                group_id=abs(int(VK_GROUP_ID)),
+                photo=response["photo"],
+                server=response["server"],
+                hash=response["hash"]
+            )
+            for response in responses
+        ]
+        batch.execute()
+        return calls
+
+    async def publish_post(self, post_id, mode="publish"):
+        """Publish a post to VK; in "update" mode edit the wall post published before."""
+        started = time.monotonic()
+        db = AsyncSessionLocal()
         try:
             # Get post from database
-            post = db.query(Post).filter(Post.id == post_id).first()
+            post = await db.get(Post, post_id)
 
             if not post:
                 logger.error(f"Post {post_id} not found")
                 return False
 
-            # Log if already published, but continue with republishing
-            if post.is_published_vk:
+            # Wall post published before: edit it in place, keeping the media that did not change
+            published = post.get_remote_ids("vk") if mode == "update" else {}
+            previous = published.get("media", {})
+            if mode == "update" and not published.get("post_id"):
+                logger.info(f"Post {post_id} has no known VK wall post, publishing a new one")
+            elif published:
+                logger.info(f"Updating VK wall post {published['post_id']} of post {post_id}")
+            elif post.is_published_vk:
+                # Log if already published, but continue with republishing
                 logger.info(f"Post {post_id} already published to VK, republishing")
 
             # Get post text and format it
             text = format_for_vk(post.text)
 
-            # Download and upload photos
-            photo_attachments = []
-            for file_id in post.photos:
+            # Media uploaded to the group before (same Telegram file) is reused by its VK id
+            target = str(abs(int(VK_GROUP_ID)))
+            media = [("photo", file_id) for file_id in post.photos] + [("video", file_id) for file_id in post.videos]
+            unique_ids = await asyncio.gather(*(media_cache.unique_id(file_id) for _, file_id in media))
+            uploaded = await lookup_uploads(db, "vk", target, unique_ids)
+            new_uploads = []
+
+            # New photos and videos: one execute request for their upload servers,
+            # parallel uploads, one execute request saving the photos
+            media_started = time.monotonic()
+            timings = {"download": 0.0, "upload": 0.0}
+            download_semaphore = asyncio.Semaphore(VK_DOWNLOAD_CONCURRENCY)
+            upload_semaphore = asyncio.Semaphore(VK_UPLOAD_CONCURRENCY)
+            video_description = text[:200] + "..." if len(text) > 200 else text
+
+            async def upload_new(kind, file_id, server):
+                """Download a new file and send it to its upload server; returns the path and VK's answer."""
+                # Get file from the shared media cache
+                async with download_semaphore:
+                    stage_started = time.monotonic()
+                    path = await media_cache.get_path(file_id)
+                    timings["download"] += time.monotonic() - stage_started
+
+                if not path:
+                    logger.error(f"Failed to download {kind} {file_id}")
+                    return None, None
+
                 try:
-                    # Download photo from Telegram
-                    photo_data = await self.download_telegram_file(file_id)
-
-                    if not photo_data:
-                        logger.error(f"Failed to download photo {file_id}")
-                        continue
-
-                    # Save photo to temporary file
-                    temp_file = f"/tmp/{file_id}.jpg"
-                    with open(temp_file, "wb") as f:
-                        f.write(photo_data)
-
-                    # Upload photo to VK wall
-                    try:
-                        # Try using photo_wall method
-                        upload_result = self.upload.photo_wall(
-                            temp_file,
-                            group_id=abs(int(VK_GROUP_ID))
+                    # Upload to VK in a worker thread (requests is synchronous)
+                    async with upload_semaphore:
+                        stage_started = time.monotonic()
+                        response = await run_blocking(
+                            "vk", self._send_file, server.result()["upload_url"], kind, str(path)
                         )
-                    except Exception as e:
-                        logger.error(f"Error using photo_wall: {str(e)}")
-                        # Fallback to regular photo upload
-                        try:
-                            # Create an album if needed
-                            albums = self.vk.photos.getAlbums(owner_id=-abs(int(VK_GROUP_ID)))
-                            album_id = None
-
-                            # Look for a "Wall Photos" album
-                            for album in albums.get("items", []):
-                                if album.get("title") == "Wall Photos":
-                                    album_id = album.get("id")
-                                    break
-
-                            # If no album found, create one
-                            if not album_id:
-                                album = self.vk.photos.createAlbum(
-                                    title="Wall Photos",
-                                    group_id=abs(int(VK_GROUP_ID)),
-                                    description="Photos for wall posts"
-                                )
-                                album_id = album.get("id")
-
-                            # Upload to the album
-                            upload_result = self.upload.photo(
-                                temp_file,
-                                album_id=album_id,
-                                group_id=abs(int(VK_GROUP_ID))
-                            )
-                        except Exception as e2:
-                            logger.error(f"Error with fallback photo upload: {str(e2)}")
-                            # Last resort - try uploading to wall directly
-                            upload_server = self.vk.photos.getWallUploadServer(group_id=abs(int(VK_GROUP_ID)))
-
-                            # Upload photo to server
-                            with open(temp_file, 'rb') as f:
-                                response = requests.post(upload_server['upload_url'], files={'photo': f}).json()
-
-                            # Save photo to wall
-                            save_result = self.vk.photos.saveWallPhoto(
-                                group_id=abs(int(VK_GROUP_ID)),
-                                photo=response['photo'],
-                                server=response['server'],
-                                hash=response['hash']
-                            )
-
-                            upload_result = save_result
-
-                    # Format attachment string
-                    for photo in upload_result:
-                        owner_id = photo["owner_id"]
-                        photo_id = photo["id"]
-                        photo_attachments.append(f"photo{owner_id}_{photo_id}")
+                        timings["upload"] += time.monotonic() - stage_started
+                    return path, response
                 except Exception as e:
-                    logger.error(f"Error uploading photo {file_id}: {str(e)}")
+                    logger.error(f"Error uploading {kind} {file_id}: {str(e)}")
+                    return path, None
 
-            # Download and upload videos
-            video_attachments = []
-            for file_id in post.videos:
+            async def finish_new(kind, file_id, unique_id, path, server, saved):
+                """Attachments of a new file; photos that failed go through the fallback uploads."""
                 try:
-                    # Download video from Telegram
-                    video_data = await self.download_telegram_file(file_id)
-
-                    if not video_data:
-                        logger.error(f"Failed to download video {file_id}")
-                        continue
-
-                    # Save video to temporary file
-                    temp_file = f"/tmp/{file_id}.mp4"
-                    with open(temp_file, "wb") as f:
-                        f.write(video_data)
-
-                    # Upload video to VK
-                    upload_result = self.upload.video(
-                        video_file=temp_file,
-                        name=post.name,
-                        description=text[:200] + "..." if len(text) > 200 else text,
-                        group_id=abs(int(VK_GROUP_ID))
+                    if kind == "video":
+                        if saved is None:
+                            return []
+                        video = server.result()
+                        result = [f"video{video['owner_id']}_{video['video_id']}"]
+                    else:
+                        try:
+                            if saved is None:
+                                raise Exception("photo was not uploaded")
+                            result = self._photo_attachments(saved.result())
+                        except Exception as e:
+                            # The cached wall upload server may have expired
+                            vk_lookups.invalidate(wall_upload_key(abs(int(VK_GROUP_ID))))
+                            if not path:
+                                return []
+                            logger.warning(f"Batched upload of photo {file_id} failed, trying fallbacks: {str(e)}")
+                            async with upload_semaphore:
+                                result = await run_blocking("vk", self._upload_photo, str(path))
+                    if unique_id and len(result) == 1:
+                        new_uploads.append((unique_id, kind, result[0]))
+                    return result
+                except Exception as e:
+                    logger.error(f"Error uploading {kind} {file_id}: {str(e)}")
+                    return []
+
+            async def collect_attachments(known):
+                results = {}
+                new = []
+                for (kind, file_id), unique_id in zip(media, unique_ids):
+                    if file_id in previous:
+                        results[file_id] = previous[file_id]
+                    elif unique_id in known:
+                        results[file_id] = [known[unique_id]]
+                    else:
+                        new.append((kind, file_id, unique_id))
+
+                if new:
+                    # Upload servers of all new files: one execute request
+                    servers = await run_blocking(
+                        "vk", self._upload_servers, [kind for kind, _, _ in new], post.name, video_description
                     )
-
-                    # Format attachment string
-                    owner_id = upload_result["owner_id"]
-                    video_id = upload_result["video_id"]
-                    video_attachments.append(f"video{owner_id}_{video_id}")
+                    # Downloads of the next files run while the current ones are being uploaded
+                    sent = await asyncio.gather(*[
+                        upload_new(kind, file_id, server) for (kind, file_id, _), server in zip(new, servers)
+                    ])
+
+                    # Save all uploaded photos: one more execute request
+                    photos = [
+                        index for index, ((kind, _, _), (_, response)) in enumerate(zip(new, sent))
+                        if kind == "photo" and response
+                    ]
+                    saved = dict(zip(photos, await run_blocking(
+                        "vk", self._save_wall_photos, [sent[index][1] for index in photos]
+                    )))
+                    # Uploaded videos need no further call
+                    saved.update({
+                        index: response for index, ((kind, _, _), (_, response)) in enumerate(zip(new, sent))
+                        if kind == "video" and response
+                    })
+
+                    attachments = await asyncio.gather(*[
+                        finish_new(kind, file_id, unique_id, sent[index][0], servers[index], saved.get(index))
+                        for index, (kind, file_id, unique_id) in enumerate(new)
+                    ])
+                    results.update({file_id: result for (_, file_id, _), result in zip(new, attachments)})
+
+                # Attachments of each file in the order the files were added to the post,
+                # stored to edit the wall post later
+                return {file_id: results[file_id] for _, file_id in media if results.get(file_id)}
+
+            def wall_post(attachments):
+                joined = ",".join(attachment for result in attachments.values() for attachment in result)
+                if published:
+                    return run_blocking(
+                        "vk",
+                        self.vk.wall.edit,
+                        owner_id=-abs(int(VK_GROUP_ID)),
+                        post_id=published["post_id"],
+                        message=text,
+                        attachments=joined
+                    )
+                return run_blocking(
+                    "vk",
+                    self.vk.wall.post,
+                    owner_id=-abs(int(VK_GROUP_ID)),  # Negative ID for group
+                    from_group=1,  # Post as group
+                    message=text,
+                    attachments=joined
+                )
+
+            attachments = await collect_attachments(uploaded)
+            media_elapsed = time.monotonic() - media_started
+
+            async def post_attachments():
+                nonlocal attachments, previous
+                try:
+                    return await wall_post(attachments)
                 except Exception as e:
-                    logger.error(f"Error uploading video {file_id}: {str(e)}")
-
-            # Combine all attachments
-            attachments = ",".join(photo_attachments + video_attachments)
+                    if not _attachments_error(e) or (not uploaded and not previous):
+                        raise
+                    # Media uploaded before may have been deleted in VK: upload everything again
+                    logger.warning(f"wall.{'edit' if published else 'post'} with reused media failed, "
+                                   f"uploading the media again: {str(e)}")
+                    await forget_uploads(db, "vk", target, uploaded.keys())
+                    previous = {}
+                    attachments = await collect_attachments({})
+                    return await wall_post(attachments)
 
             # Post to VK wall
-            self.vk.wall.post(
-                owner_id=-abs(int(VK_GROUP_ID)),  # Negative ID for group
-                from_group=1,  # Post as group
-                message=text,
-                attachments=attachments
+            post_started = time.monotonic()
+            try:
+                result = await post_attachments()
+            except ApiError as e:
+                if not published or e.code not in WALL_POST_ERRORS or _attachments_error(e):
+                    raise
+                # The wall post was deleted in VK: publish a new one instead
+                logger.warning(f"VK wall post {published['post_id']} of post {post_id} cannot be edited, "
+                               f"publishing a new one: {str(e)}")
+                post.set_remote_ids("vk", {})
+                published = {}
+                result = await post_attachments()
+            post_elapsed = time.monotonic() - post_started
+
+            # wall.post returns the id of the new wall post, wall.edit keeps the old one
+            remote_post_id = published.get("post_id") or (result or {}).get("post_id")
+            if remote_post_id:
+                post.set_remote_ids("vk", {"post_id": remote_post_id, "media": attachments})
+
+            await save_uploads(db, "vk", target, new_uploads)
+
+            logger.info(
+                f"Post {post_id} VK timings: {len(post.photos)} photos and {len(post.videos)} videos "
+                f"({len(uploaded)} reused) in {media_elapsed:.2f}s (download {timings['download']:.2f}s, "
+                f"upload {timings['upload']:.2f}s summed over files), "
+                f"wall.{'edit' if published else 'post'} {post_elapsed:.2f}s, total {time.monotonic() - started:.2f}s"
             )
 
             # Update post status in database
@@ -263,16 +400,17 @@ class VKPublisher:
                 post_id=post.id,
                 platform="vk",
                 status="success",
-                message="Published to VK"
+                message="Updated in VK" if published else "Published to VK"
             )
             db.add(log)
 
-            db.commit()
+            await db.commit()
 
-            logger.info(f"Post {post_id} published to VK successfully")
+            logger.info(f"Post {post_id} {'updated in' if published else 'published to'} VK successfully")
             return True
         except Exception as e:
             logger.error(f"Error publishing post {post_id} to VK: {str(e)}")
+            vk_client.mark_failed()
 
             # Add error log
             log = PublicationLog(
@@ -282,13 +420,13 @@ class VKPublisher:
                 message=str(e)
             )
             db.add(log)
-            db.commit()
+            await db.commit()
 
             return False
         finally:
-            db.close()
+            await db.close()
 
-async def publish_post_to_vk(post_id):
-    """Publish a post to VK."""
-    publisher = VKPublisher()
-    return await publisher.publish_post(post_id)
+async def publish_post_to_vk(post_id, mode="publish"):
+    """Publish a post to VK ("update" edits the wall post published before)."""
+    publisher = VKPublisher(await vk_client.get())
+    return await publisher.publish_post(post_id, mode)
@@ -1,134 +1,144 @@
-import vk_api
 import logging
-import aiohttp
 import asyncio
 import requests
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 import os
-from PIL import Image, ImageDraw, ImageFont
-import io
 import json
 
-from app.config.settings import VK_ACCESS_TOKEN, VK_GROUP_ID, API_HOST, API_PORT
-from app.db.database import SessionLocal
+from app.config.settings import VK_ACCESS_TOKEN, VK_GROUP_ID
+from app.db.database import AsyncSessionLocal
 from app.api.models.story import Story, StoryPublicationLog
+from app.utils.media_cache import media_cache
+from app.utils.story_renderer import render_story_image
+from app.workers.executor import run_blocking
+from app.workers.platform_clients import VKClient, vk_stories_client
+from app.workers.vk.batch import VKBatch
+from app.workers.vk.lookups import vk_lookups, story_upload_key
 
 logger = logging.getLogger(__name__)
 
 class VKStoryPublisher:
     """Class for publishing stories to VK."""
 
-    def __init__(self):
-        """Initialize VK API session."""
-        self.vk_session = vk_api.VkApi(token=VK_ACCESS_TOKEN, api_version="5.131")
-        self.vk = self.vk_session.get_api()
-        self.upload = vk_api.VkUpload(self.vk_session)
+    def __init__(self, client: VKClient):
+        """Use the shared VK API session."""
+        self.vk_session = client.session
+        self.vk = client.vk
+        self.upload = client.upload
 
     async def download_telegram_file(self, file_id):
-        """Download file from Telegram."""
+        """Download file from Telegram (through the shared media cache)."""
+        logger.info(f"Getting file {file_id} from media cache")
+        return await media_cache.get_bytes(file_id)
+
+    def _get_upload_server(self):
+        """Request the story upload server of the group (blocking)."""
+        # Получаем адрес сервера для загрузки истории
+        logger.info(f"Getting upload server for VK story, group_id={abs(int(VK_GROUP_ID))}")
+        upload_server = self.vk.stories.getPhotoUploadServer(
+            add_to_news=1,  # Добавить в новости
+            group_id=abs(int(VK_GROUP_ID)),  # ID группы (положительное число)
+            user_ids=[],  # Пустой список пользователей
+        )
+
+        logger.info(f"VK upload server response: {upload_server}")
+
+        if not upload_server or 'upload_url' not in upload_server:
+            logger.error(f"Failed to get upload server for VK story: {upload_server}")
+            raise Exception("Failed to get upload server for VK story")
+        return upload_server
+
+    def _upload_story(self, image_path):
+        """Upload a story image to the VK group and return the story link (blocking).
+
+        The upload server is cached between stories; if an upload through a
+        cached server fails, a new server is requested and the upload retried once.
+        """
+        key = story_upload_key(abs(int(VK_GROUP_ID)))
+        cached = vk_lookups.peek(key) is not None
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"http://{API_HOST}:{API_PORT}/api/telegram/file/{file_id}"
-                logger.info(f"Downloading file from: {url}")
-
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        logger.info(f"Successfully downloaded file {file_id}")
-                        return await response.read()
-                    else:
-                        logger.error(f"Failed to download file {file_id}: {response.status}")
-                        return None
+            return self._upload_story_to(vk_lookups.get(key, self._get_upload_server), image_path)
         except Exception as e:
-            logger.error(f"Error downloading file {file_id}: {str(e)}")
-            return None
+            vk_lookups.invalidate(key)
+            if not cached:
+                raise
+            logger.warning(f"Story upload through the cached upload server failed, retrying: {str(e)}")
+            return self._upload_story_to(vk_lookups.get(key, self._get_upload_server), image_path)
+
+    def _upload_story_to(self, upload_server, image_path):
+        """Upload and save a story through ``upload_server`` (blocking)."""
+        # Загружаем фото на сервер
+        logger.info(f"Uploading story to VK server: {upload_server['upload_url']}")
+        with open(image_path, 'rb') as file:
+            response = requests.post(upload_server['upload_url'], files={'file': file})
+
+        if response.status_code != 200:
+            logger.error(f"Failed to upload story to VK: {response.status_code} {response.text}")
+            raise Exception(f"Failed to upload story to VK: {response.status_code}")
+
+        upload_data = response.json()
+        logger.info(f"VK upload response: {upload_data}")
 
-    def create_story_image(self, image_data, model_name, price):
-        """Create a story image with model name and price overlay."""
+        # Проверяем наличие upload_result в ответе
+        # В новой версии API VK upload_result находится внутри поля response
+        upload_result = None
+        if 'upload_result' in upload_data:
+            upload_result = upload_data['upload_result']
+        elif 'response' in upload_data and 'upload_result' in upload_data['response']:
+            upload_result = upload_data['response']['upload_result']
+        
+        if not upload_result:
+            logger.error(f"Invalid upload response from VK: {upload_data}")
+            raise Exception("Invalid upload response from VK")
+
+        # Сохраняем историю и сразу проверяем список историй группы: оба вызова
+        # выполняются по порядку в одном запросе execute
+        logger.info(f"Saving story to VK with upload_result: {upload_result[:30]}...")
+        batch = VKBatch(self.vk_session)
+        save = batch.add("stories.save", upload_results=upload_result, group_id=abs(int(VK_GROUP_ID)))
+        check = batch.add("stories.get", owner_id=VK_GROUP_ID)
+        batch.execute()
+        save_result = save.result()
+
+        logger.info(f"VK save result: {save_result}")
+
+        # Новые версии API возвращают {"count": ..., "items": [...]}
+        if isinstance(save_result, dict):
+            save_result = save_result.get("items")
+
+        # Проверяем результат сохранения
+        if not save_result or not isinstance(save_result, list) or len(save_result) == 0:
+            logger.error(f"Failed to save story to VK: {save_result}")
+            raise Exception("Failed to save story to VK")
+
+        # Получаем ID истории и ссылку
+        story_data = save_result[0]
+        owner_id = story_data.get('owner_id', VK_GROUP_ID)
+        vk_story_id = story_data.get('id', 'unknown')
+        story_link = f"https://vk.com/stories{owner_id}_{vk_story_id}"
+        logger.info(f"Story published to VK: {story_link}")
+
+        # Проверяем, что история действительно опубликована
         try:
-            # Open the image
-            image = Image.open(io.BytesIO(image_data))
-            logger.info(f"Original image size: {image.size}")
-
-            # Resize image to story format (9:16)
-            width, height = image.size
-            target_ratio = 9 / 16
-            current_ratio = width / height
-
-            if current_ratio > target_ratio:
-                # Image is too wide, crop width
-                new_width = int(height * target_ratio)
-                left = (width - new_width) // 2
-                image = image.crop((left, 0, left + new_width, height))
-            elif current_ratio < target_ratio:
-                # Image is too tall, crop height
-                new_height = int(width / target_ratio)
-                top = (height - new_height) // 2
-                image = image.crop((0, top, width, top + new_height))
-
-            # Resize to standard story size
-            image = image.resize((1080, 1920))
-            logger.info(f"Resized image to: {image.size}")
-
-            # Create a drawing context
-            draw = ImageDraw.Draw(image)
-
-            # Try to load a font, fall back to default if not available
-            font_large = None
-            try:
-                # Пробуем загрузить Arial
-                font_large = ImageFont.truetype("arial.ttf", 80)
-                logger.info("Using Arial font")
-            except IOError:
-                try:
-                    # Пробуем загрузить системный шрифт Arial
-                    font_large = ImageFont.truetype("/System/Library/Fonts/Supplemental/Arial.ttf", 80)
-                    logger.info("Using system Arial font")
-                except IOError:
-                    try:
-                        # Пробуем загрузить DejaVuSans
-                        font_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 80)
-                        logger.info("Using DejaVuSans font")
-                    except IOError:
-                        # Если не удалось, используем стандартный
-                        font_large = ImageFont.load_default()
-                        logger.info("Using default font")
-
-            # Формируем текст в одну строку
-            text = ""
-            if model_name and price:
-                text = f"{model_name} - {price}"
-            elif model_name:
-                text = model_name
-            elif price:
-                text = f"Цена: {price}"
-
-            if text:
-                logger.info(f"Adding text overlay: {text}")
-                # Рисуем текст с обводкой для лучшей видимости на любом фоне
-                # Сначала рисуем черную обводку
-                for offset_x, offset_y in [(-2, -2), (-2, 2), (2, -2), (2, 2)]:
-                    draw.text((540 + offset_x, 1800 + offset_y), text, font=font_large, fill=(0, 0, 0), anchor="ms")
-
-                # Затем рисуем белый текст поверх
-                draw.text((540, 1800), text, font=font_large, fill=(255, 255, 255), anchor="ms")
-
-            # Save the image to a buffer
-            buffer = io.BytesIO()
-            image.save(buffer, format="JPEG", quality=95)
-            buffer.seek(0)
-
-            return buffer.getvalue()
+            stories = check.result()
+            logger.info(f"VK stories response: {stories}")
+
+            if not stories or 'items' not in stories or len(stories['items']) == 0:
+                logger.warning(f"Story may not be published to VK: no stories found for group {VK_GROUP_ID}")
+                # Но продолжаем, так как сохранение истории прошло успешно
         except Exception as e:
-            logger.error(f"Error creating story image: {str(e)}")
-            return None
+            logger.warning(f"Could not verify story publication: {str(e)}")
+            # Продолжаем, так как основная операция сохранения прошла успешно
+
+        return story_link
 
     async def publish_story(self, story_id):
         """Publish a story to VK."""
-        db = SessionLocal()
+        db = AsyncSessionLocal()
         try:
             # Get story from database
-            story = db.query(Story).filter(Story.id == story_id).first()
+            story = await db.get(Story, story_id)
 
             if not story:
                 logger.error(f"Story {story_id} not found")
@@ -139,104 +149,21 @@ class VKStoryPublisher:
                 logger.info(f"Story {story_id} already published to VK")
                 return True
 
-            # Download media file from Telegram
+            # Story image is made from the media file
             if not story.media_file_id:
                 logger.error(f"Story {story_id} has no media file")
                 return False
 
-            logger.info(f"Downloading media file for story {story_id}")
-            media_data = await self.download_telegram_file(story.media_file_id)
-            if not media_data:
-                logger.error(f"Failed to download media file for story {story_id}")
-                return False
-
-            # Create story image with overlay
+            # Create story image with overlay (cached on disk, rendered in a worker process)
             logger.info(f"Creating story image for story {story_id}")
-            story_image_data = self.create_story_image(media_data, story.model_name, story.price)
-            if not story_image_data:
+            story_image = await render_story_image(story.media_file_id, story.model_name, story.price)
+            if not story_image:
                 logger.error(f"Failed to create story image for story {story_id}")
                 return False
 
-            # Save story image to temporary file
-            temp_file = f"/tmp/vk_story_{story_id}.jpg"
-            with open(temp_file, "wb") as f:
-                f.write(story_image_data)
-            logger.info(f"Saved story image to {temp_file}")
-
             # Для публикации сторис в группе ВКонтакте
             try:
-                # Получаем адрес сервера для загрузки истории
-                logger.info(f"Getting upload server for VK story, group_id={abs(int(VK_GROUP_ID))}")
-                upload_server = self.vk.stories.getPhotoUploadServer(
-                    add_to_news=1,  # Добавить в новости
-                    group_id=abs(int(VK_GROUP_ID)),  # ID группы (положительное число)
-                    user_ids=[],  # Пустой список пользователей
-                )
-
-                logger.info(f"VK upload server response: {upload_server}")
-
-                if not upload_server or 'upload_url' not in upload_server:
-                    logger.error(f"Failed to get upload server for VK story: {upload_server}")
-                    raise Exception("Failed to get upload server for VK story")
-
-                # Загружаем фото на сервер
-                logger.info(f"Uploading story to VK server: {upload_server['upload_url']}")
-                with open(temp_file, 'rb') as file:
-                    response = requests.post(upload_server['upload_url'], files={'file': file})
-
-                if response.status_code != 200:
-                    logger.error(f"Failed to upload story to VK: {response.status_code} {response.text}")
-                    raise Exception(f"Failed to upload story to VK: {response.status_code}")
-
-                upload_data = response.json()
-                logger.info(f"VK upload response: {upload_data}")
-
-                # Проверяем наличие upload_result в ответе
-                # В новой версии API VK upload_result находится внутри поля response
-                upload_result = None
-                if 'upload_result' in upload_data:
-                    upload_result = upload_data['upload_result']
-                elif 'response' in upload_data and 'upload_result' in upload_data['response']:
-                    upload_result = upload_data['response']['upload_result']
-                
-                if not upload_result:
-                    logger.error(f"Invalid upload response from VK: {upload_data}")
-                    raise Exception("Invalid upload response from VK")
-
-                # Сохраняем историю
-                logger.info(f"Saving story to VK with upload_result: {upload_result[:30]}...")
-                save_result = self.vk.stories.save(
-                    upload_results=upload_result,
-                    group_id=abs(int(VK_GROUP_ID))
-                )
-
-                logger.info(f"VK save result: {save_result}")
-
-                # Проверяем результат сохранения
-                if not save_result or not isinstance(save_result, list) or len(save_result) == 0:
-                    logger.error(f"Failed to save story to VK: {save_result}")
-                    raise Exception("Failed to save story to VK")
-
-                # Получаем ID истории и ссылку
-                story_data = save_result[0]
-                owner_id = story_data.get('owner_id', VK_GROUP_ID)
-                vk_story_id = story_data.get('id', 'unknown')
-                story_link = f"https://vk.com/stories{owner_id}_{vk_story_id}"
-                logger.info(f"Story published to VK: {story_link}")
-
-                # Проверяем, что история действительно опубликована
-                try:
-                    # Получаем список историй группы
-                    logger.info(f"Verifying story publication for group {VK_GROUP_ID}")
-                    stories = self.vk.stories.get(owner_id=VK_GROUP_ID)
-                    logger.info(f"VK stories response: {stories}")
-
-                    if not stories or 'items' not in stories or len(stories['items']) == 0:
-                        logger.warning(f"Story may not be published to VK: no stories found for group {VK_GROUP_ID}")
-                        # Но продолжаем, так как сохранение истории прошло успешно
-                except Exception as e:
-                    logger.warning(f"Could not verify story publication: {str(e)}")
-                    # Продолжаем, так как основная операция сохранения прошла успешно
+                story_link = await run_blocking("vk", self._upload_story, str(story_image))
             except Exception as e:
                 logger.error(f"Error publishing story to VK: {str(e)}")
                 raise Exception(f"Error publishing story to VK: {str(e)}")
@@ -254,16 +181,13 @@ class VKStoryPublisher:
             )
             db.add(log)
 
-            db.commit()
-
-            # Clean up temporary file
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            await db.commit()
 
             logger.info(f"Story {story_id} published to VK successfully")
             return True
         except Exception as e:
             logger.error(f"Error publishing story {story_id} to VK: {str(e)}")
+            vk_stories_client.mark_failed()
 
             # Add error log
             log = StoryPublicationLog(
@@ -272,11 +196,11 @@ class VKStoryPublisher:
                 message=str(e)
             )
             db.add(log)
-            db.commit()
+            await db.commit()
 
             return False
         finally:
-            db.close()
+            await db.close()
 
     async def test_direct_vk_story_upload(self, image_path):
         """Test function to check direct VK story publishing."""
@@ -289,7 +213,9 @@ class VKStoryPublisher:
         
         # Получаем адрес сервера для загрузки истории
         logger.info(f"Getting upload server for VK story, group_id={abs(int(VK_GROUP_ID))}")
-        upload_server = self.vk.stories.getPhotoUploadServer(
+        upload_server = await run_blocking(
+            "vk",
+            self.vk.stories.getPhotoUploadServer,
             add_to_news=1,
             group_id=abs(int(VK_GROUP_ID))
         )
@@ -303,7 +229,7 @@ class VKStoryPublisher:
         # Загружаем фото на сервер
         logger.info(f"Uploading story to VK server: {upload_server['upload_url']}")
         with open(image_path, 'rb') as file:
-            response = requests.post(upload_server['upload_url'], files={'file': file})
+            response = await run_blocking("vk", requests.post, upload_server['upload_url'], files={'file': file})
             
         if response.status_code != 200:
             logger.error(f"Failed to upload story to VK: {response.status_code} {response.text}")
@@ -325,7 +251,9 @@ class VKStoryPublisher:
         
         # Сохраняем историю
         logger.info(f"Saving story to VK with upload_result: {upload_result[:30]}...")
-        save_result = self.vk.stories.save(
+        save_result = await run_blocking(
+            "vk",
+            self.vk.stories.save,
             upload_results=upload_result,
             group_id=abs(int(VK_GROUP_ID))
         )
@@ -347,7 +275,7 @@ class VKStoryPublisher:
 
 async def publish_story_to_vk(story_id):
     """Publish a story to VK."""
-    publisher = VKStoryPublisher()
+    publisher = VKStoryPublisher(await vk_stories_client.get())
     return await publisher.publish_story(story_id)
 
 # Функция для тестирования публикации сторис
@@ -356,12 +284,12 @@ async def test_vk_story_publisher(story_id):
     logger.info(f"Testing VK story publisher with story ID: {story_id}")
     
     # Создаем экземпляр издателя
-    publisher = VKStoryPublisher()
+    publisher = VKStoryPublisher(await vk_stories_client.get())
     
     # Получаем информацию о сторис из базы данных
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     try:
-        story = db.query(Story).filter(Story.id == story_id).first()
+        story = await db.get(Story, story_id)
         if not story:
             logger.error(f"Test failed: Story {story_id} not found")
             return False
@@ -384,9 +312,8 @@ async def test_vk_story_publisher(story_id):
         
         # Проверяем соединение с VK API
         try:
-            vk_session = vk_api.VkApi(token=VK_ACCESS_TOKEN, api_version="5.131")
-            vk = vk_session.get_api()
-            group_info = vk.groups.getById(group_id=abs(int(VK_GROUP_ID)))
+            vk = publisher.vk
+            group_info = await run_blocking("vk", vk.groups.getById, group_id=abs(int(VK_GROUP_ID)))
             logger.info(f"Successfully connected to VK API. Group info: {group_info}")
         except Exception as e:
             logger.error(f"Test failed: Could not connect to VK API: {str(e)}")
@@ -401,16 +328,18 @@ async def test_vk_story_publisher(story_id):
         logger.info(f"Successfully downloaded media file. Size: {len(media_data)} bytes")
         
         # Проверяем создание изображения
-        story_image = publisher.create_story_image(media_data, story.model_name, story.price)
+        story_image = await render_story_image(story.media_file_id, story.model_name, story.price)
         if not story_image:
             logger.error("Test failed: Could not create story image")
             return False
             
-        logger.info(f"Successfully created story image. Size: {len(story_image)} bytes")
+        logger.info(f"Successfully created story image. Size: {story_image.stat().st_size} bytes")
         
         # Проверяем получение сервера для загрузки
         try:
-            upload_server = vk.stories.getPhotoUploadServer(
+            upload_server = await run_blocking(
+                "vk",
+                vk.stories.getPhotoUploadServer,
                 add_to_news=1,
                 group_id=abs(int(VK_GROUP_ID)),
                 user_ids=[]
@@ -434,7 +363,7 @@ async def test_vk_story_publisher(story_id):
         logger.error(f"Test failed with exception: {str(e)}")
         return False
     finally:
-        db.close()
+        await db.close()
 
 # Если файл запущен напрямую, выполняем тест
 if __name__ == "__main__":
@@ -455,8 +384,11 @@ if __name__ == "__main__":
     # Если указан путь к тестовому изображению, запускаем прямой тест
     if len(sys.argv) > 2:
         test_image_path = sys.argv[2]
-        publisher = VKStoryPublisher()
-        result = asyncio.run(publisher.test_direct_vk_story_upload(test_image_path))
+        async def run_direct_test():
+            publisher = VKStoryPublisher(await vk_stories_client.get())
+            return await publisher.test_direct_vk_story_upload(test_image_path)
+
+        result = asyncio.run(run_direct_test())
         print(f"Direct test result: {result}")
     else:
         # Запускаем обычный тест
@@ -1,6 +1,6 @@
 #!/bin/bash
 
-# Инициализация базы данных
+# Инициализация базы данных: применяем все миграции
 echo "Инициализация базы данных..."
-docker-compose exec app python -c "from app.db.database import Base, engine; from app.api.models.post import Post, PublicationLog; from app.api.models.story import Story, StoryPublicationLog; Base.metadata.create_all(bind=engine)"
+docker-compose exec app alembic upgrade head
 echo "База данных инициализирована!"
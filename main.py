@@ -1,9 +1,28 @@
+"""
+Application launcher.
+
+Production (default): a supervisor starts the API under ``API_WORKERS``
+uvicorn worker processes (uvloop and httptools when installed), the Telegram
+bot poller and the publication queue workers as separate processes. A process
+that crashes is restarted; on SIGTERM/SIGINT all of them are asked to stop and
+killed after ``SHUTDOWN_TIMEOUT`` seconds.
+
+Development (``python main.py --dev`` or ``DEV_MODE=true``): everything runs
+in one process and one event loop, and the API reloads on code changes.
+"""
+import argparse
 import asyncio
+import signal
+import subprocess
+import sys
+import time
 import uvicorn
 import logging
 import os
 from pathlib import Path
 
+from app.config.settings import API_PORT, API_WORKERS, JOB_WORKERS, SHUTDOWN_TIMEOUT, DEV_MODE
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -15,12 +34,15 @@ logger = logging.getLogger(__name__)
 media_dir = Path(__file__).resolve().parent / "media"
 media_dir.mkdir(parents=True, exist_ok=True)
 
+# Delay before a crashed process is started again (seconds)
+RESTART_DELAY = 5
+
 async def start_api():
     """Start the FastAPI server."""
     config = uvicorn.Config(
         "app.api.main:app",
         host="0.0.0.0",
-        port=8002,
+        port=API_PORT,
         reload=True,
     )
     server = uvicorn.Server(config)
@@ -31,13 +53,124 @@ async def start_bot():
     from app.bot.main import main as bot_main
     await bot_main()
 
-async def main():
+async def start_workers():
+    """Start the publication queue workers."""
+    from app.workers.queue import run_workers
+    await run_workers()
+
+async def run_dev():
+    """Start all components in one event loop (development mode)."""
+    from app.utils import clients
+    from app.workers import executor
+    from app.db.database import async_engine
+
+    # Shared HTTP session and Telegram bot for the API, the bot and the workers
+    await clients.startup()
+    try:
+        # Start API, bot and queue workers concurrently
+        await asyncio.gather(
+            start_api(),
+            start_bot(),
+            start_workers(),
+        )
+    finally:
+        await clients.shutdown()
+        executor.shutdown(wait=False)
+        await async_engine.dispose()
+
+def production_commands():
+    """Commands of the processes started in production mode."""
+    commands = {
+        "api": [
+            sys.executable, "-m", "uvicorn", "app.api.main:app",
+            "--host", "0.0.0.0",
+            "--port", str(API_PORT),
+            "--workers", str(max(API_WORKERS, 1)),
+            # "auto" picks uvloop and httptools (uvicorn[standard]) when they are installed
+            "--loop", "auto",
+            "--http", "auto",
+            "--timeout-graceful-shutdown", str(SHUTDOWN_TIMEOUT),
+        ],
+        "bot": [sys.executable, "-m", "app.bot.main"],
+    }
+    if JOB_WORKERS > 0:
+        commands["workers"] = [sys.executable, "-m", "app.workers.queue"]
+    return commands
+
+class Supervisor:
+    """Run child processes, restart the ones that crash and stop them all on a signal."""
+
+    def __init__(self, commands):
+        self.commands = commands
+        self.processes = {}
+        self.restart_at = {}
+        self.stopping = False
+
+    def start(self, name):
+        logger.info(f"Starting {name}: {' '.join(self.commands[name])}")
+        self.processes[name] = subprocess.Popen(self.commands[name])
+
+    def request_stop(self, signum, frame):
+        logger.info(f"Received signal {signum}, stopping")
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        for name in self.commands:
+            self.start(name)
+
+        while not self.stopping:
+            now = time.monotonic()
+            for name, process in self.processes.items():
+                if name in self.restart_at:
+                    if now >= self.restart_at[name]:
+                        del self.restart_at[name]
+                        self.start(name)
+                    continue
+
+                code = process.poll()
+                if code is not None:
+                    logger.error(f"{name} exited with code {code}, restarting in {RESTART_DELAY}s")
+                    self.restart_at[name] = now + RESTART_DELAY
+            time.sleep(0.5)
+
+        self.stop()
+
+    def stop(self):
+        """Ask all processes to stop, kill the ones still running after SHUTDOWN_TIMEOUT."""
+        running = [(name, process) for name, process in self.processes.items() if process.poll() is None]
+        for name, process in running:
+            logger.info(f"Stopping {name}")
+            process.send_signal(signal.SIGTERM)
+
+        # uvicorn gets SHUTDOWN_TIMEOUT for its own graceful shutdown, leave it time to exit
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT + RESTART_DELAY
+        for name, process in running:
+            try:
+                process.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{name} did not stop in time, killing it")
+                process.kill()
+                process.wait()
+        logger.info("All processes stopped")
+
+def main():
     """Start all components."""
-    # Start API and bot concurrently
-    await asyncio.gather(
-        start_api(),
-        start_bot(),
+    parser = argparse.ArgumentParser(description="Social Media Poster")
+    parser.add_argument(
+        "--dev",
+        action="store_true",
+        default=DEV_MODE,
+        help="run everything in one process with API auto-reload"
     )
+    args = parser.parse_args()
+
+    if args.dev:
+        asyncio.run(run_dev())
+    else:
+        Supervisor(production_commands()).run()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
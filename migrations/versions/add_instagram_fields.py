@@ -1,7 +1,7 @@
 """Add Instagram fields
 
 Revision ID: add_instagram_fields
-Revises: 
+Revises: initial_schema
 Create Date: 2023-05-15 12:00:00.000000
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = 'add_instagram_fields'
-down_revision = None
+down_revision = 'initial_schema'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,25 @@
+"""Add rate limit wait time to publish jobs
+
+Revision ID: add_job_throttling
+Revises: add_post_remote_ids
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_job_throttling'
+down_revision = 'add_post_remote_ids'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Seconds a job waited for platform rate limits
+    op.add_column('publish_jobs', sa.Column('throttled_seconds', sa.Float(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('publish_jobs', 'throttled_seconds')
@@ -0,0 +1,36 @@
+"""Add media uploads cache
+
+Revision ID: add_media_uploads
+Revises: add_query_indexes
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_uploads'
+down_revision = 'add_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Remote ids of media already uploaded to a platform
+    op.create_table(
+        'media_uploads',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('target', sa.String(), nullable=False),
+        sa.Column('file_unique_id', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('remote_id', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('platform', 'target', 'file_unique_id', name='uq_media_uploads_platform_target_file')
+    )
+
+
+def downgrade():
+    op.drop_table('media_uploads')
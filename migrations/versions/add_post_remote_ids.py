@@ -0,0 +1,28 @@
+"""Add remote ids of published posts and publish job mode
+
+Revision ID: add_post_remote_ids
+Revises: add_media_uploads
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_post_remote_ids'
+down_revision = 'add_media_uploads'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Ids of the published copies, used to edit them in place
+    op.add_column('posts', sa.Column('remote_ids', sa.JSON(), nullable=True))
+    # "publish" or "update"
+    op.add_column('publish_jobs', sa.Column('mode', sa.String(), nullable=False, server_default='publish'))
+
+
+def downgrade():
+    op.drop_column('publish_jobs', 'mode')
+    op.drop_column('posts', 'remote_ids')
@@ -0,0 +1,24 @@
+"""Add index for keyset pagination of posts
+
+Revision ID: add_posts_keyset_index
+Revises: add_posts_status
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_posts_keyset_index'
+down_revision = 'add_posts_status'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
@@ -0,0 +1,62 @@
+"""Add full-text search for posts
+
+Revision ID: add_posts_search
+Revises: add_publish_job_batches
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_posts_search'
+down_revision = 'add_publish_job_batches'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Russian full-text vector with a GIN index and a trigram index for substring/typo matches
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('russian', coalesce(text, ''))) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_posts_text_trgm ON posts USING GIN (text gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        # FTS5 index kept in sync with posts by triggers
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5("
+            "text, content='posts', content_rowid='rowid', tokenize='unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+            "INSERT INTO posts_fts(rowid, text) VALUES (new.rowid, new.text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+            "INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF text ON posts BEGIN "
+            "INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', old.rowid, old.text); "
+            "INSERT INTO posts_fts(rowid, text) VALUES (new.rowid, new.text); END"
+        )
+        op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_posts_text_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_posts_search_vector")
+        op.execute("ALTER TABLE posts DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_ai")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
@@ -0,0 +1,30 @@
+"""Add stored archive status to posts
+
+Revision ID: add_posts_status
+Revises: add_posts_search
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_posts_status'
+down_revision = 'add_posts_search'
+branch_labels = None
+depends_on = None
+
+STATUS_EXPRESSION = "CASE WHEN is_published_vk AND is_published_telegram THEN 'archived' ELSE 'pending' END"
+
+
+def upgrade():
+    # SQLite can only add virtual generated columns to an existing table (they can still be indexed)
+    persisted = op.get_bind().dialect.name != 'sqlite'
+    op.add_column('posts', sa.Column('status', sa.String(), sa.Computed(STATUS_EXPRESSION, persisted=persisted)))
+    op.create_index('ix_posts_status_created_at', 'posts', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_posts_status_created_at', table_name='posts')
+    op.drop_column('posts', 'status')
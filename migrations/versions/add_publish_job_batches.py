@@ -0,0 +1,27 @@
+"""Add batch id to publish jobs
+
+Revision ID: add_publish_job_batches
+Revises: add_publish_jobs
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_publish_job_batches'
+down_revision = 'add_publish_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Jobs created by one "publish to targets" request share a batch id
+    op.add_column('publish_jobs', sa.Column('batch_id', sa.String(), nullable=True))
+    op.create_index('ix_publish_jobs_batch_id', 'publish_jobs', ['batch_id'])
+
+
+def downgrade():
+    op.drop_index('ix_publish_jobs_batch_id', table_name='publish_jobs')
+    op.drop_column('publish_jobs', 'batch_id')
@@ -0,0 +1,46 @@
+"""Add publish jobs queue
+
+Revision ID: add_publish_jobs
+Revises: add_instagram_fields
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_publish_jobs'
+down_revision = 'add_instagram_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create publication job queue table
+    op.create_table(
+        'publish_jobs',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('post_id', sa.String(), sa.ForeignKey('posts.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('story_id', sa.String(), sa.ForeignKey('stories.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('worker_id', sa.String(), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('run_after', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_publish_jobs_status_run_after', 'publish_jobs', ['status', 'run_after'])
+
+
+def downgrade():
+    # Drop publication job queue table
+    op.drop_index('ix_publish_jobs_status_run_after', table_name='publish_jobs')
+    op.drop_table('publish_jobs')
@@ -0,0 +1,35 @@
+"""Add indexes for log, story and job lookups
+
+Revision ID: add_query_indexes
+Revises: add_posts_keyset_index
+Create Date: 2026-10-17 17:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_indexes'
+down_revision = 'add_posts_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Logs of a post/story, newest first
+    op.create_index('ix_publication_logs_post_id_timestamp', 'publication_logs', ['post_id', 'timestamp'])
+    op.create_index('ix_story_publication_logs_story_id_timestamp', 'story_publication_logs', ['story_id', 'timestamp'])
+    # Existing story of a post for a platform
+    op.create_index('ix_stories_post_id_platform', 'stories', ['post_id', 'platform'])
+    # Active job lookup when queueing and cascading deletes
+    op.create_index('ix_publish_jobs_post_id', 'publish_jobs', ['post_id'])
+    op.create_index('ix_publish_jobs_story_id', 'publish_jobs', ['story_id'])
+
+
+def downgrade():
+    op.drop_index('ix_publish_jobs_story_id', table_name='publish_jobs')
+    op.drop_index('ix_publish_jobs_post_id', table_name='publish_jobs')
+    op.drop_index('ix_stories_post_id_platform', table_name='stories')
+    op.drop_index('ix_story_publication_logs_story_id_timestamp', table_name='story_publication_logs')
+    op.drop_index('ix_publication_logs_post_id_timestamp', table_name='publication_logs')
@@ -0,0 +1,76 @@
+"""Initial schema: posts, stories and their publication logs
+
+Revision ID: initial_schema
+Revises: 
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tables as they were before the first migration (add_instagram_fields)
+    op.create_table(
+        'posts',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('photos', sa.JSON(), nullable=True),
+        sa.Column('videos', sa.JSON(), nullable=True),
+        sa.Column('is_published_vk', sa.Boolean(), nullable=True),
+        sa.Column('is_published_telegram', sa.Boolean(), nullable=True),
+        sa.Column('published_vk_at', sa.DateTime(), nullable=True),
+        sa.Column('published_telegram_at', sa.DateTime(), nullable=True),
+        sa.Column('storage_path', sa.String(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'publication_logs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('post_id', sa.String(), sa.ForeignKey('posts.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'stories',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('post_id', sa.String(), sa.ForeignKey('posts.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('platform', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('model_name', sa.String(), nullable=True),
+        sa.Column('price', sa.String(), nullable=True),
+        sa.Column('media_file_id', sa.String(), nullable=True),
+        sa.Column('post_link', sa.String(), nullable=True),
+        sa.Column('is_published', sa.Boolean(), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'story_publication_logs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('story_id', sa.String(), sa.ForeignKey('stories.id', ondelete='CASCADE'), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('story_publication_logs')
+    op.drop_table('stories')
+    op.drop_table('publication_logs')
+    op.drop_table('posts')
@@ -0,0 +1,73 @@
+"""Key the SQLite full-text index by post id
+
+Revision ID: key_posts_fts_by_post_id
+Revises: add_job_throttling
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'key_posts_fts_by_post_id'
+down_revision = 'add_job_throttling'
+branch_labels = None
+depends_on = None
+
+
+def _drop_fts():
+    op.execute("DROP TRIGGER IF EXISTS posts_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS posts_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS posts_fts_ai")
+    op.execute("DROP TABLE IF EXISTS posts_fts")
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    # posts has a string primary key, so its implicit rowid is not stable (VACUUM
+    # may renumber it): the FTS5 table stores the post id in a column of its own
+    _drop_fts()
+    op.execute(
+        "CREATE VIRTUAL TABLE posts_fts USING fts5("
+        "post_id UNINDEXED, text, tokenize='unicode61')"
+    )
+    op.execute(
+        "CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN "
+        "INSERT INTO posts_fts(post_id, text) VALUES (new.id, new.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN "
+        "DELETE FROM posts_fts WHERE post_id = old.id; END"
+    )
+    op.execute(
+        "CREATE TRIGGER posts_fts_au AFTER UPDATE OF id, text ON posts BEGIN "
+        "DELETE FROM posts_fts WHERE post_id = old.id; "
+        "INSERT INTO posts_fts(post_id, text) VALUES (new.id, new.text); END"
+    )
+    op.execute("INSERT INTO posts_fts(post_id, text) SELECT id, text FROM posts")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _drop_fts()
+    op.execute(
+        "CREATE VIRTUAL TABLE posts_fts USING fts5("
+        "text, content='posts', content_rowid='rowid', tokenize='unicode61')"
+    )
+    op.execute(
+        "CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN "
+        "INSERT INTO posts_fts(rowid, text) VALUES (new.rowid, new.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN "
+        "INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', old.rowid, old.text); END"
+    )
+    op.execute(
+        "CREATE TRIGGER posts_fts_au AFTER UPDATE OF text ON posts BEGIN "
+        "INSERT INTO posts_fts(posts_fts, rowid, text) VALUES ('delete', old.rowid, old.text); "
+        "INSERT INTO posts_fts(rowid, text) VALUES (new.rowid, new.text); END"
+    )
+    op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
@@ -0,0 +1,32 @@
+"""Store empty post media as JSON arrays
+
+Revision ID: normalize_post_media
+Revises: key_posts_fts_by_post_id
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'normalize_post_media'
+down_revision = 'key_posts_fts_by_post_id'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The compact post list counts media with json_array_length, which fails
+    # on PostgreSQL for a JSON null stored by updates before they were validated
+    dialect = op.get_bind().dialect.name
+    json_type = 'json_typeof' if dialect == 'postgresql' else 'json_type'
+    for column in ('photos', 'videos'):
+        op.execute(
+            f"UPDATE posts SET {column} = '[]' "
+            f"WHERE {column} IS NULL OR {json_type}({column}) <> 'array'"
+        )
+
+
+def downgrade():
+    pass
@@ -11,6 +11,9 @@ fi
 # Запуск контейнеров
 docker-compose up -d
 
+# Применение миграций базы данных
+docker-compose exec app alembic upgrade head
+
 echo "Контейнеры запущены!"
 echo "API доступен по адресу: http://localhost:8002"
 echo "Веб-интерфейс доступен по адресу: http://localhost:8080"